@@ -14,46 +14,964 @@
 
 import requests
 import os
-import config
+import json
+import hashlib
+import uuid
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urlsplit, parse_qs
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.exceptions import NewConnectionError, ConnectTimeoutError, ReadTimeoutError
+import configuration
+import downloader
+import cleanup
+import uploader
+import cache as response_cache
+import resilience
+
+# commands that take longer than the default timeout on the camera side
+ENDPOINT_TIMEOUTS = {
+    "images/takeimage": 120
+}
+
+CHUNK_SIZE = 64 * 1024  # bytes read at once when streaming a file to disk
+
+# functions called with a CallRecord after every API call of every client (see metrics.py)
+HOOKS = []
+
+
+# available spectra (index: name, main wavelength band), see README
+SPECTRA = {
+    0: ("none", None),
+    1: ("blue", "475 nm"),
+    2: ("cyan", "500 nm"),
+    3: ("green", "526 nm"),
+    4: ("amber", "595 nm"),
+    5: ("red", "630 nm"),
+    6: ("deep red", "665 nm"),
+    7: ("far red", "740 nm"),
+    8: ("NIR-850", "850 nm"),
+    9: ("White", "5700 K"),
+    10: ("NIR-940", "940 nm")
+}
+
+
+@dataclass
+class CallRecord:
+    """
+    Measurements of a single API call, passed to the hooks
+    """
+    camera: str
+    command: str
+    method: str
+    status: int = None  # HTTP status code, None if no response was received
+    duration: float = 0.0  # seconds until the response headers were received (body included if not streamed)
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    error: str = None  # exception class, e.g. "CameraTimeout", "CameraResponseError"
+    retries: int = 0
+
+
+def open_temp_file(full_path):
+    """
+    Create the temporary file of a download next to its target. Unlike tempfile.mkstemp() (mode 0600) the file is
+    created with mode 0666 and the umask of the process applied by the system, like any other new file.
+    :param full_path: local path the file is stored to
+    :return: (file descriptor, path of the temporary file)
+    """
+    temp_path = os.path.join(os.path.dirname(full_path) or ".", f".{uuid.uuid4().hex}.part")
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    return os.open(temp_path, flags, 0o666), temp_path
+
+
+def stream_to_file(response, full_path, checksum=None, chunk_size=CHUNK_SIZE):
+    """
+    Write the body of a streamed response to disk. The body is written in chunks to a temporary file next
+    to the target and renamed when complete, so an interrupted download never leaves a truncated file behind.
+    :param response: API response requested with stream=True
+    :param full_path: local path the file is stored to
+    :param checksum: optional hash algorithm calculated while downloading, e.g. "sha256"
+    :param chunk_size: number of bytes read at once
+    :return: file information (python dict with path, bytes and checksum)
+    """
+    digest = hashlib.new(checksum) if checksum else None
+    size = 0
+
+    fd, temp_path = open_temp_file(full_path)
+    try:
+        with response, os.fdopen(fd, "wb") as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                size += len(chunk)
+                if digest:
+                    digest.update(chunk)
+        os.replace(temp_path, full_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return {
+        "path": full_path,
+        "bytes": size,
+        "checksum": digest.hexdigest() if digest else None
+    }
+
+
+class CameraClient:
+    """
+    Client for a single camera. Keeps a pool of keep-alive connections so consecutive
+    calls (status polls, list pages, file downloads) do not open a new TCP connection each time.
+    """
+
+    def __init__(self, ip_address=None, key=None, timeout=None, pool_size=None, retries=None, backoff_factor=None,
+                 endpoint_timeouts=None, max_downloads=None, hooks=None, cache=None, retry_policy=None,
+                 circuit_breaker=None, raise_errors=None):
+        """
+        Settings that are not given are taken from the configuration of the camera (see configuration.py)
+        :param ip_address: IP address of the camera
+        :param key: API key of the camera
+        :param timeout: default timeout in seconds
+        :param pool_size: maximum number of open connections to the camera
+        :param retries: number of reconnect attempts if the connection can't be established
+        :param backoff_factor: base delay in seconds between reconnect attempts (exponential)
+        :param endpoint_timeouts: python dict with timeouts per command, e.g. {"images/takeimage": 120}
+        :param max_downloads: maximum number of parallel file downloads from the camera
+        :param hooks: list of functions called with a CallRecord after every API call of this client
+        :param cache: True or a cache.ResponseCache to reuse the responses of status, info and file lists
+                      (see cache.py), False disables caching
+        :param retry_policy: resilience.RetryPolicy for calls that reached the camera, by default read-only
+                             commands are retried after lost connections and 502/503/504 responses (retries,
+                             backoff_factor), resilience.NO_RETRY disables it
+        :param circuit_breaker: True, a resilience.CircuitBreaker or False, fails calls immediately while the
+                                camera is offline
+        :param raise_errors: raise a resilience.CameraError instead of printing the error and returning None
+        """
+        config = configuration.settings(ip_address)
+
+        def setting(value, name):
+            return config[name] if value is None else value
+
+        self.ip_address = config["ip_address"]
+        self.key = setting(key, "key")
+        self.timeout = setting(timeout, "timeout")
+        self.pool_size = pool_size = setting(pool_size, "pool_size")
+        self.max_downloads = setting(max_downloads, "max_downloads")
+        self.download_slots = threading.BoundedSemaphore(self.max_downloads)
+        self.hooks = list(hooks or [])
+        self.raise_errors = setting(raise_errors, "raise_errors")
+        retries = setting(retries, "retries")
+        backoff_factor = setting(backoff_factor, "backoff_factor")
+        self.retry_policy = retry_policy or resilience.RetryPolicy(retries=retries, backoff_factor=backoff_factor)
+
+        cache = setting(cache, "cache")
+        if cache is True:
+            cache = response_cache.ResponseCache(ttls=config["cache_ttls"] or None, max_entries=config["cache_entries"])
+        self.cache = cache if cache is not False else None
+
+        circuit_breaker = setting(circuit_breaker, "circuit_breaker")
+        if circuit_breaker is True:
+            circuit_breaker = resilience.CircuitBreaker(failure_threshold=config["failure_threshold"],
+                                                        reset_timeout=config["reset_timeout"])
+        self.circuit_breaker = circuit_breaker or None
+
+        self.endpoint_timeouts = dict(ENDPOINT_TIMEOUTS)
+        self.endpoint_timeouts.update(config["endpoint_timeouts"])
+        if endpoint_timeouts:
+            self.endpoint_timeouts.update(endpoint_timeouts)
+
+        # only failed connection attempts are retried, a request that reached the camera is never sent twice
+        retry = Retry(total=retries, connect=retries, read=0, status=0, other=0,
+                      backoff_factor=backoff_factor, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close all pooled connections
+        """
+        self.session.close()
+
+    def url(self, command):
+        """
+        Build the API URL of a command
+        :param command: API command, e.g. "files/list"
+        :return: API URL
+        """
+        return f"http://{self.ip_address}/api/v1/{command}?key={self.key}"
+
+    def get_timeout(self, command, timeout=None):
+        """
+        Resolve the timeout of a command (explicit value, per-command value or client default)
+        :param command: API command, e.g. "files/list"
+        :param timeout: explicit timeout in seconds
+        :return: timeout in seconds
+        """
+        if timeout is not None:
+            return timeout
+        return self.endpoint_timeouts.get(command, self.timeout)
+
+    def api_call(self, url, settings=None, data=None, timeout=None, stream=False):
+        """
+        Make an API call over the pooled connections. Read-only commands are retried according to the
+        retry policy, the timeout is shortened to the remaining time of a resilience.deadline().
+        :param url: API URL
+        :param settings: python dict with parameters
+        :param data: only necessary to post/upload data
+        :param timeout: sets the timeout in seconds
+        :param stream: don't read the response body yet (the response has to be closed by the caller)
+        :return: API response, None if the camera did not answer (with raise_errors a resilience.CameraError
+                 is raised instead, also for error responses)
+        """
+        command = urlsplit(url).path.split("/api/v1/", 1)[-1]
+        response = None
+        error = None
+        attempt = 0
+
+        start = time.perf_counter()
+
+        while True:
+            attempt += 1
+            try:
+                response = self._send(url, command, settings, data, timeout, stream)
+                error = None
+                break
+            except resilience.CameraError as err:
+                error = err
+                response = getattr(err, "response", None)
+                if not self._retry(command, err, attempt):
+                    break
+                if stream and response is not None:
+                    response.close()
+
+        if HOOKS or self.hooks:
+            self._notify(command, "GET" if data is None else "POST", response, error, time.perf_counter() - start,
+                         stream, attempt - 1)
+
+        if error is not None:
+            if self.raise_errors:
+                if stream and response is not None:
+                    response.close()
+                raise error
+            print(error)
+
+        return response
+
+    def _send(self, url, command, settings, data, timeout, stream):
+        # one attempt, errors are raised as resilience.CameraError
+        if timeout is None:
+            timeout = self.get_timeout(command)
+
+        shortened = False
+        remaining = resilience.remaining()
+        if remaining is not None:
+            if remaining <= 0:
+                raise resilience.DeadlineExceeded(f"Deadline exceeded before {command} on {self.ip_address}",
+                                                  self.ip_address, command)
+            if remaining < timeout:
+                timeout, shortened = remaining, True
+
+        breaker = self.circuit_breaker
+        allowed = breaker.allow() if breaker is not None else None
+        if allowed is False:
+            raise resilience.CircuitOpen(f"{self.ip_address} failed {breaker.failures} times in a row, "
+                                         f"{command} not sent", self.ip_address, command)
+
+        try:
+            return self._request(url, command, settings, data, timeout, stream, shortened, breaker)
+        finally:
+            if allowed == resilience.CircuitBreaker.HALF_OPEN:
+                breaker.release()  # a trial call without result (deadline, ...) must not block the breaker
+
+    def _request(self, url, command, settings, data, timeout, stream, shortened, breaker):
+        # send the request and report the outcome to the circuit breaker
+        try:
+            if data is not None:
+                response = self.session.post(url,
+                                             data=data,
+                                             timeout=timeout,
+                                             headers={"Content-Type": "application/octet-stream"})
+                # header is octet-stream because we don't know what type it is
+            else:
+                response = self.session.get(url, json=settings, timeout=timeout, stream=stream)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as err:
+            # read timeouts are reported as ConnectionError by the connection pool retries
+            reason = getattr(err.args[0], "reason", None) if err.args else None
+            if isinstance(err, requests.exceptions.ConnectTimeout):
+                error_class = resilience.CameraUnavailable
+            elif isinstance(err, requests.exceptions.Timeout) or isinstance(reason, ReadTimeoutError):
+                # a timeout shortened by the deadline says nothing about the camera
+                error_class = resilience.DeadlineExceeded if shortened else resilience.CameraTimeout
+            elif isinstance(reason, (NewConnectionError, ConnectTimeoutError)):
+                error_class = resilience.CameraUnavailable
+            else:
+                error_class = resilience.CameraDisconnected
+            error = error_class(str(err), self.ip_address, command)
+        except requests.exceptions.RequestException as err:
+            error = resilience.CameraError(str(err), self.ip_address, command)
+        else:
+            if breaker is not None:
+                breaker.record_success()  # the camera answered, even if with an error status
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as err:
+                raise resilience.CameraResponseError(str(err), response, self.ip_address, command) from None
+            return response
+
+        if breaker is not None and not isinstance(error, resilience.DeadlineExceeded):
+            breaker.record_failure()
+        raise error
+
+    def _retry(self, command, error, attempt):
+        # wait before the next attempt, False if the call is not retried
+        if not self.retry_policy.should_retry(command, error, attempt):
+            return False
+        delay = self.retry_policy.delay(attempt)
+        remaining = resilience.remaining()
+        if remaining is not None and delay >= remaining:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _notify(self, command, method, response, error, duration, stream, retried=0):
+        # pass the measurements of a call to the hooks
+        record = CallRecord(camera=self.ip_address,
+                            command=command,
+                            method=method,
+                            duration=duration,
+                            error=type(error).__name__ if error is not None else None,
+                            retries=retried)
+
+        if response is not None:
+            record.status = response.status_code
+            record.bytes_sent = int(response.request.headers.get("Content-Length") or 0)
+            if stream:
+                record.bytes_received = int(response.headers.get("Content-Length") or 0)
+            else:
+                record.bytes_received = len(response.content)
+            retries = getattr(response.raw, "retries", None)
+            record.retries += len(retries.history) if retries is not None else 0
+
+        for hook in HOOKS + self.hooks:
+            try:
+                hook(record)
+            except Exception as err:  # a broken hook must not break the API call
+                print(f"Hook {hook} failed: {err}")
+
+    def connection_stats(self):
+        """
+        Get the number of connections opened to the camera and the number of requests sent over them
+        :return: python dict with connections and requests
+        """
+        connections = 0
+        requests_sent = 0
+
+        pools = self.session.get_adapter("http://").poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests_sent += pool.num_requests
+
+        return {"connections": connections, "requests": requests_sent}
+
+    def request(self, command, settings=None, data=None, timeout=None, stream=False):
+        """
+        Send a command to the camera
+        :param command: API command, e.g. "files/list"
+        :param settings: python dict with parameters
+        :param data: only necessary to post/upload data
+        :param timeout: sets the timeout in seconds, defaults to the per-command timeout
+        :param stream: don't read the response body yet (the response has to be closed by the caller)
+        :return: API response
+        """
+        def call():
+            return self.api_call(self.url(command), settings=settings, data=data,
+                                 timeout=self.get_timeout(command, timeout), stream=stream)
+
+        if self.cache is None:
+            return call()
+
+        if self.cache.cacheable(command) and data is None and not stream:
+            return self.cache.get(command, settings, call)
+
+        if command in response_cache.READ_ONLY:
+            return call()
+
+        # the command changes the camera, responses cached before or during the call are outdated
+        self.cache.invalidate()
+        try:
+            return call()
+        finally:
+            self.cache.invalidate()
+
+    def get_status(self, timeout=None):
+        """
+        Get camera status (name, firmware version and timestamp)
+        :param timeout: sets the timeout in seconds
+        :return: camera info (python dict)
+        """
+        status = None
+
+        response = self.request("status", timeout=timeout)  # Query system status
+
+        if response is not None and response.status_code == 200:
+            # command successful
+            status = response.json()
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        return status
+
+    def get_info(self, timeout=None):
+        """
+        Get camera info (SD-card and health infos)
+        :param timeout: sets the timeout in seconds
+        :return: camera info (python dict)
+        """
+        info = None
+
+        response = self.request("info", timeout=timeout)  # Query system information
+
+        if response is not None and response.status_code == 200:
+            # command successful
+            info = response.json()
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        return info
+
+    def trigger_camera_restart(self, timeout=None):
+        """
+        Restarts camera
+        :param timeout: sets the timeout in seconds
+        :return: True if the restart was triggered
+        """
+        triggered = False
+
+        response = self.request("reset", timeout=timeout)  # Restart module
+
+        if response is not None and response.status_code == 200:
+            print("Reset in progress...")
+            triggered = True
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        return triggered
+
+    def flash_light(self, spectrum=1, brightness=200, time=1000, timeout=None):
+        """
+        Flash LED light of a single specturm
+        :param spectrum: 0-10, see README
+        :param brightness: 0-1000
+        :param time: duration of flash in ms
+        :param timeout: sets the timeout in seconds
+        :return: all settings (python dict)
+        """
+        settings = {
+            "spectrum": int(spectrum),
+            "brightness": int(brightness),
+            "time": int(time)
+        }
+
+        response = self.request("flashlight", settings=settings, timeout=timeout)
+
+        if response is not None and response.status_code == 200:
+            # command successful
+            response = response.json()
+            print(response)
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        return response
+
+    def get_file(self, filename, source, timeout=None):
+        """
+        Get single file (helper function for download_files())
+        :param filename: Name of the file that should be retrieved
+        :param source: respective source folder (see README)
+        :param timeout: sets the timeout in seconds
+        :return: file
+        """
+        settings = {
+            "filename": filename,
+            "source": source
+        }
+
+        file = None
+
+        response = self.request("files/get", settings=settings, timeout=timeout)
+
+        if response is not None and response.status_code == 200:
+            # command successful
+            file = response.content  # get the file
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        return file
+
+    def save_file(self, filename, source, full_path, timeout=None, checksum=None, chunk_size=CHUNK_SIZE):
+        """
+        Stream a single file to disk (see stream_to_file())
+        :param filename: Name of the file that should be retrieved
+        :param source: respective source folder (see README)
+        :param full_path: local path the file is stored to
+        :param timeout: sets the timeout in seconds
+        :param checksum: optional hash algorithm calculated while downloading, e.g. "sha256"
+        :param chunk_size: number of bytes read at once
+        :return: file information (python dict with path, bytes and checksum) or None if the download failed
+        """
+        settings = {
+            "filename": filename,
+            "source": source
+        }
+
+        file_info = None
+
+        response = self.request("files/get", settings=settings, timeout=timeout, stream=True)
+
+        if response is not None and response.status_code == 200:
+            # command successful
+            try:
+                file_info = stream_to_file(response, full_path, checksum=checksum, chunk_size=chunk_size)
+            except (requests.exceptions.RequestException, IOError) as err:
+                print(f"Download of {filename} failed: {err}")
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        if response is not None:
+            response.close()  # release the connection back to the pool
+
+        return file_info
+
+    def delete_file(self, filename, source, timeout=None):
+        """
+        Deletes file from the camera
+        :param filename: name of the file to be deleted
+        :param source: respective file source folder (see README)
+        :param timeout: sets the timeout in seconds
+        :return: True if the file was deleted
+        """
+        settings = {
+            "filename": filename,
+            "source": source
+        }
+
+        deleted = False
+
+        response = self.request("files/delete", settings=settings, timeout=timeout)  # delete file
+
+        if response is not None and response.status_code == 200:
+            # command successful
+            print(f"Deleted {filename}")
+            deleted = True
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        return deleted
+
+    def get_file_list(self, source, timeout=None, index=0, limit=500):
+        """
+        Receive a full file list of the respective source
+        :param source: source folder (see README)
+        :param timeout: sets the timeout in seconds
+        :param index: starting file index number, 0 and 1 starts from the first file found in the folder
+        :param limit: maximum number of files in reply list
+        :return: list with file names
+        """
+        settings = {
+            "source": source,  # source location: scheduler, web, etc...
+            "index": index,  # start position of file index
+            "limit": limit  # maximum number of files in reply structure
+        }
+
+        file_list = None
+
+        response = self.request("files/list", settings=settings, timeout=timeout)  # Query files of the source
+
+        if response is not None and response.status_code == 200:
+            # command successful
+            file_list = response.json()
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        return file_list
+
+    def iter_files(self, source, page_size=500, prefetch=False, timeout=None):
+        """
+        Iterate over all files of a source, the file list is requested page by page (files/list)
+        until the number of files reported by the camera ("total") is reached.
+        :param source: source folder (see README)
+        :param page_size: maximum number of files requested per call
+        :param prefetch: request the next page in the background while the current page is processed
+        :param timeout: sets the timeout in seconds
+        :return: generator of file names, raises IOError if a page can't be received
+        """
+        def fetch(index):
+            page = self.get_file_list(source=source, timeout=timeout, index=index, limit=page_size)
+            if page is None:
+                raise IOError(f"Listing {source} failed at index {index}")
+            return page
+
+        prefetch_page = resilience.in_context(fetch)  # the prefetch thread keeps the deadline of the caller
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        count = 0
+        last_file = None
 
+        try:
+            page = fetch(0)
+            while True:
+                files = page["files"]
+                # the index is 1-based on some firmware versions, drop the file repeated from the last page
+                if files and files[0] == last_file:
+                    files = files[1:]
+
+                total = page.get("total")
+                done = not files or (total is not None and count + len(files) >= total) or \
+                    (total is None and len(page["files"]) < page_size)
+
+                next_page = None
+                if not done and executor:
+                    next_page = executor.submit(prefetch_page, count + len(files))
+
+                for file in files:
+                    yield file
+                count += len(files)
+
+                if done:
+                    return
+
+                last_file = files[-1]
+                page = next_page.result() if next_page else fetch(count)
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_files_in_range(self, start_datetime, end_datetime, source, timeout=None):
+        """
+        Get list of files that were created in a given time range
+        :param start_datetime: Start date and time (according to ISO8601)
+        :param end_datetime: End date and time (according to ISO8601)
+        :param source: source folder (see README)
+        :param timeout: sets the timeout in seconds
+        :return: list with file names
+        """
+        settings = {  # startDateTime and endDateTime according to ISO8601
+            "startDateTime": start_datetime,
+            "endDateTime": end_datetime,
+            "source": source
+        }
+
+        files_in_range = None
+
+        # Query first file in date/time range
+        response = self.request("images/firstinrange", settings=settings, timeout=timeout)
+
+        if response is not None and response.status_code == 200:  # command successful
+            files_in_range = response.json()
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        return files_in_range
+
+    def take_ms_image(self, timeout=None):
+        """
+        Takes multispectal image using the global settings
+        :param timeout: sets the timeout in seconds
+        :return: file information (python dict)
+        """
+        file_list = None
+
+        response = self.request("images/takeimage", timeout=timeout)  # Take multispectral image
+
+        if response is not None and response.status_code == 200:
+            # command successful
+            file_list = response.json()
+
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        return file_list
+
+    def take_mono_image(self, spectrum, brightness, exposure, filename, timeout=None):
+        """
+        Takes monochrome image with the given settings
+        :param filename: name of the file the monochrome image should be written to (locally)
+        :param exposure: time in seconds (see README)
+        :param brightness: 0-1000
+        :param spectrum: 0-10, see README
+        :param timeout: sets the timeout in seconds
+        :return: True if the image was stored
+        """
+        settings = {
+            "spectrum": spectrum,
+            "brightness": brightness,
+            "exposure": exposure
+        }
+
+        name, file_extension = os.path.splitext(filename)
+
+        print("taking monochrome image")
+        print(f"Settings: filename {filename}, spectrum {spectrum}, "
+              f"brightness {brightness}, exposure {exposure}, IP {self.ip_address}")
+
+        stored = False
+
+        # get API response
+        response = self.request(f"camera/image{file_extension}", settings=settings, timeout=timeout)
+
+        if response is not None and response.status_code == 200:
+            # command successful
+            print("Store image to file")
+            response = response.content  # get the image
+            try:
+                f = open(filename, "wb")  # save image to file
+                f.write(response)
+                f.close()
+                stored = True
+            except IOError:
+                print("Write to file failed")
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        return stored
+
+    def get_mono_image(self, spectrum, brightness, exposure, file_extension=".jpg", timeout=None):
+        """
+        Takes monochrome image with the given settings and returns it
+        :param spectrum: 0-10, see README
+        :param brightness: 0-1000
+        :param exposure: time in seconds (see README)
+        :param file_extension: image format, ".jpg" or ".png"
+        :param timeout: sets the timeout in seconds
+        :return: image (bytes) or None if the command failed
+        """
+        settings = {
+            "spectrum": spectrum,
+            "brightness": brightness,
+            "exposure": exposure
+        }
+
+        image = None
+
+        response = self.request(f"camera/image{file_extension}", settings=settings, timeout=timeout)
+
+        if response is not None and response.status_code == 200:
+            # command successful
+            image = response.content
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        return image
+
+    def save_mono_image(self, spectrum, brightness, exposure, full_path, timeout=None, checksum=None):
+        """
+        Takes monochrome image with the given settings and streams it to disk, the image format is
+        taken from the file extension
+        :param spectrum: 0-10, see README
+        :param brightness: 0-1000
+        :param exposure: time in seconds (see README)
+        :param full_path: local path the image is stored to
+        :param timeout: sets the timeout in seconds
+        :param checksum: optional hash algorithm calculated while downloading, e.g. "sha256"
+        :return: file information (python dict with path, bytes and checksum) or None if the command failed
+        """
+        settings = {
+            "spectrum": spectrum,
+            "brightness": brightness,
+            "exposure": exposure
+        }
+
+        name, file_extension = os.path.splitext(full_path)
+
+        file_info = None
+
+        response = self.request(f"camera/image{file_extension}", settings=settings, timeout=timeout, stream=True)
+
+        if response is not None and response.status_code == 200:
+            # command successful
+            try:
+                file_info = stream_to_file(response, full_path, checksum=checksum)
+            except (requests.exceptions.RequestException, IOError) as err:
+                print(f"Storing image {full_path} failed: {err}")
+        elif response is not None:
+            print(f"command failed, response code {response.status_code}, info: {response.content}")
+        else:
+            print("Command timeout")
+
+        if response is not None:
+            response.close()  # release the connection back to the pool
+
+        return file_info
+
+    def upload_file(self, file_path, timeout=None, filename=None, progress=None, verify=False):
+        """
+        Upload a file to the camera (e.g. config files), the file is sent in chunks
+        :param file_path: path to the file, binary file object, bytes or iterable of bytes chunks
+        :param timeout: sets the timeout in seconds
+        :param filename: name of the file on the camera, defaults to the name of the local file
+        :param progress: optional function called with an uploader.UploadResult after every chunk
+        :param verify: check the file list of the camera (config source) after the upload
+        :return: True if the file was uploaded
+        """
+        if filename is None:
+            filename = os.path.basename(file_path if isinstance(file_path, (str, os.PathLike)) else
+                                        getattr(file_path, "name", ""))
+        if not filename:
+            raise ValueError("filename required if the data has no file name")
+
+        result = uploader.upload(self, file_path, filename, timeout=timeout, progress=progress, verify=verify)
+
+        if result.status == uploader.OK:
+            print(f"Command succeeded, file {filename} uploaded ({result.throughput / 1e6:.2f} MB/s)")
+        elif result.error == "no response":
+            print("Command timeout")
+        else:
+            print(f"command failed, {result.error}")
+
+        return result.status == uploader.OK
+
+    def download_files(self, file_list, source, path=None, timeout=None, max_workers=None, progress=None,
+                       checksum=None, processor=None):
+        """
+        Download (multiple) files in parallel
+        :param file_list: list with a single or multiple files that should be downloaded
+        :param source: source folder (see README)
+        :param path: local path the files should be downloaded to
+        :param timeout: sets the timeout in seconds
+        :param max_workers: number of parallel downloads, defaults to max_downloads of the client
+        :param progress: optional function called with (DownloadResult, DownloadReport) after every file
+        :param checksum: optional hash algorithm calculated while downloading, e.g. "sha256"
+        :param processor: optional processing.Processor every downloaded file is submitted to
+        :return: DownloadReport with the result of every file
+        """
+        report = downloader.download_files(self, file_list=file_list, source=source, path=path,
+                                           max_workers=max_workers, progress=progress, timeout=timeout,
+                                           checksum=checksum, processor=processor)
+        print(f"Downloaded {report.summary()}")
+
+        return report
+
+    def delete_files(self, file_list, source, timeout=None, max_workers=4, retries=2, progress=None):
+        """
+        Delete (multiple) files in parallel, failed deletes are retried
+        :param file_list: list with a single or multiple files that should be deleted
+        :param source: source folder (see README)
+        :param timeout: sets the timeout in seconds
+        :param max_workers: number of parallel delete requests
+        :param retries: number of retries per file
+        :param progress: optional function called with (DeleteResult, DeleteReport) after every file
+        :return: DeleteReport with the result of every file
+        """
+        report = cleanup.delete_files(self, file_list=file_list, source=source, max_workers=max_workers,
+                                      retries=retries, progress=progress, timeout=timeout)
+        print(f"Deleted {report.summary()}")
+
+        return report
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(ip_address=None, key=None, **kwargs):
+    """
+    Get the shared client of a camera, the client is created on first use. Clients are shared per camera, key and
+    settings, calls with other settings get their own client.
+    :param ip_address: IP address of the camera, defaults to the camera of the configuration (see configuration.py)
+    :param key: API key of the camera, defaults to the key in the configuration of the camera
+    :param kwargs: CameraClient settings (pool_size, timeout, raise_errors, ...)
+    :return: CameraClient
+    """
+    if ip_address is None or key is None:
+        config = configuration.settings(ip_address)
+        ip_address = config["ip_address"]
+        key = config["key"] if key is None else key
+
+    # objects (hook functions, cache, retry policy, ...) are compared by identity, the client keeps them alive
+    client_key = (ip_address, key, json.dumps(kwargs, sort_keys=True, default=id))
+
+    with _clients_lock:
+        client = _clients.get(client_key)
+        if client is None:
+            client = CameraClient(ip_address=ip_address, key=key, **kwargs)
+            _clients[client_key] = client
+    return client
 
-def api_call(url, settings=None, data=None, timeout=config.API_V1_TIMEOUT):
+
+def clients():
+    """
+    Get the shared clients created by get_client()
+    :return: list of CameraClient
+    """
+    with _clients_lock:
+        return list(_clients.values())
+
+
+def close_clients():
+    """
+    Close the connections of all shared clients
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def api_call(url, settings=None, data=None, timeout=None, stream=False):
     """
     Helper function to make API calls
     :param url: API URL
     :param settings: python dict with parameters
     :param data: only necessary to post/upload data
     :param timeout: sets the timeout in seconds
+    :param stream: don't read the response body yet (the response has to be closed by the caller)
     :return: API response
     """
-    response = None
+    # reuse the connections of the camera addressed by the URL
+    parts = urlsplit(url)
+    key = parse_qs(parts.query).get("key", [None])[0]
 
-    try:
-        if data:
-            response = requests.post(url,
-                                     data=data,
-                                     timeout=timeout,
-                                     headers={"Content-Type": "application/octet-stream"})
-            # header is octet-stream because we don't know what type it is
-        else:
-            response = requests.get(url, json=settings, timeout=timeout)
+    return get_client(parts.netloc, key).api_call(url, settings=settings, data=data, timeout=timeout, stream=stream)
 
-        response.raise_for_status()
 
-    # error handling
-    except requests.exceptions.HTTPError as errh:
-        print(errh)
-    except requests.exceptions.ConnectionError as errc:
-        print(errc)
-    except requests.exceptions.Timeout as errt:
-        print(errt)
-    except requests.exceptions.RequestException as err:
-        print(err)
-
-    return response
-
-
-def get_status(ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY, timeout=config.API_V1_TIMEOUT):
+def get_status(ip_address=None, key=None, timeout=None):
     """
     Get camera status (name, firmware version and timestamp)
     :param ip_address: IP address of the camera
@@ -61,24 +979,10 @@ def get_status(ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY, timeout=confi
     :param timeout: sets the timeout in seconds
     :return: camera info (python dict)
     """
-    status = None
-
-    api_url = f"http://{ip_address}/api/v1/status?key={key}"
-
-    response = api_call(api_url, timeout=timeout)  # Query system status
+    return get_client(ip_address, key).get_status(timeout=timeout)
 
-    if response and response.status_code == 200:
-        # command successful
-        status = response.json()
-    elif response:
-        print(f"command failed, response code {response.status_code}, info: {response.content}")
-    else:
-        print("Command timeout")
 
-    return status
-
-
-def get_info(ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY, timeout=config.API_V1_TIMEOUT):
+def get_info(ip_address=None, key=None, timeout=None):
     """
     Get camera info (SD-card and health infos)
     :param ip_address: IP address of the camera
@@ -86,47 +990,22 @@ def get_info(ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY, timeout=config.
     :param timeout: sets the timeout in seconds
     :return: camera info (python dict)
     """
+    return get_client(ip_address, key).get_info(timeout=timeout)
 
-    info = None
-
-    api_url = f"http://{ip_address}/api/v1/info?key={key}"
-
-    response = api_call(api_url, timeout=timeout)  # Query system information
-
-    if response and response.status_code == 200:
-        # command successful
-        info = response.json()
-    elif response:
-        print(f"command failed, response code {response.status_code}, info: {response.content}")
-    else:
-        print("Command timeout")
 
-    return info
-
-
-def trigger_camera_restart(ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY, timeout=config.API_V1_TIMEOUT):
+def trigger_camera_restart(ip_address=None, key=None, timeout=None):
     """
     Restarts camera
     :param ip_address: IP address of the camera
     :param key: API key of the camera
     :param timeout: sets the timeout in seconds
+    :return: True if the restart was triggered
     """
-    # Restart module
-
-    api_url = f"http://{ip_address}/api/v1/reset?key={key}"
-
-    response = api_call(api_url, timeout=timeout)
-
-    if response and response.status_code == 200:
-        print("Reset in progress...")
-    elif response:
-        print(f"command failed, response code {response.status_code}, info: {response.content}")
-    else:
-        print("Command timeout")
+    return get_client(ip_address, key).trigger_camera_restart(timeout=timeout)
 
 
 def flash_light(spectrum=1, brightness=200, time=1000,
-                ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY, timeout=config.API_V1_TIMEOUT):
+                ip_address=None, key=None, timeout=None):
     """
     Flash LED light of a single specturm
     :param spectrum: 0-10, see README
@@ -137,30 +1016,11 @@ def flash_light(spectrum=1, brightness=200, time=1000,
     :param timeout: sets the timeout in seconds
     :return: all settings (python dict)
     """
-
-    settings = {
-        "spectrum": int(spectrum),
-        "brightness": int(brightness),
-        "time": int(time)
-    }
-
-    api_url = f"http://{ip_address}/api/v1/flashlight?key={key}"
-
-    response = api_call(api_url, settings=settings, timeout=timeout)
-
-    if response and response.status_code == 200:
-        # command successful
-        response = response.json()
-        print(response)
-    elif response:
-        print(f"command failed, response code {response.status_code}, info: {response.content}")
-    else:
-        print("Command timeout")
-
-    return response
+    return get_client(ip_address, key).flash_light(spectrum=spectrum, brightness=brightness, time=time,
+                                                   timeout=timeout)
 
 
-def get_file(filename, source, ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY, timeout=config.API_V1_TIMEOUT):
+def get_file(filename, source, ip_address=None, key=None, timeout=None):
     """
     Get single file (helper function for download_files())
     :param filename: Name of the file that should be retrieved
@@ -170,30 +1030,27 @@ def get_file(filename, source, ip_address=config.CAMERA_IP, key=config.UNIQUE_KE
     :param timeout: sets the timeout in seconds
     :return: file
     """
+    return get_client(ip_address, key).get_file(filename=filename, source=source, timeout=timeout)
 
-    settings = {
-        "filename": filename,
-        "source": source
-    }
-
-    file = None
-
-    api_url = f"http://{ip_address}/api/v1/files/get?key={key}"
-
-    response = api_call(api_url, settings=settings, timeout=timeout)
-
-    if response and response.status_code == 200:
-        # command successful
-        file = response.content  # get the file
-    elif response:
-        print(f"command failed, response code {response.status_code}, info: {response.content}")
-    else:
-        print("Command timeout")
 
-    return file
+def save_file(filename, source, full_path, ip_address=None, key=None,
+              timeout=None, checksum=None):
+    """
+    Stream a single file to disk without loading it into memory
+    :param filename: Name of the file that should be retrieved
+    :param source: respective source folder (see README)
+    :param full_path: local path the file is stored to
+    :param ip_address: IP address of the camera
+    :param key: API key of the camera
+    :param timeout: sets the timeout in seconds
+    :param checksum: optional hash algorithm calculated while downloading, e.g. "sha256"
+    :return: file information (python dict with path, bytes and checksum) or None if the download failed
+    """
+    return get_client(ip_address, key).save_file(filename=filename, source=source, full_path=full_path,
+                                                 timeout=timeout, checksum=checksum)
 
 
-def delete_file(filename, source, ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY, timeout=config.API_V1_TIMEOUT):
+def delete_file(filename, source, ip_address=None, key=None, timeout=None):
     """
     Deletes file from the camera
     :param filename: name of the file to be deleted
@@ -201,28 +1058,13 @@ def delete_file(filename, source, ip_address=config.CAMERA_IP, key=config.UNIQUE
     :param ip_address: IP address of the camera
     :param key: API key of the camera
     :param timeout: sets the timeout in seconds
+    :return: True if the file was deleted
     """
+    return get_client(ip_address, key).delete_file(filename=filename, source=source, timeout=timeout)
 
-    settings = {
-        "filename": filename,
-        "source": source
-    }
-
-    api_url = f"http://{ip_address}/api/v1/files/delete?key={key}"
-
-    response = api_call(api_url, settings=settings, timeout=timeout)  # delete file
-
-    if response and response.status_code == 200:
-        # command successful
-        print(f"Deleted {filename}")
-    elif response:
-        print(f"command failed, response code {response.status_code}, info: {response.content}")
-    else:
-        print("Command timeout")
 
-
-def get_file_list(source, ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY,
-                  timeout=config.API_V1_TIMEOUT, index=0, limit=500):
+def get_file_list(source, ip_address=None, key=None,
+                  timeout=None, index=0, limit=500):
     """
     Receive a full file list of the respective source
     :param source: source folder (see README)
@@ -233,33 +1075,28 @@ def get_file_list(source, ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY,
     :param limit: maximum number of files in reply list
     :return: list with file names
     """
+    return get_client(ip_address, key).get_file_list(source=source, timeout=timeout, index=index, limit=limit)
 
-    settings = {
-        "source": source,  # source location: scheduler, web, etc...
-        "index": index,  # start position of file index
-        "limit": limit  # maximum number of files in reply structure
-    }
-
-    file_list = None
-
-    api_url = f"http://{ip_address}/api/v1/files/list?key={key}"
-
-    response = api_call(api_url, settings=settings, timeout=timeout)  # Query images in date/time range
 
-    if response and response.status_code == 200:
-        # command successful
-        file_list = response.json()
-    elif response:
-        print(f"command failed, response code {response.status_code}, info: {response.content}")
-    else:
-        print("Command timeout")
-
-    return file_list
+def iter_files(source, ip_address=None, key=None, timeout=None,
+               page_size=500, prefetch=False):
+    """
+    Iterate over all files of a source (all pages of files/list)
+    :param source: source folder (see README)
+    :param ip_address: IP address of the camera
+    :param key: API key of the camera
+    :param timeout: sets the timeout in seconds
+    :param page_size: maximum number of files requested per call
+    :param prefetch: request the next page in the background while the current page is processed
+    :return: generator of file names, raises IOError if a page can't be received
+    """
+    return get_client(ip_address, key).iter_files(source=source, page_size=page_size, prefetch=prefetch,
+                                                  timeout=timeout)
 
 
 # startDateTime and endDateTime according to ISO8601
-def get_files_in_range(start_datetime, end_datetime, source, ip_address=config.CAMERA_IP,
-                       key=config.UNIQUE_KEY, timeout=config.API_V1_TIMEOUT):
+def get_files_in_range(start_datetime, end_datetime, source, ip_address=None,
+                       key=None, timeout=None):
     """
     Get list of files that were created in a given time range
     :param start_datetime: Start date and time (according to ISO8601)
@@ -270,59 +1107,27 @@ def get_files_in_range(start_datetime, end_datetime, source, ip_address=config.C
     :param timeout: sets the timeout in seconds
     :return: list with file names
     """
+    return get_client(ip_address, key).get_files_in_range(start_datetime=start_datetime,
+                                                          end_datetime=end_datetime,
+                                                          source=source, timeout=timeout)
 
-    settings = {  # startDateTime and endDateTime according to ISO8601
-        "startDateTime": start_datetime,
-        "endDateTime": end_datetime,
-        "source": source
-    }
-
-    files_in_range = None
-
-    api_url = f"http://{ip_address}/api/v1/images/firstinrange?key={key}"
 
-    response = api_call(api_url, settings=settings, timeout=timeout)  # Query first file in date/time range
-
-    if response and response.status_code == 200:  # command successful
-        files_in_range = response.json()
-    elif response:
-        print(f"command failed, response code {response.status_code}, info: {response.content}")
-    else:
-        print("Command timeout")
-
-    return files_in_range
-
-
-def take_ms_image(ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY, timeout=120):
+def take_ms_image(ip_address=None, key=None, timeout=None):
     """
     Takes multispectal image using the global settings
     :param ip_address: IP address of the camera
     :param key: API key of the camera
-    :param timeout: sets the timeout in seconds
+    :param timeout: sets the timeout in seconds, defaults to the images/takeimage timeout of the client
+                    (ENDPOINT_TIMEOUTS, the configuration or profiler.CaptureProfiler.apply())
     :return: file information (python dict)
     """
-    file_list = None
-
-    api_url = f"http://{ip_address}/api/v1/images/takeimage?key={key}"
-
-    response = api_call(api_url, timeout=timeout)  # Take multispectral image
-
-    if response and response.status_code == 200:
-        # command successful
-        file_list = response.json()
-
-    elif response:
-        print(f"command failed, response code {response.status_code}, info: {response.content}")
-    else:
-        print("Command timeout")
-
-    return file_list
+    return get_client(ip_address, key).take_ms_image(timeout=timeout)
 
 
 def take_mono_image(spectrum, brightness, exposure, filename,
-                    ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY, timeout=config.API_V1_TIMEOUT):
+                    ip_address=None, key=None, timeout=None):
     """
-    Takes multispectal image using the global settings
+    Takes monochrome image with the given settings
     :param filename: name of the file the monochrome image should be written to (locally)
     :param exposure: time in seconds (see README)
     :param brightness: 0-1000
@@ -330,72 +1135,49 @@ def take_mono_image(spectrum, brightness, exposure, filename,
     :param ip_address: IP address of the camera
     :param key: API key of the camera
     :param timeout: sets the timeout in seconds
+    :return: True if the image was stored
     """
+    return get_client(ip_address, key).take_mono_image(spectrum=spectrum, brightness=brightness,
+                                                       exposure=exposure, filename=filename, timeout=timeout)
 
-    settings = {
-        "spectrum": spectrum,
-        "brightness": brightness,
-        "exposure": exposure
-    }
-
-    name, file_extension = os.path.splitext(filename)
-
-    print("taking monochrome image")
-    print(f"Settings: filename {filename}, spectrum {spectrum}, "
-          f"brightness {brightness}, exposure {exposure}, IP {ip_address}")
-
-    api_url = f"http://{ip_address}/api/v1/camera/image{file_extension}?key={key}"
-
-    # get API response
-    response = api_call(api_url, settings=settings, timeout=timeout)
 
-    if response and response.status_code == 200:
-        # command successful
-        print("Store image to file")
-        response = response.content  # get the image
-        try:
-            f = open(filename, "wb")  # save image to file
-            f.write(response)
-            f.close()
-        except IOError:
-            print("Write to file failed")
-            exit(1)  # terminate, exit code 1
-    elif response:
-        print(f"command failed, response code {response.status_code}, info: {response.content}")
-    else:
-        print("Command timeout")
-        exit(1)  # terminate, exit code 1
-
-
-def upload_file(file_path, ip_address=config.CAMERA_IP, key=config.UNIQUE_KEY, timeout=config.API_V1_TIMEOUT):
-    """
-    Upload a file to the camera (e.g. config files)
-    :param file_path: path to the file that should be uploaded
+def get_mono_image(spectrum, brightness, exposure, file_extension=".jpg",
+                   ip_address=None, key=None, timeout=None):
+    """
+    Takes monochrome image with the given settings and returns it
+    :param spectrum: 0-10, see README
+    :param brightness: 0-1000
+    :param exposure: time in seconds (see README)
+    :param file_extension: image format, ".jpg" or ".png"
     :param ip_address: IP address of the camera
     :param key: API key of the camera
     :param timeout: sets the timeout in seconds
+    :return: image (bytes) or None if the command failed
     """
+    return get_client(ip_address, key).get_mono_image(spectrum=spectrum, brightness=brightness, exposure=exposure,
+                                                      file_extension=file_extension, timeout=timeout)
 
-    filename = os.path.basename(file_path)
 
-    # filename is part of the URL, wildcard is used on server side
-    api_url = f"http://{ip_address}/api/v1/files/put/{filename}?key={key}"
-
-    f = open(file_path, "rb")  # save image to file
-    image = f.read()
-    f.close()
-
-    response = api_call(api_url, data=image, timeout=timeout)  # post file image
-    if response and response.status_code == 200:
-        print(f"Command succeeded, file {filename} uploaded")
-    elif response:
-        print(f"command failed, response code {response.status_code}, info: {response.content}")
-    else:
-        print("Command timeout")
+def upload_file(file_path, ip_address=None, key=None, timeout=None,
+                filename=None, progress=None, verify=False):
+    """
+    Upload a file to the camera (e.g. config files), the file is sent in chunks
+    :param file_path: path to the file, binary file object, bytes or iterable of bytes chunks
+    :param ip_address: IP address of the camera
+    :param key: API key of the camera
+    :param timeout: sets the timeout in seconds
+    :param filename: name of the file on the camera, defaults to the name of the local file
+    :param progress: optional function called with an uploader.UploadResult after every chunk
+    :param verify: check the file list of the camera (config source) after the upload
+    :return: True if the file was uploaded
+    """
+    return get_client(ip_address, key).upload_file(file_path=file_path, timeout=timeout, filename=filename,
+                                                   progress=progress, verify=verify)
 
 
-def download_files(file_list, source, path=None, ip_address=config.CAMERA_IP,
-                   key=config.UNIQUE_KEY, timeout=config.API_V1_TIMEOUT):
+def download_files(file_list, source, path=None, ip_address=None,
+                   key=None, timeout=None, max_workers=None, progress=None,
+                   checksum=None, processor=None):
     """
     Download (multiple) files
     :param file_list: list with a single or multiple files that should be downloaded
@@ -404,27 +1186,30 @@ def download_files(file_list, source, path=None, ip_address=config.CAMERA_IP,
     :param ip_address: IP address of the camera
     :param key: API key of the camera
     :param timeout: sets the timeout in seconds
-    :return:
+    :param max_workers: number of parallel downloads
+    :param progress: optional function called with (DownloadResult, DownloadReport) after every file
+    :param checksum: optional hash algorithm calculated while downloading, e.g. "sha256"
+    :param processor: optional processing.Processor every downloaded file is submitted to
+    :return: DownloadReport with the result of every file
     """
+    return get_client(ip_address, key).download_files(file_list=file_list, source=source, path=path,
+                                                      timeout=timeout, max_workers=max_workers,
+                                                      progress=progress, checksum=checksum, processor=processor)
 
-    for file in file_list:
-        print(f"Downloading {file}")
-        image_file = get_file(filename=file, source=source,
-                              ip_address=ip_address, key=key, timeout=timeout)
-
-        if path is None:
-            path = source
 
-        os.makedirs(path, exist_ok=True)  # creates a folder named after the source to store the images
-
-        if image_file:
-            full_path = f"{path}/{file}"
-            print(f"Storing file to {full_path}")
-            try:
-                f = open(full_path, "wb")  # save image to file
-                f.write(image_file)
-                f.close()
-            except IOError:
-                print("Write to file failed")
-        else:
-            print("No files to store")
+def delete_files(file_list, source, ip_address=None, key=None,
+                 timeout=None, max_workers=4, retries=2, progress=None):
+    """
+    Delete (multiple) files in parallel, failed deletes are retried
+    :param file_list: list with a single or multiple files that should be deleted
+    :param source: source folder (see README)
+    :param ip_address: IP address of the camera
+    :param key: API key of the camera
+    :param timeout: sets the timeout in seconds
+    :param max_workers: number of parallel delete requests
+    :param retries: number of retries per file
+    :param progress: optional function called with (DeleteResult, DeleteReport) after every file
+    :return: DeleteReport with the result of every file
+    """
+    return get_client(ip_address, key).delete_files(file_list=file_list, source=source, timeout=timeout,
+                                                    max_workers=max_workers, retries=retries, progress=progress)
@@ -0,0 +1,445 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# asyncio version of api_v1.py (requires aiohttp: pip install aiohttp)
+
+import os
+import asyncio
+import hashlib
+import aiohttp
+import configuration
+from api_v1 import ENDPOINT_TIMEOUTS, CHUNK_SIZE, open_temp_file
+
+
+def _write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class AsyncCameraClient:
+    """
+    asyncio client for a single camera. All calls share one aiohttp session, so many concurrent
+    operations run on one event loop over a bounded number of connections.
+    """
+
+    def __init__(self, ip_address=None, key=None, timeout=None, limit=None, endpoint_timeouts=None, connector=None):
+        """
+        Settings that are not given are taken from the configuration of the camera (see configuration.py)
+        :param ip_address: IP address of the camera
+        :param key: API key of the camera
+        :param timeout: default timeout in seconds
+        :param limit: maximum number of open connections to the camera (pool_size of the configuration)
+        :param endpoint_timeouts: python dict with timeouts per command, e.g. {"images/takeimage": 120}
+        :param connector: optional aiohttp connector shared with other clients
+        """
+        config = configuration.settings(ip_address)
+
+        self.ip_address = config["ip_address"]
+        self.key = config["key"] if key is None else key
+        self.timeout = config["timeout"] if timeout is None else timeout
+        self.limit = config["pool_size"] if limit is None else limit
+
+        self.endpoint_timeouts = dict(ENDPOINT_TIMEOUTS)
+        self.endpoint_timeouts.update(config["endpoint_timeouts"])
+        if endpoint_timeouts:
+            self.endpoint_timeouts.update(endpoint_timeouts)
+
+        self._connector = connector
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def session(self):
+        # created lazily, aiohttp sessions have to be created inside the event loop
+        if self._session is None or self._session.closed:
+            if self._connector is not None:
+                self._session = aiohttp.ClientSession(connector=self._connector, connector_owner=False)
+            else:
+                self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.limit))
+        return self._session
+
+    async def close(self):
+        """
+        Close all connections of the client
+        """
+        if self._session is not None:
+            await self._session.close()
+
+    def url(self, command):
+        """
+        Build the API URL of a command
+        :param command: API command, e.g. "files/list"
+        :return: API URL
+        """
+        return f"http://{self.ip_address}/api/v1/{command}?key={self.key}"
+
+    def get_timeout(self, command, timeout=None):
+        """
+        Resolve the timeout of a command (explicit value, per-command value or client default)
+        :param command: API command, e.g. "files/list"
+        :param timeout: explicit timeout in seconds
+        :return: timeout in seconds
+        """
+        if timeout is not None:
+            return timeout
+        return self.endpoint_timeouts.get(command, self.timeout)
+
+    async def request(self, command, settings=None, data=None, timeout=None, read=None):
+        """
+        Send a command to the camera. Parameters are sent as JSON body, also on GET (required by the camera).
+        :param command: API command, e.g. "files/list"
+        :param settings: python dict with parameters
+        :param data: only necessary to post/upload data (bytes or file object)
+        :param timeout: sets the timeout in seconds, defaults to the per-command timeout
+        :param read: async function called with the response to read the body, defaults to reading all bytes
+        :return: tuple (status code, body) or None if the camera could not be reached
+        """
+        # the timeout applies to connecting and to every read (like the requests timeout of api_v1), not to the whole
+        # transfer, so streaming a large file may take longer than the timeout
+        command_timeout = self.get_timeout(command, timeout)
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=command_timeout, sock_read=command_timeout)
+
+        try:
+            if data is not None:
+                # header is octet-stream because we don't know what type it is
+                request = self.session.post(self.url(command), data=data, timeout=client_timeout,
+                                            headers={"Content-Type": "application/octet-stream"})
+            else:
+                request = self.session.get(self.url(command), json=settings, timeout=client_timeout)
+
+            async with request as response:
+                if response.status != 200:
+                    print(f"command failed, response code {response.status}, info: {await response.read()}")
+                    return response.status, None
+
+                body = await read(response) if read else await response.read()
+                return response.status, body
+
+        # error handling
+        except asyncio.TimeoutError as errt:
+            print(f"Timeout: {errt}")
+        except aiohttp.ClientError as err:
+            print(err)
+
+        print("Command timeout")
+        return None
+
+    async def request_json(self, command, settings=None, timeout=None):
+        """
+        Send a command and decode the JSON answer
+        :return: python dict or None if the command failed
+        """
+        result = await self.request(command, settings=settings, timeout=timeout,
+                                    read=lambda response: response.json(content_type=None))
+        return result[1] if result else None
+
+    async def get_status(self, timeout=None):
+        """
+        Get camera status (name, firmware version and timestamp)
+        :param timeout: sets the timeout in seconds
+        :return: camera info (python dict)
+        """
+        return await self.request_json("status", timeout=timeout)
+
+    async def get_info(self, timeout=None):
+        """
+        Get camera info (SD-card and health infos)
+        :param timeout: sets the timeout in seconds
+        :return: camera info (python dict)
+        """
+        return await self.request_json("info", timeout=timeout)
+
+    async def trigger_camera_restart(self, timeout=None):
+        """
+        Restarts camera
+        :param timeout: sets the timeout in seconds
+        :return: True if the restart was triggered
+        """
+        result = await self.request("reset", timeout=timeout)
+        return bool(result) and result[0] == 200
+
+    async def flash_light(self, spectrum=1, brightness=200, time=1000, timeout=None):
+        """
+        Flash LED light of a single specturm
+        :param spectrum: 0-10, see README
+        :param brightness: 0-1000
+        :param time: duration of flash in ms
+        :param timeout: sets the timeout in seconds
+        :return: all settings (python dict)
+        """
+        settings = {
+            "spectrum": int(spectrum),
+            "brightness": int(brightness),
+            "time": int(time)
+        }
+
+        return await self.request_json("flashlight", settings=settings, timeout=timeout)
+
+    async def get_file(self, filename, source, timeout=None):
+        """
+        Get single file
+        :param filename: Name of the file that should be retrieved
+        :param source: respective source folder (see README)
+        :param timeout: sets the timeout in seconds
+        :return: file (bytes)
+        """
+        settings = {
+            "filename": filename,
+            "source": source
+        }
+
+        result = await self.request("files/get", settings=settings, timeout=timeout)
+        return result[1] if result else None
+
+    async def save_file(self, filename, source, full_path, timeout=None, checksum=None, chunk_size=CHUNK_SIZE):
+        """
+        Stream a single file to disk (temporary file, renamed when complete)
+        :param filename: Name of the file that should be retrieved
+        :param source: respective source folder (see README)
+        :param full_path: local path the file is stored to
+        :param timeout: sets the timeout in seconds
+        :param checksum: optional hash algorithm calculated while downloading, e.g. "sha256"
+        :param chunk_size: number of bytes read at once
+        :return: file information (python dict with path, bytes and checksum) or None if the download failed
+        """
+        settings = {
+            "filename": filename,
+            "source": source
+        }
+
+        async def read(response):
+            loop = asyncio.get_running_loop()
+            fd, temp_path = open_temp_file(full_path)
+            digest = hashlib.new(checksum) if checksum else None
+            size = 0
+
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        await loop.run_in_executor(None, f.write, chunk)  # disk writes don't block the event loop
+                        size += len(chunk)
+                        if digest:
+                            digest.update(chunk)
+                os.replace(temp_path, full_path)
+            except BaseException as err:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                if isinstance(err, IOError):
+                    print(f"Download of {filename} failed: {err}")
+                    return None
+                raise
+
+            return {
+                "path": full_path,
+                "bytes": size,
+                "checksum": digest.hexdigest() if digest else None
+            }
+
+        result = await self.request("files/get", settings=settings, timeout=timeout, read=read)
+        return result[1] if result else None
+
+    async def delete_file(self, filename, source, timeout=None):
+        """
+        Deletes file from the camera
+        :param filename: name of the file to be deleted
+        :param source: respective file source folder (see README)
+        :param timeout: sets the timeout in seconds
+        :return: True if the file was deleted
+        """
+        settings = {
+            "filename": filename,
+            "source": source
+        }
+
+        result = await self.request("files/delete", settings=settings, timeout=timeout)
+        return bool(result) and result[0] == 200
+
+    async def get_file_list(self, source, timeout=None, index=0, limit=500):
+        """
+        Receive a file list of the respective source
+        :param source: source folder (see README)
+        :param timeout: sets the timeout in seconds
+        :param index: starting file index number, 0 and 1 starts from the first file found in the folder
+        :param limit: maximum number of files in reply list
+        :return: list with file names
+        """
+        settings = {
+            "source": source,  # source location: scheduler, web, etc...
+            "index": index,  # start position of file index
+            "limit": limit  # maximum number of files in reply structure
+        }
+
+        return await self.request_json("files/list", settings=settings, timeout=timeout)
+
+    async def iter_files(self, source, page_size=500, timeout=None):
+        """
+        Iterate over all files of a source, the next page is requested while the current one is processed
+        :param source: source folder (see README)
+        :param page_size: maximum number of files requested per call
+        :param timeout: sets the timeout in seconds
+        :return: async generator of file names, raises IOError if a page can't be received
+        """
+        async def fetch(index):
+            page = await self.get_file_list(source=source, timeout=timeout, index=index, limit=page_size)
+            if page is None:
+                raise IOError(f"Listing {source} failed at index {index}")
+            return page
+
+        count = 0
+        last_file = None
+        page = await fetch(0)
+
+        while True:
+            files = page["files"]
+            # the index is 1-based on some firmware versions, drop the file repeated from the last page
+            if files and files[0] == last_file:
+                files = files[1:]
+
+            total = page.get("total")
+            done = not files or (total is not None and count + len(files) >= total) or \
+                (total is None and len(page["files"]) < page_size)
+
+            next_page = None if done else asyncio.ensure_future(fetch(count + len(files)))
+
+            try:
+                for file in files:
+                    yield file
+            except BaseException:
+                if next_page:
+                    next_page.cancel()
+                raise
+            count += len(files)
+
+            if done:
+                return
+
+            last_file = files[-1]
+            page = await next_page
+
+    async def get_files_in_range(self, start_datetime, end_datetime, source, timeout=None):
+        """
+        Get list of files that were created in a given time range
+        :param start_datetime: Start date and time (according to ISO8601)
+        :param end_datetime: End date and time (according to ISO8601)
+        :param source: source folder (see README)
+        :param timeout: sets the timeout in seconds
+        :return: list with file names
+        """
+        settings = {  # startDateTime and endDateTime according to ISO8601
+            "startDateTime": start_datetime,
+            "endDateTime": end_datetime,
+            "source": source
+        }
+
+        return await self.request_json("images/firstinrange", settings=settings, timeout=timeout)
+
+    async def take_ms_image(self, timeout=None):
+        """
+        Takes multispectal image using the global settings
+        :param timeout: sets the timeout in seconds
+        :return: file information (python dict)
+        """
+        return await self.request_json("images/takeimage", timeout=timeout)
+
+    async def get_mono_image(self, spectrum, brightness, exposure, file_extension=".jpg", timeout=None):
+        """
+        Takes monochrome image with the given settings and returns it
+        :param spectrum: 0-10, see README
+        :param brightness: 0-1000
+        :param exposure: time in seconds (see README)
+        :param file_extension: image format, ".jpg" or ".png"
+        :param timeout: sets the timeout in seconds
+        :return: image (bytes)
+        """
+        settings = {
+            "spectrum": spectrum,
+            "brightness": brightness,
+            "exposure": exposure
+        }
+
+        result = await self.request(f"camera/image{file_extension}", settings=settings, timeout=timeout)
+        return result[1] if result else None
+
+    async def take_mono_image(self, spectrum, brightness, exposure, filename, timeout=None):
+        """
+        Takes monochrome image with the given settings and stores it to a file
+        :param spectrum: 0-10, see README
+        :param brightness: 0-1000
+        :param exposure: time in seconds (see README)
+        :param filename: name of the file the monochrome image should be written to (locally)
+        :param timeout: sets the timeout in seconds
+        :return: True if the image was stored
+        """
+        name, file_extension = os.path.splitext(filename)
+
+        image = await self.get_mono_image(spectrum, brightness, exposure, file_extension=file_extension,
+                                          timeout=timeout)
+        if image is None:
+            return False
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, _write_file, filename, image)
+        except IOError:
+            print("Write to file failed")
+            return False
+
+        return True
+
+    async def upload_file(self, file_path, timeout=None):
+        """
+        Upload a file to the camera (e.g. config files), the file is streamed from disk
+        :param file_path: path to the file that should be uploaded
+        :param timeout: sets the timeout in seconds
+        :return: True if the file was uploaded
+        """
+        filename = os.path.basename(file_path)
+
+        # a file object is sent in chunks with a Content-Length header (no chunked transfer encoding)
+        with open(file_path, "rb") as f:
+            # filename is part of the URL, wildcard is used on server side
+            result = await self.request(f"files/put/{filename}", data=f, timeout=timeout)
+
+        return bool(result) and result[0] == 200
+
+    async def download_files(self, file_list, source, path=None, timeout=None, max_workers=None, checksum=None):
+        """
+        Download (multiple) files concurrently
+        :param file_list: list with a single or multiple files that should be downloaded
+        :param source: source folder (see README)
+        :param path: local path the files should be downloaded to, defaults to the source name
+        :param timeout: sets the timeout in seconds
+        :param max_workers: number of parallel downloads, defaults to the connection limit
+        :param checksum: optional hash algorithm calculated while downloading, e.g. "sha256"
+        :return: python dict filename -> file information (None if the download failed)
+        """
+        if path is None:
+            path = source
+
+        os.makedirs(path, exist_ok=True)  # creates a folder named after the source to store the images
+
+        slots = asyncio.Semaphore(max_workers or self.limit)
+
+        async def download(filename):
+            async with slots:
+                return await self.save_file(filename, source, os.path.join(path, filename),
+                                            timeout=timeout, checksum=checksum)
+
+        results = await asyncio.gather(*(download(filename) for filename in file_list))
+
+        return dict(zip(file_list, results))
@@ -0,0 +1,237 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Throughput benchmark of api_v1.py against the mock camera (mock_camera.py)
+# Reports calls/s, MB/s, p50/p99 latency and peak memory per scenario, results can be stored as JSON baseline.
+#
+# python3 benchmark.py --files 500 --file-size 200000 --latency 0.01 --json baseline.json
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+import contextlib
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+
+import api_v1
+
+
+@dataclass
+class Measurement:
+    """
+    Result of one benchmark scenario
+    """
+    scenario: str
+    calls: int = 0
+    bytes: int = 0
+    duration: float = 0.0
+    latencies: list = field(default_factory=list, repr=False)
+    peak_memory: int = None  # bytes allocated by Python at most (tracemalloc)
+
+    @property
+    def calls_per_second(self):
+        return self.calls / self.duration if self.duration else 0.0
+
+    @property
+    def megabytes_per_second(self):
+        return self.bytes / 1e6 / self.duration if self.duration else 0.0
+
+    def percentile(self, percent):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+    def as_dict(self):
+        result = asdict(self)
+        del result["latencies"]
+        result.update(calls_per_second=self.calls_per_second, megabytes_per_second=self.megabytes_per_second,
+                      p50=self.percentile(50), p99=self.percentile(99))
+        return result
+
+    def row(self):
+        p50, p99 = self.percentile(50), self.percentile(99)
+        memory = f"{self.peak_memory / 1e6:8.2f}" if self.peak_memory is not None else "       -"
+        return (f"{self.scenario:<22} {self.calls:>7} {self.calls_per_second:>9.1f} {self.megabytes_per_second:>8.2f} "
+                f"{p50 * 1000 if p50 is not None else 0:>9.2f} {p99 * 1000 if p99 is not None else 0:>9.2f} {memory}")
+
+
+HEADER = f"{'scenario':<22} {'calls':>7} {'calls/s':>9} {'MB/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'peak MB':>8}"
+
+
+def timed(measurement, function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    measurement.latencies.append(time.perf_counter() - start)
+    measurement.calls += 1
+    return result
+
+
+def bench_status(client, args):
+    measurement = Measurement("status")
+    for _ in range(args.calls):
+        timed(measurement, client.get_status)
+    return measurement
+
+
+def bench_listing(client, args):
+    measurement = Measurement(f"list (page {args.page_size})")
+    files = []
+    for index in range(0, args.files, args.page_size):
+        page = timed(measurement, client.get_file_list, source="scheduler", index=index, limit=args.page_size)
+        files.extend(page["files"])
+    measurement.bytes = sum(len(file) for file in files)
+    return measurement
+
+
+def bench_download(client, args, workers):
+    measurement = Measurement(f"download ({workers} workers)")
+    files = list(client.iter_files("scheduler", page_size=args.page_size))
+    path = tempfile.mkdtemp(prefix="benchmark_")
+
+    def progress(result, report):
+        measurement.latencies.append(result.duration)
+
+    try:
+        report = client.download_files(files, "scheduler", path=path, max_workers=workers, progress=progress)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    measurement.calls = report.ok
+    measurement.bytes = report.bytes
+    return measurement
+
+
+def bench_upload(client, args):
+    measurement = Measurement("upload")
+    path = tempfile.mkdtemp(prefix="benchmark_")
+    file_path = os.path.join(path, "benchmark_upload.bin")
+
+    try:
+        with open(file_path, "wb") as f:
+            f.write(os.urandom(args.upload_size))
+        for _ in range(args.uploads):
+            timed(measurement, client.upload_file, file_path)
+            measurement.bytes += args.upload_size
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    return measurement
+
+
+def bench_capture(client, args):
+    measurement = Measurement("capture + download")
+    path = tempfile.mkdtemp(prefix="benchmark_")
+
+    try:
+        for _ in range(args.captures):
+            start = time.perf_counter()
+            file_info = client.take_ms_image()
+            report = client.download_files(file_info["files"], file_info["source"], path=path)
+            measurement.latencies.append(time.perf_counter() - start)
+            measurement.calls += 1
+            measurement.bytes += report.bytes
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    return measurement
+
+
+def run(name, scenario, client, args, *extra):
+    """
+    Run a scenario, once for the timing and (optionally) once more with tracemalloc for the peak memory
+    """
+    print(f"Running {name}...", flush=True)
+
+    with contextlib.redirect_stdout(io.StringIO()):  # the output of the api_v1 functions
+        start = time.perf_counter()
+        measurement = scenario(client, args, *extra)
+        measurement.duration = time.perf_counter() - start
+
+        if args.memory:
+            tracemalloc.start()
+            scenario(client, args, *extra)
+            measurement.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    return measurement
+
+
+def start_mock(args):
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_camera.py"),
+               "--port", "0", "--key", args.key, "--files", str(args.files), "--file-size", str(args.file_size),
+               "--latency", str(args.latency), "--capture-time", str(args.capture_time)]
+    if args.bandwidth:
+        command += ["--bandwidth", str(args.bandwidth)]
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    match = re.search(r"listening on (\S+):(\d+)", line)
+    if not match:
+        process.kill()
+        raise RuntimeError(f"Mock camera did not start: {line}")
+
+    return process, f"{match.group(1)}:{match.group(2)}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark api_v1.py against the mock camera")
+    parser.add_argument("--camera", help="IP address of a running mock camera, a mock is started if not set")
+    parser.add_argument("--key", default="mock", help="API key of the camera")
+    parser.add_argument("--files", type=int, default=500, help="number of files of the mock camera")
+    parser.add_argument("--file-size", type=int, default=200000, help="file size of the mock camera in bytes")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock camera delay per request in seconds")
+    parser.add_argument("--bandwidth", type=float, default=None, help="mock camera bytes per second per response")
+    parser.add_argument("--capture-time", type=float, default=0.2, help="mock camera takeimage duration")
+    parser.add_argument("--calls", type=int, default=500, help="number of status calls")
+    parser.add_argument("--page-size", type=int, default=100, help="files per list call")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="parallel downloads to compare")
+    parser.add_argument("--uploads", type=int, default=10, help="number of uploads")
+    parser.add_argument("--upload-size", type=int, default=1000000, help="upload size in bytes")
+    parser.add_argument("--captures", type=int, default=3, help="number of multispectral captures")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip peak memory measurement")
+    parser.add_argument("--json", help="write the results to a JSON file")
+    args = parser.parse_args()
+
+    mock_process = None
+    camera = args.camera
+    if camera is None:
+        mock_process, camera = start_mock(args)
+
+    try:
+        with api_v1.CameraClient(ip_address=camera, key=args.key, max_downloads=max(args.workers)) as client:
+            measurements = [run("status", bench_status, client, args),
+                            run("listing", bench_listing, client, args)]
+            measurements += [run("download", bench_download, client, args, workers) for workers in args.workers]
+            measurements += [run("upload", bench_upload, client, args),
+                             run("capture", bench_capture, client, args)]
+    finally:
+        if mock_process:
+            mock_process.terminate()
+
+    print(HEADER)
+    for measurement in measurements:
+        print(measurement.row())
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": [measurement.as_dict() for measurement in measurements]},
+                      f, indent=2)
@@ -0,0 +1,142 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Response cache for the read-only API calls of a CameraClient (status, info, file lists), see README.
+# Identical requests running at the same time share one HTTP call, commands that change the camera
+# (delete, upload, takeimage, reset, ...) clear the cache.
+
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# seconds a response is reused per command
+DEFAULT_TTLS = {
+    "status": 5.0,
+    "info": 30.0,
+    "files/list": 10.0,
+    "images/firstinrange": 10.0,
+}
+
+# commands that don't change the camera and therefore don't clear the cache
+READ_ONLY = {"status", "info", "files/list", "images/firstinrange", "files/get", "flashlight"}
+
+
+class _Pending:
+    # request in flight, waiting callers get its response or its exception
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    LRU cache of successful responses with a time to live per command
+    """
+
+    def __init__(self, ttls=None, max_entries=256):
+        """
+        :param ttls: python dict command -> seconds, replaces DEFAULT_TTLS (commands not in it are not cached)
+        :param max_entries: maximum number of cached responses, the least recently used is dropped
+        """
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # requests that waited for an identical request in flight
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires, response)
+        self._pending = {}  # key -> _Pending
+        self._generation = 0  # incremented by invalidate(), responses of older requests are not stored
+
+    def __len__(self):
+        return len(self._entries)
+
+    def cacheable(self, command):
+        return command in self.ttls
+
+    @staticmethod
+    def key(command, settings):
+        return command, json.dumps(settings, sort_keys=True) if settings else ""
+
+    def get(self, command, settings, call):
+        """
+        Get a cached response or run the request
+        :param command: API command, e.g. "status"
+        :param settings: python dict with parameters
+        :param call: function sending the request, returns the response
+        :return: API response, callers waiting for the same request get the exception raised by call
+        """
+        key = self.key(command, settings)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = _Pending()
+                self._pending[key] = pending
+                owner = True
+                generation = self._generation
+                self.misses += 1
+            else:
+                owner = False
+                self.coalesced += 1
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.response
+
+        try:
+            pending.response = call()
+        except BaseException as err:
+            pending.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+                response = pending.response
+                if response is not None and response.status_code == 200 and generation == self._generation:
+                    self._entries[key] = (time.monotonic() + self.ttls[command], response)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            pending.done.set()
+
+        return pending.response
+
+    def invalidate(self, command=None):
+        """
+        Drop cached responses
+        :param command: only drop the responses of this command, all if not set
+        """
+        with self._lock:
+            self._generation += 1
+            if command is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == command]:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "coalesced": self.coalesced}
@@ -12,31 +12,383 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import api_v1
+# Command line interface, prints one JSON object per result (messages of the API go to stderr).
+# Modules are imported when a command runs, so --help and simple commands start fast.
+#
+# python3 camera.py status --ip 10.1.2.1
+# python3 camera.py capture --spectrum 4 --brightness 100 --exposure 0.3 --filename test.png
+# python3 camera.py batch jobs.txt --jobs 8     (one command per line, "-" reads stdin)
+# python3 camera.py fleet --cameras cameras.json sync --source scheduler
+
 import sys
+import json
+import time
+import shlex
+import argparse
+import threading
+import contextlib
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# settings of the former "camera.py spectrum 4 brightness 100 ..." syntax
+LEGACY_SETTINGS = {"spectrum", "brightness", "exposure", "filename", "ip"}
+
+
+class CommandError(Exception):
+    """
+    Invalid command line (raised instead of exiting, batch jobs report it as result)
+    """
+
+
+class _Parser(argparse.ArgumentParser):
+    def error(self, message):
+        raise CommandError(f"{self.prog}: {message}")
+
+
+def _client(args):
+    import api_v1
+
+    kwargs = {"raise_errors": True}
+    if args.timeout is not None:
+        kwargs["timeout"] = args.timeout
+    return api_v1.get_client(args.ip, args.key, **kwargs)
+
+
+def _camera(args):
+    import configuration
+
+    return args.ip or configuration.settings()["ip_address"]
+
+
+def cmd_status(client, args):
+    value = client.get_info() if args.info else client.get_status()
+    return value, None if value is not None else "no response"
+
+
+def cmd_capture(client, args):
+    if args.ms:
+        file_info = client.take_ms_image()
+        if file_info is None:
+            return None, "capture failed"
+        if args.path is None:
+            return file_info, None
+        report = client.download_files(file_info["files"], file_info["source"], path=args.path)
+        return report, f"{report.failed} downloads failed" if report.failed else None
+
+    file_info = client.save_mono_image(args.spectrum, args.brightness, args.exposure, args.filename,
+                                       checksum=args.checksum)
+    return file_info, None if file_info is not None else "image not received"
+
+
+def cmd_sweep(client, args):
+    import sweep
+
+    spectra = [int(spectrum) for spectrum in args.spectra.split(",")] if args.spectra else None
+    steps = [sweep.Step(spectrum, args.brightness, args.exposure)
+             for spectrum in spectra] if spectra else sweep.all_spectra(args.brightness, args.exposure)
+    result = sweep.sweep(client, steps, path=args.path, file_extension=args.format, name=args.name)
+    failed = sum(1 for frame in result.frames if not frame.ok)
+    return result, f"{failed} steps failed" if failed else None
+
+
+def cmd_list(client, args):
+    import sync
+
+    files = sync.list_remote_files(client, args.source, start_datetime=args.start, end_datetime=args.end)
+    if files is None:
+        return None, "file list not received"
+    return {"source": args.source, "files": files}, None
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def _manifest(path):
+    # jobs of a batch share one manifest per database file
+    import sync
+
+    with _manifests_lock:
+        if path not in _manifests:
+            _manifests[path] = sync.Manifest(path)
+        return _manifests[path]
+
+
+def cmd_sync(client, args):
+    import sync
+
+    report = sync.sync_source(client, _manifest(args.manifest), args.source, path=args.path,
+                              start_datetime=args.start, end_datetime=args.end, delete=args.delete)
+    if report is None:
+        return None, "file list not received"
+    failed = report.download.failed if report.download else 0
+    return report, f"{failed} downloads failed" if failed else None
+
+
+def cmd_delete(client, args):
+    import cleanup
+
+    files = args.files
+    if not files:
+        if args.older_than is None and args.keep_last is None:
+            raise CommandError("delete: file names, --older-than or --keep-last required")
+        files = cleanup.select_files(client, args.source, older_than=args.older_than, keep_last=args.keep_last)
+        if files is None:
+            return None, "file list not received"
+        if args.dry_run:
+            return {"source": args.source, "files": files}, None
+
+    report = cleanup.delete_files(client, files, args.source)
+    return report, f"{len(report.failed)} files not deleted" if report.failed else None
+
+
+def cmd_upload(client, args):
+    import os
+    import uploader
+
+    filename = args.filename or os.path.basename(args.file)
+    result = uploader.upload(client, args.file, filename, verify=args.verify)
+    return result, result.error
+
+
+def cmd_fleet(args, emit):
+    import fleet
+
+    if not args.job:
+        raise CommandError("fleet: command required")
+    job = parse(args.job)
+    if job.command in ("fleet", "batch"):
+        raise CommandError(f"fleet: {job.command} can't run per camera")
+
+    inventory = fleet.Fleet.from_file(args.cameras, max_workers=args.max_workers)
+    labels = dict(label.split("=", 1) for label in args.label)
+    cameras = inventory.select(**labels) if labels else inventory.cameras
+
+    def operation(client):
+        return job.handler(client, job)  # (value, error)
+
+    report = inventory.run(operation, cameras=cameras, deadline=args.deadline)
+    ok = True
+    for name, result in report.results.items():
+        value, error = result.value if result.ok else (None, result.error)
+        emit(_record(job.command, name, value, error, result.duration))
+        ok = ok and error is None
+    return ok
+
+
+def _record(command, camera, value, error, duration):
+    record = {"command": command, "camera": camera, "ok": error is None, "duration": round(duration, 3)}
+    if value is not None:
+        if hasattr(value, "summary"):
+            record["summary"] = value.summary()
+        record["result"] = dataclasses.asdict(value) if dataclasses.is_dataclass(value) else value
+    if error is not None:
+        record["error"] = error
+    return record
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    return str(value)
+
+
+def run(args, emit):
+    """
+    Run a parsed command
+    :param args: result of parse()
+    :param emit: function called with the result record (python dict) of every camera
+    :return: True if the command succeeded
+    """
+    if args.command == "fleet":
+        return cmd_fleet(args, emit)
+    if args.command == "batch":
+        return cmd_batch(args, emit)
+
+    start = time.monotonic()
+    try:
+        value, error = args.handler(_client(args), args)
+    except CommandError:
+        raise
+    except Exception as err:  # includes resilience.CameraError
+        value, error = None, f"{type(err).__name__}: {err}"
+    emit(_record(args.command, _camera(args), value, error, time.monotonic() - start))
+    return error is None
+
+
+def read_jobs(file):
+    """
+    Read commands, one per line in command line syntax or as JSON list of arguments, # starts a comment
+    :param file: text file object
+    :return: list of (line number, argument list)
+    """
+    jobs = []
+    for number, line in enumerate(file, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        jobs.append((number, json.loads(line) if line.startswith("[") else shlex.split(line)))
+    return jobs
+
+
+def cmd_batch(args, emit):
+    if args.file == "-":
+        jobs = read_jobs(sys.stdin)
+    else:
+        with open(args.file) as f:
+            jobs = read_jobs(f)
+
+    slots = {}  # camera -> semaphore, commands on the same camera don't overlap
+    slots_lock = threading.Lock()
+
+    def slot(camera):
+        with slots_lock:
+            if camera not in slots:
+                slots[camera] = threading.BoundedSemaphore(args.per_camera)
+            return slots[camera]
+
+    def execute(number, argv):
+        def emit_job(record):
+            emit({"job": number, **record})
+
+        try:
+            job = parse(argv)
+            if job.command == "batch":
+                raise CommandError("batch: can't be nested")
+            if job.command == "fleet":
+                return run(job, emit_job)
+            with slot(_camera(job)):
+                return run(job, emit_job)
+        except (Exception, SystemExit) as err:  # invalid line or --help, the other jobs continue
+            emit_job({"command": argv[0] if argv else None, "ok": False, "error": str(err)})
+            return False
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = [executor.submit(execute, number, argv) for number, argv in jobs]
+        return all([future.result() for future in as_completed(futures)])
+
+
+def _parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--ip", help="IP address of the camera, default from the configuration")
+    common.add_argument("--key", help="API key of the camera, default from the configuration")
+    common.add_argument("--timeout", type=float, help="timeout in seconds")
+
+    parser = _Parser(prog="camera.py", description="RAYN Vision System camera commands, results are printed as JSON")
+    parser.add_argument("--config", help="configuration file (see configuration.py)")
+    parser.add_argument("--profile", help="configuration profile")
+    commands = parser.add_subparsers(dest="command", parser_class=_Parser)
+
+    command = commands.add_parser("status", parents=[common], help="camera status")
+    command.add_argument("--info", action="store_true", help="camera information instead of status")
+    command.set_defaults(handler=cmd_status)
+
+    command = commands.add_parser("capture", parents=[common], help="monochrome or multispectral image")
+    command.add_argument("--spectrum", type=int, default=0, help="0-10, 0 is dark")
+    command.add_argument("--brightness", type=int, default=0, help="LED brightness 0-1000")
+    command.add_argument("--exposure", type=float, default=0.0, help="exposure time in seconds")
+    command.add_argument("--filename", default="image.jpg", help="local file, format from the extension")
+    command.add_argument("--checksum", help="hash algorithm, e.g. sha256")
+    command.add_argument("--ms", action="store_true", help="multispectral image with the global settings")
+    command.add_argument("--path", help="download the multispectral image files to this folder")
+    command.set_defaults(handler=cmd_capture)
+
+    command = commands.add_parser("sweep", parents=[common], help="monochrome images of several spectra")
+    command.add_argument("--spectra", help="comma separated spectra, all except dark if not set")
+    command.add_argument("--brightness", type=int, default=500, help="LED brightness 0-1000")
+    command.add_argument("--exposure", type=float, default=0.1, help="exposure time in seconds")
+    command.add_argument("--path", default="sweep", help="local folder for the images")
+    command.add_argument("--format", choices=[".png", ".jpg"], default=".png")
+    command.add_argument("--name", default="sweep", help="file name prefix")
+    command.set_defaults(handler=cmd_sweep)
+
+    command = commands.add_parser("list", parents=[common], help="files of a source")
+    command.add_argument("--source", default="scheduler")
+    command.add_argument("--start", help="start date and time (ISO8601)")
+    command.add_argument("--end", help="end date and time (ISO8601)")
+    command.set_defaults(handler=cmd_list)
+
+    command = commands.add_parser("sync", parents=[common], help="download new files of a source")
+    command.add_argument("--source", default="scheduler")
+    command.add_argument("--path", help="local folder, defaults to the source name")
+    command.add_argument("--manifest", default="manifest.sqlite", help="manifest database")
+    command.add_argument("--start", help="start date and time (ISO8601)")
+    command.add_argument("--end", help="end date and time (ISO8601)")
+    command.add_argument("--delete", action="store_true", help="delete verified files from the camera")
+    command.set_defaults(handler=cmd_sync)
+
+    command = commands.add_parser("delete", parents=[common], help="delete files from the camera")
+    command.add_argument("files", nargs="*", help="file names, or select them with --older-than/--keep-last")
+    command.add_argument("--source", default="scheduler")
+    command.add_argument("--older-than", type=float, help="files older than this number of days")
+    command.add_argument("--keep-last", type=int, help="keep the newest files")
+    command.add_argument("--dry-run", action="store_true", help="only list the selected files")
+    command.set_defaults(handler=cmd_delete)
+
+    command = commands.add_parser("upload", parents=[common], help="upload a file")
+    command.add_argument("file", help="local file")
+    command.add_argument("--filename", help="name on the camera, defaults to the local name")
+    command.add_argument("--verify", action="store_true", help="check the file list after the upload")
+    command.set_defaults(handler=cmd_upload)
+
+    command = commands.add_parser("fleet", help="run a command on all cameras of an inventory")
+    command.add_argument("--cameras", required=True, help="camera inventory (JSON, see fleet.py)")
+    command.add_argument("--label", action="append", default=[], help="only cameras with this label, key=value")
+    command.add_argument("--deadline", type=float, help="maximum duration in seconds")
+    command.add_argument("--max-workers", type=int, default=32, help="cameras addressed at the same time")
+    command.add_argument("job", nargs=argparse.REMAINDER, help="command and its arguments")
+
+    command = commands.add_parser("batch", help="run commands from a file concurrently")
+    command.add_argument("file", nargs="?", default="-", help="one command per line, - reads stdin")
+    command.add_argument("--jobs", type=int, default=8, help="commands running at the same time")
+    command.add_argument("--per-camera", type=int, default=1, help="commands running at the same time per camera")
+
+    return parser
+
+
+def parse(argv):
+    """
+    Parse a command line
+    :param argv: list of arguments without the program name
+    :return: argparse.Namespace, raises CommandError if invalid
+    """
+    argv = list(argv)
+    if argv and argv[0] in LEGACY_SETTINGS:  # "spectrum 4 brightness 100 ..."
+        argv = ["capture"] + [f"--{arg}" if index % 2 == 0 else arg for index, arg in enumerate(argv)]
+    if not argv:
+        argv = ["capture"]  # monochrome image with default settings
+
+    return _parser().parse_args(argv)
+
+
+def main(argv=None):
+    out = sys.stdout
+    lock = threading.Lock()
+
+    def emit(record):
+        with lock:
+            out.write(json.dumps(record, default=_json_default) + "\n")
+            out.flush()
+
+    try:
+        args = parse(sys.argv[1:] if argv is None else argv)
+    except CommandError as err:
+        print(err, file=sys.stderr)
+        return 2
+
+    # messages of the API functions go to stderr, stdout only carries the JSON results
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            if args.config or args.profile:
+                import configuration
+                configuration.load(args.config, profile=args.profile)
+            ok = run(args, emit)
+        except (CommandError, ValueError, OSError) as err:  # also invalid configuration
+            print(err, file=sys.stderr)
+            return 2
 
-# default parameters
-spectrum = 0  # spectrum 0
-brightness = 0  # LEDs off
-exposure = 0.0  # exposure in 0.3s
-filename = "image.jpg"  # default filename and default JPG
+    return 0 if ok else 1
 
 
 if __name__ == "__main__":
-    n = len(sys.argv)  # check number of arguments TODO change argument parsing and add help
-
-    for i in range(1, n, 2):  # check for command line arguments
-        if sys.argv[i] == "spectrum":  # spectrum 0 - 10, 0 is dark
-            spectrum = sys.argv[i + 1]
-        elif sys.argv[i] == "brightness":  # LED brightness range 0- 1000
-            brightness = sys.argv[i + 1]
-        elif sys.argv[i] == "filename":  # optional filename to save to
-            filename = sys.argv[i + 1]
-        elif sys.argv[i] == "exposure":  # exposure time rang 0.0 - 0.25
-            exposure = sys.argv[i + 1]
-        elif sys.argv[i] == "ip":  # IP Address
-            ip_address = sys.argv[i + 1]
-        else:  # check for invalid arguments
-            print("argument unknown: " + sys.argv[i])
-
-    api_v1.take_mono_image(spectrum=spectrum, brightness=brightness, exposure=exposure, filename=filename)
+    sys.exit(main())
@@ -0,0 +1,299 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Local catalog of the files of all cameras (SQLite, indexed by time). Time range queries and the latest
+# capture per camera are answered locally, refresh() only requests the files added since the last refresh.
+#
+# with catalog.Catalog() as files:
+#     files.refresh(client, "scheduler")
+#     images = files.query(client.ip_address, "scheduler", start="2024-05-01", end="2024-05-02")
+
+import re
+import time
+import sqlite3
+import datetime
+import threading
+from dataclasses import dataclass
+
+import downloader
+
+# date and time in file names, e.g. 20240501-120000_5.png or 2024-05-01T12-00-00.png
+_TIMESTAMP = re.compile(r"(\d{4})-?(\d{2})-?(\d{2})[-_T ]?(\d{2})[-:]?(\d{2})[-:]?(\d{2})")
+
+
+def parse_timestamp(filename):
+    """
+    Find the date and time in a file name
+    :param filename: file name on the camera
+    :return: ISO8601 string (seconds) or None
+    """
+    match = _TIMESTAMP.search(filename)
+    if match is None:
+        return None
+    try:
+        return datetime.datetime(*map(int, match.groups())).isoformat(timespec="seconds")
+    except ValueError:  # digits that are no date
+        return None
+
+
+def _iso(value):
+    # datetime or ISO8601 string -> ISO8601 string comparable with the stored timestamps
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    return value.isoformat(timespec="seconds")
+
+
+@dataclass
+class CatalogEntry:
+    """
+    File of a camera source
+    """
+    camera: str
+    source: str
+    filename: str
+    timestamp: str  # ISO8601, from the file name or the time the file was first seen
+    size: int = None
+    local_path: str = None  # set when downloaded
+    on_camera: bool = True  # False after the file was deleted from the camera
+
+
+class Catalog:
+    """
+    Time-indexed record of the files seen per camera and source
+    """
+
+    def __init__(self, path="catalog.sqlite"):
+        """
+        :param path: path of the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                camera TEXT NOT NULL,
+                source TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                size INTEGER,
+                local_path TEXT,
+                on_camera INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (camera, source, filename)
+            );
+            CREATE INDEX IF NOT EXISTS files_time ON files (camera, source, timestamp);
+            CREATE TABLE IF NOT EXISTS listings (
+                camera TEXT NOT NULL,
+                source TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                last_file TEXT,
+                refreshed REAL NOT NULL,
+                PRIMARY KEY (camera, source)
+            );""")
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _add(self, camera, source, files, seen):
+        # new files are inserted, files seen again are marked as on the camera
+        rows = [(camera, source, file, parse_timestamp(file) or seen) for file in files]
+        self._db.executemany("""INSERT INTO files (camera, source, filename, timestamp) VALUES (?, ?, ?, ?)
+                                ON CONFLICT (camera, source, filename) DO UPDATE SET on_camera = 1""", rows)
+
+    def refresh(self, client, source, page_size=500, full=False):
+        """
+        Update the catalog with the file list of the camera. Only the files after the last known file are
+        requested, the whole list is requested again if the camera list changed otherwise (files deleted).
+        :param client: CameraClient of the camera
+        :param source: source folder (see README)
+        :param page_size: number of files requested per files/list call
+        :param full: request the whole file list
+        :return: number of new files or None if the camera could not be reached
+        """
+        camera = client.ip_address
+        seen = datetime.datetime.now().isoformat(timespec="seconds")
+
+        with self._lock:
+            row = self._db.execute("SELECT count, last_file FROM listings WHERE camera = ? AND source = ?",
+                                   (camera, source)).fetchone()
+
+        if row is not None and row[1] is not None and not full:
+            try:
+                new_files = self._tail(client, source, *row, page_size)
+            except IOError as err:
+                print(err)
+                return None
+            if new_files is not None:
+                with self._lock:
+                    self._add(camera, source, new_files, seen)
+                    self._db.execute("UPDATE listings SET count = ?, last_file = ?, refreshed = ? "
+                                     "WHERE camera = ? AND source = ?",
+                                     (row[0] + len(new_files), new_files[-1] if new_files else row[1], time.time(),
+                                      camera, source))
+                    self._db.commit()
+                return len(new_files)
+
+        # first refresh or the list changed: request all files, files not listed anymore were deleted
+        try:
+            files = list(client.iter_files(source=source, page_size=page_size))
+        except IOError as err:
+            print(err)
+            return None
+
+        with self._lock:
+            known = {file for (file,) in self._db.execute(
+                "SELECT filename FROM files WHERE camera = ? AND source = ? AND on_camera = 1", (camera, source))}
+            self._db.execute("UPDATE files SET on_camera = 0 WHERE camera = ? AND source = ?", (camera, source))
+            self._add(camera, source, files, seen)
+            self._db.execute("INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?)",
+                             (camera, source, len(files), files[-1] if files else None, time.time()))
+            self._db.commit()
+
+        return len([file for file in files if file not in known])
+
+    @staticmethod
+    def _tail(client, source, count, last_file, page_size):
+        # files listed after the last known file, None if the file list changed otherwise
+        new_files = []
+        while True:
+            # the page starts one file earlier, the last known file must be in it (0- or 1-based index)
+            page = client.get_file_list(source=source, index=count + len(new_files) - 1, limit=page_size)
+            if page is None:
+                raise IOError(f"Listing {source} failed at index {count + len(new_files) - 1}")
+            files = page["files"]
+            if last_file not in files:
+                return None
+            added = files[files.index(last_file) + 1:]
+            new_files += added
+
+            total = page.get("total")
+            if total is not None and count + len(new_files) >= total:
+                return new_files if count + len(new_files) == total else None
+            if not added or (total is None and len(files) < page_size):
+                return new_files if total is None else None
+            last_file = new_files[-1]
+
+    def record_downloads(self, camera, source, report):
+        """
+        Record the local paths and sizes of downloaded files
+        :param camera: camera identifier (IP address)
+        :param source: source folder (see README)
+        :param report: DownloadReport
+        """
+        rows = [(result.path, result.bytes, camera, source, result.filename)
+                for result in report.results if result.status == downloader.OK]
+        with self._lock:
+            self._db.executemany("UPDATE files SET local_path = ?, size = ? WHERE camera = ? AND source = ? "
+                                 "AND filename = ?", rows)
+            self._db.commit()
+
+    def mark_deleted(self, camera, source, filenames):
+        """
+        Record files deleted from the camera
+        """
+        with self._lock:
+            self._db.executemany("UPDATE files SET on_camera = 0 WHERE camera = ? AND source = ? AND filename = ?",
+                                 [(camera, source, filename) for filename in filenames])
+            self._db.commit()
+
+    def query(self, camera=None, source=None, start=None, end=None, on_camera=None, downloaded=None, limit=None):
+        """
+        Get the files in a time range, ordered by time
+        :param camera: camera identifier (IP address), all cameras if not set
+        :param source: source folder (see README), all sources if not set
+        :param start: start of the time range (datetime or ISO8601), inclusive
+        :param end: end of the time range (datetime or ISO8601), inclusive
+        :param on_camera: only files still on the camera (True) or deleted from it (False)
+        :param downloaded: only files downloaded (True) or not downloaded (False)
+        :param limit: maximum number of files
+        :return: list of CatalogEntry
+        """
+        conditions, params = [], []
+        for column, value in (("camera", camera), ("source", source)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(_iso(start))
+        if end is not None:
+            conditions.append("timestamp <= ?")
+            params.append(_iso(end))
+        if on_camera is not None:
+            conditions.append("on_camera = ?")
+            params.append(int(on_camera))
+        if downloaded is not None:
+            conditions.append("local_path IS NOT NULL" if downloaded else "local_path IS NULL")
+
+        query = "SELECT camera, source, filename, timestamp, size, local_path, on_camera FROM files"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp, filename"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+
+        return [CatalogEntry(*row[:6], on_camera=bool(row[6])) for row in rows]
+
+    def latest(self, source=None, on_camera=None):
+        """
+        Get the newest file of every camera
+        :param source: only files of this source
+        :param on_camera: only files still on the camera (True) or deleted from it (False)
+        :return: python dict camera -> CatalogEntry
+        """
+        conditions, params = [], []
+        if source is not None:
+            conditions.append("source = ?")
+            params.append(source)
+        if on_camera is not None:
+            conditions.append("on_camera = ?")
+            params.append(int(on_camera))
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+        # SQLite returns the other columns of the row with the maximum
+        query = f"SELECT camera, source, filename, MAX(timestamp), size, local_path, on_camera FROM files{where} " \
+                f"GROUP BY camera"
+
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+
+        return {row[0]: CatalogEntry(*row[:6], on_camera=bool(row[6])) for row in rows}
+
+    def files_in_range(self, client, start_datetime, end_datetime, source, refresh=True):
+        """
+        Local replacement of get_files_in_range(), the catalog is refreshed first
+        :param client: CameraClient of the camera
+        :param start_datetime: Start date and time (according to ISO8601)
+        :param end_datetime: End date and time (according to ISO8601)
+        :param source: source folder (see README)
+        :param refresh: request the new files from the camera first
+        :return: python dict with files and source like get_files_in_range(), None if the refresh failed
+        """
+        if refresh and self.refresh(client, source) is None:
+            return None
+        entries = self.query(client.ip_address, source, start=start_datetime, end=end_datetime, on_camera=True)
+        return {"files": [entry.filename for entry in entries], "source": source}
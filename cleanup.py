@@ -0,0 +1,228 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Bulk delete of camera files with a bounded number of parallel requests and retries,
+# and retention policies (older than N days, keep the last N files, only files verified in a manifest)
+
+import time
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import resilience
+import sync
+
+DELETED = "deleted"
+MISSING = "missing"  # file was not on the camera (anymore)
+FAILED = "failed"
+
+
+@dataclass
+class DeleteResult:
+    """
+    Result of a single file delete
+    """
+    filename: str
+    source: str
+    status: str
+    attempts: int = 0
+    duration: float = 0.0
+    error: str = None
+
+
+@dataclass
+class DeleteReport:
+    """
+    Aggregated result of a bulk delete
+    """
+    source: str
+    files: list = field(default_factory=list)  # files selected for deletion
+    results: list = field(default_factory=list)
+    started: float = field(default_factory=time.monotonic)
+    finished: float = None
+
+    def count(self, status):
+        return sum(1 for result in self.results if result.status == status)
+
+    @property
+    def deleted(self):
+        return [result.filename for result in self.results if result.status == DELETED]
+
+    @property
+    def failed(self):
+        return {result.filename: result.error for result in self.results if result.status == FAILED}
+
+    @property
+    def duration(self):
+        end = self.finished if self.finished is not None else time.monotonic()
+        return end - self.started
+
+    def summary(self):
+        return (f"{len(self.results)}/{len(self.files)} files: {self.count(DELETED)} deleted, "
+                f"{self.count(MISSING)} missing, {self.count(FAILED)} failed in {self.duration:.2f} s")
+
+
+def delete_file(client, filename, source, retries=2, backoff_factor=0.5, timeout=None):
+    """
+    Delete a single file, retried if the camera does not answer or reports a server error
+    :param client: CameraClient of the camera
+    :param filename: name of the file on the camera
+    :param source: source folder (see README)
+    :param retries: number of retries
+    :param backoff_factor: wait backoff_factor * 2 ** (attempt - 1) seconds before a retry
+    :param timeout: sets the timeout in seconds
+    :return: DeleteResult
+    """
+    start = time.monotonic()
+    result = DeleteResult(filename, source, FAILED)
+
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff_factor * 2 ** (attempt - 1))
+        result.attempts = attempt + 1
+
+        try:
+            response = client.request("files/delete", settings={"filename": filename, "source": source},
+                                      timeout=timeout)
+        except resilience.CameraResponseError as err:  # client with raise_errors
+            response = err.response
+        except resilience.CameraError:
+            response = None
+
+        if response is None:
+            result.error = "no response"
+        elif response.status_code == 200:
+            result.status, result.error = DELETED, None
+            break
+        elif response.status_code == 404:
+            result.status, result.error = MISSING, None
+            break
+        else:
+            result.error = f"response code {response.status_code}"
+            if response.status_code < 500:  # client errors are not retried
+                break
+
+    result.duration = time.monotonic() - start
+
+    return result
+
+
+def delete_files(client, file_list, source, max_workers=4, retries=2, backoff_factor=0.5, progress=None,
+                 timeout=None):
+    """
+    Delete multiple files in parallel
+    :param client: CameraClient of the camera
+    :param file_list: list with the file names that should be deleted
+    :param source: source folder (see README)
+    :param max_workers: number of parallel delete requests
+    :param retries: number of retries per file
+    :param backoff_factor: wait backoff_factor * 2 ** (attempt - 1) seconds before a retry
+    :param progress: optional function called with (DeleteResult, DeleteReport) after every file
+    :param timeout: sets the timeout in seconds
+    :return: DeleteReport
+    """
+    report = DeleteReport(source=source, files=list(file_list))
+    lock = threading.Lock()
+
+    def delete(filename):
+        result = delete_file(client, filename, source, retries=retries, backoff_factor=backoff_factor,
+                             timeout=timeout)
+        with lock:
+            report.results.append(result)
+            if progress:
+                progress(result, report)
+        return result
+
+    if file_list:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(file_list)))) as executor:
+            list(executor.map(resilience.in_context(delete), file_list))
+
+    report.finished = time.monotonic()
+
+    return report
+
+
+def select_files(client, source, older_than=None, keep_last=None, manifest=None, page_size=500):
+    """
+    Select the files of a source matching a retention policy, all given conditions must apply
+    :param client: CameraClient of the camera
+    :param source: source folder (see README)
+    :param older_than: only files created more than this number of days ago
+    :param keep_last: keep the newest files (by name, the camera names files by date and time)
+    :param manifest: only files downloaded and verified in this sync.Manifest
+    :param page_size: number of files requested per files/list call
+    :return: sorted list with file names or None if the camera could not be reached
+    """
+    if older_than is not None:
+        end = datetime.datetime.now() - datetime.timedelta(days=older_than)
+        files = sync.list_remote_files(client, source, start_datetime=datetime.datetime(1970, 1, 1).isoformat(),
+                                       end_datetime=end.isoformat())
+    else:
+        files = sync.list_remote_files(client, source, page_size=page_size)
+
+    if files is None:
+        return None
+
+    files = sorted(files)
+
+    if keep_last:
+        if older_than is not None:  # the newest files of the whole source are kept
+            newest = sync.list_remote_files(client, source, page_size=page_size)
+            if newest is None:
+                return None
+            kept = set(sorted(newest)[-keep_last:])
+        else:
+            kept = set(files[-keep_last:])
+        files = [file for file in files if file not in kept]
+
+    if manifest is not None:
+        downloaded = manifest.files(client.ip_address, source, state=sync.DOWNLOADED)
+        files = [file for file in files if file in downloaded and sync.is_verified(*downloaded[file][:3])]
+
+    return files
+
+
+def apply_retention(client, source, older_than=None, keep_last=None, manifest=None, dry_run=False,
+                    max_workers=4, retries=2, progress=None):
+    """
+    Delete the files of a source matching a retention policy (see select_files())
+    :param client: CameraClient of the camera
+    :param source: source folder (see README)
+    :param older_than: only files created more than this number of days ago
+    :param keep_last: keep the newest files
+    :param manifest: only files downloaded and verified in this sync.Manifest, deleted files are marked in it
+    :param dry_run: only select the files, nothing is deleted
+    :param max_workers: number of parallel delete requests
+    :param retries: number of retries per file
+    :param progress: optional function called with (DeleteResult, DeleteReport) after every file
+    :return: DeleteReport (selected files without results for a dry run) or None if the camera could not
+             be reached
+    """
+    files = select_files(client, source, older_than=older_than, keep_last=keep_last, manifest=manifest)
+    if files is None:
+        return None
+
+    if dry_run:
+        report = DeleteReport(source=source, files=files)
+        report.finished = report.started
+        return report
+
+    def record(result, report):
+        if manifest is not None and result.status in (DELETED, MISSING):
+            manifest.mark_deleted(client.ip_address, source, result.filename)
+        if progress:
+            progress(result, report)
+
+    return delete_files(client, files, source, max_workers=max_workers, retries=retries, progress=record)
@@ -0,0 +1,247 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Runtime configuration of the camera clients (see config_example.toml). The settings of a camera are merged from
+# (lowest to highest priority): built-in defaults, config.py (optional, CAMERA_IP, UNIQUE_KEY, API_V1_TIMEOUT),
+# the top level of the configuration file, the active profile, RAYN_* environment variables and the section of
+# the camera. Clients read the configuration when they are created, nothing is bound at import time.
+#
+# configuration.load("rayn.toml", profile="greenhouse")
+# client = api_v1.get_client("10.1.2.5")  # key, timeouts, pool size, ... from the configuration
+
+import os
+import copy
+import json
+import threading
+
+DEFAULTS = {
+    "ip_address": "10.1.2.1",  # AP mode IP address
+    "key": "",
+    "timeout": 30.0,  # default timeout in seconds
+    "endpoint_timeouts": {},  # command -> seconds, e.g. {"images/takeimage": 180}
+    "pool_size": 4,  # maximum number of open connections per camera
+    "retries": 2,
+    "backoff_factor": 0.5,
+    "max_downloads": 4,  # parallel file downloads per camera
+    "cache": False,  # reuse the responses of status, info and file lists (see cache.py)
+    "cache_ttls": {},  # command -> seconds, replaces cache.DEFAULT_TTLS if not empty
+    "cache_entries": 256,
+    "circuit_breaker": True,
+    "failure_threshold": 5,  # failed calls in a row that open the circuit breaker
+    "reset_timeout": 30.0,  # seconds until an open circuit breaker lets a call through
+    "raise_errors": False,
+}
+
+# names in config.py -> settings
+LEGACY_NAMES = {"CAMERA_IP": "ip_address", "UNIQUE_KEY": "key", "API_V1_TIMEOUT": "timeout"}
+
+ENV_PREFIX = "RAYN_"  # e.g. RAYN_IP_ADDRESS, RAYN_TIMEOUT, RAYN_ENDPOINT_TIMEOUTS='{"images/takeimage": 180}'
+
+# configuration files searched in the working directory if RAYN_CONFIG is not set
+FILES = ("rayn.toml", "rayn.yaml", "rayn.yml", "rayn.json")
+
+
+def _check(settings, where):
+    unknown = set(settings) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown settings in {where}: {', '.join(sorted(unknown))}")
+    return settings
+
+
+def _merge(settings, update):
+    # dict settings (endpoint_timeouts, cache_ttls) are merged, others replaced
+    for name, value in update.items():
+        if isinstance(value, dict) and isinstance(settings.get(name), dict):
+            settings[name] = {**settings[name], **value}
+        else:
+            settings[name] = value
+
+
+def _parse_env(name, value):
+    default = DEFAULTS[name]
+    if isinstance(default, bool):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, dict):
+        return json.loads(value)
+    if isinstance(default, (int, float)):
+        return type(default)(value)
+    return value
+
+
+def read_file(path):
+    """
+    Read a configuration file, the format is taken from the file extension
+    :param path: path of a TOML, YAML (requires PyYAML) or JSON file
+    :return: python dict
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".toml":
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            import tomli as tomllib
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+
+    with open(path) as f:
+        if extension in (".yaml", ".yml"):
+            import yaml  # optional dependency
+            return yaml.safe_load(f) or {}
+        if extension == ".json":
+            return json.load(f)
+
+    raise ValueError(f"Unknown configuration format {extension}")
+
+
+def environment(environ=None):
+    """
+    Settings from RAYN_* environment variables
+    :param environ: python dict, defaults to os.environ
+    :return: python dict
+    """
+    environ = os.environ if environ is None else environ
+    settings = {}
+    for name in DEFAULTS:
+        value = environ.get(ENV_PREFIX + name.upper())
+        if value is not None:
+            settings[name] = _parse_env(name, value)
+    return settings
+
+
+class Config:
+    """
+    Settings with profiles and per-camera sections
+    """
+
+    def __init__(self, settings=None, profiles=None, cameras=None, profile=None, overrides=None):
+        """
+        :param settings: python dict, default settings of all cameras
+        :param profiles: python dict profile name -> settings
+        :param cameras: python dict camera IP address -> settings
+        :param profile: name of the active profile
+        :param overrides: settings applied after the profile (e.g. environment variables)
+        """
+        self.defaults = _check(dict(settings or {}), "defaults")
+        self.profiles = {name: _check(dict(values), f"profile {name}") for name, values in (profiles or {}).items()}
+        self.cameras = {ip: _check(dict(values), f"camera {ip}") for ip, values in (cameras or {}).items()}
+        self.overrides = _check(dict(overrides or {}), "overrides")
+        if profile is not None and profile not in self.profiles:
+            raise ValueError(f"Unknown profile {profile}")
+        self.profile = profile
+
+    @classmethod
+    def from_dict(cls, data, profile=None, overrides=None):
+        """
+        :param data: python dict with settings, "profiles" and "cameras" tables (see config_example.toml)
+        :param profile: name of the active profile
+        :param overrides: settings applied after the profile
+        :return: Config
+        """
+        data = dict(data)
+        profiles = data.pop("profiles", None)
+        cameras = data.pop("cameras", None)
+        return cls(data, profiles=profiles, cameras=cameras, profile=profile, overrides=overrides)
+
+    @classmethod
+    def from_file(cls, path, profile=None, overrides=None):
+        """
+        :param path: path of a TOML, YAML or JSON file
+        :param profile: name of the active profile
+        :param overrides: settings applied after the profile
+        :return: Config
+        """
+        return cls.from_dict(read_file(path), profile=profile, overrides=overrides)
+
+    def settings(self, ip_address=None):
+        """
+        Resolve the settings of a camera
+        :param ip_address: IP address of the camera, the configured default camera if not set
+        :return: python dict with all settings of DEFAULTS
+        """
+        settings = copy.deepcopy(DEFAULTS)
+        _merge(settings, self.defaults)
+        if self.profile is not None:
+            _merge(settings, self.profiles[self.profile])
+        _merge(settings, self.overrides)
+
+        if ip_address is not None:
+            settings["ip_address"] = ip_address
+        _merge(settings, self.cameras.get(settings["ip_address"], {}))
+
+        return settings
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def _legacy_settings():
+    try:
+        import config  # optional config.py (see config_example.py)
+    except ImportError:
+        return {}
+    return {name: getattr(config, legacy) for legacy, name in LEGACY_NAMES.items() if hasattr(config, legacy)}
+
+
+def load(path=None, profile=None, environ=None):
+    """
+    Load the configuration and make it the active one, clients created afterwards use it
+    (api_v1.close_clients() drops the shared clients created with the previous configuration)
+    :param path: configuration file, defaults to RAYN_CONFIG or the first of FILES found in the working directory
+    :param profile: name of the active profile, defaults to RAYN_PROFILE
+    :param environ: python dict with environment variables, defaults to os.environ
+    :return: Config
+    """
+    environ = os.environ if environ is None else environ
+
+    if path is None:
+        path = environ.get(ENV_PREFIX + "CONFIG") or next((file for file in FILES if os.path.isfile(file)), None)
+    data = {} if path is None else read_file(path)
+
+    settings = _legacy_settings()
+    _merge(settings, {name: value for name, value in data.items() if name not in ("profiles", "cameras")})
+    config = Config(settings, profiles=data.get("profiles"), cameras=data.get("cameras"),
+                    profile=profile or environ.get(ENV_PREFIX + "PROFILE"), overrides=environment(environ))
+
+    set_config(config)
+    return config
+
+
+def set_config(config):
+    """
+    Make a Config the active configuration
+    """
+    global _config
+    with _config_lock:
+        _config = config
+
+
+def get_config():
+    """
+    Get the active configuration, loaded on first use
+    :return: Config
+    """
+    with _config_lock:
+        config = _config
+    return config if config is not None else load()
+
+
+def settings(ip_address=None):
+    """
+    Resolve the settings of a camera from the active configuration
+    :param ip_address: IP address of the camera, the configured default camera if not set
+    :return: python dict
+    """
+    return get_config().settings(ip_address)
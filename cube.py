@@ -0,0 +1,197 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Multispectral cube - the band images of one capture as a single NumPy array (bands x height x width)
+# requires numpy, decoding images requires Pillow (pip install numpy pillow)
+
+import io
+import os
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from api_v1 import SPECTRA
+
+# wavelength in nm -> spectrum index, e.g. 630 -> 5
+WAVELENGTHS = {int(band.split()[0]): spectrum for spectrum, (name, band) in SPECTRA.items()
+               if band and band.endswith("nm")}
+
+
+def _cube_path(path):
+    # np.save() appends .npy to other paths, the sidecar file of the spectra has to use the same name
+    path = os.fspath(path)
+    return path if path.endswith((".npy", ".npz")) else f"{path}.npy"
+
+
+def parse_spectrum(filename):
+    """
+    Find the spectrum index of a band image from its file name. Recognized are wavelengths
+    (e.g. "image_630nm.png", "image_630.png") and a trailing spectrum index (e.g. "sweep_5.png").
+    :param filename: file name of the band image
+    :return: spectrum index or None
+    """
+    name = os.path.splitext(os.path.basename(filename))[0]
+
+    for number in re.findall(r"(?<!\d)(\d{3})(?!\d)", name):
+        if int(number) in WAVELENGTHS:
+            return WAVELENGTHS[int(number)]
+
+    match = re.search(r"[_-](\d{1,2})$", name)
+    if match and int(match.group(1)) in SPECTRA:
+        return int(match.group(1))
+
+    return None
+
+
+def decode_image(image):
+    """
+    Decode a band image to a 2D array
+    :param image: path to the image or image data (bytes)
+    :return: numpy array (height x width)
+    """
+    from PIL import Image  # optional dependency, only needed for decoding
+
+    with Image.open(io.BytesIO(image) if isinstance(image, bytes) else image) as img:
+        if img.mode not in ("L", "I", "I;16", "F"):
+            img = img.convert("L")  # monochrome images stored as color
+        return np.asarray(img)
+
+
+class Cube:
+    """
+    Band images of one capture (bands x height x width) with their spectrum indices
+    """
+
+    def __init__(self, data, spectra):
+        """
+        :param data: numpy array (bands x height x width)
+        :param spectra: list with the spectrum index of every band (see README)
+        """
+        if len(spectra) != data.shape[0]:
+            raise ValueError(f"{len(spectra)} spectra for {data.shape[0]} bands")
+
+        self.data = data
+        self.spectra = list(spectra)
+
+    def __repr__(self):
+        shape = " x ".join(str(size) for size in self.data.shape)
+        return f"Cube({shape}, {self.data.dtype}, spectra {self.spectra})"
+
+    @property
+    def labels(self):
+        """
+        :return: list with (name, main wavelength band) of every band, e.g. ("red", "630 nm")
+        """
+        return [SPECTRA.get(spectrum, (str(spectrum), None)) for spectrum in self.spectra]
+
+    def band(self, spectrum):
+        """
+        Get the image of a spectrum
+        :param spectrum: spectrum index (see README)
+        :return: numpy array (height x width)
+        """
+        return self.data[self.spectra.index(spectrum)]
+
+    @classmethod
+    def from_images(cls, images, spectra=None, max_workers=4):
+        """
+        Assemble a cube from band images, the images are decoded in parallel
+        :param images: list with image paths or image data (bytes)
+        :param spectra: spectrum index of every image, parsed from the file names if not set
+        :param max_workers: number of parallel decoders
+        :return: Cube
+        """
+        if spectra is None:
+            spectra = [parse_spectrum(image) if isinstance(image, str) else None for image in images]
+            unknown = [str(i) for i, spectrum in enumerate(spectra) if spectrum is None]
+            if unknown:
+                raise ValueError(f"Spectrum of image {', '.join(unknown)} unknown, pass spectra explicitly")
+
+        order = sorted(range(len(images)), key=lambda i: spectra[i])
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            bands = list(executor.map(decode_image, [images[i] for i in order]))
+
+        shapes = {band.shape for band in bands}
+        if len(shapes) > 1:
+            raise ValueError(f"Band images have different sizes: {shapes}")
+
+        return cls(np.stack(bands), [spectra[i] for i in order])
+
+    @classmethod
+    def from_capture(cls, file_info, path=None, spectra=None, max_workers=4):
+        """
+        Assemble a cube from the downloaded files of a multispectral image
+        :param file_info: response of take_ms_image() (python dict with files and source)
+        :param path: local folder the files were downloaded to, defaults to the source name
+        :param spectra: spectrum index of every file, parsed from the file names if not set
+        :param max_workers: number of parallel decoders
+        :return: Cube
+        """
+        if path is None:
+            path = file_info["source"]
+
+        return cls.from_images([os.path.join(path, file) for file in file_info["files"]],
+                               spectra=spectra, max_workers=max_workers)
+
+    @classmethod
+    def from_sweep(cls, result, max_workers=4):
+        """
+        Assemble a cube from the frames of a spectral sweep (see sweep.py)
+        :param result: SweepResult
+        :param max_workers: number of parallel decoders
+        :return: Cube
+        """
+        frames = [frame for frame in result.frames if frame.ok]
+
+        return cls.from_images([frame.image if frame.image is not None else frame.path for frame in frames],
+                               spectra=[frame.step.spectrum for frame in frames], max_workers=max_workers)
+
+    def save(self, path, compressed=False):
+        """
+        Save the cube. A .npy file can be opened memory-mapped by load(), the spectra are stored next to it
+        (<path>.json). A .npz file contains both, compressed if requested, but is always read completely.
+        :param path: file path ending with .npy or .npz, .npy is appended to other paths (like numpy does)
+        :param compressed: compress the .npz file
+        :return: path of the saved file
+        """
+        path = _cube_path(path)
+        if path.endswith(".npz"):
+            save = np.savez_compressed if compressed else np.savez
+            save(path, data=self.data, spectra=np.asarray(self.spectra))
+        else:
+            np.save(path, self.data)
+            with open(f"{path}.json", "w") as f:
+                json.dump({"spectra": self.spectra}, f)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Load a saved cube
+        :param path: path of the .npy or .npz file, the path given to save() is accepted as well
+        :param mmap: open a .npy file memory-mapped (read-only, zero-copy) instead of reading it
+        :return: Cube
+        """
+        path = _cube_path(path)
+        if path.endswith(".npz"):
+            with np.load(path) as archive:
+                return cls(archive["data"], archive["spectra"].tolist())
+
+        with open(f"{path}.json") as f:
+            spectra = json.load(f)["spectra"]
+
+        return cls(np.load(path, mmap_mode="r" if mmap else None), spectra)
@@ -0,0 +1,189 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Parallel download of multiple files from one camera
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import resilience
+
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+@dataclass
+class DownloadResult:
+    """
+    Result of a single file download
+    """
+    filename: str
+    source: str
+    status: str
+    path: str = None
+    bytes: int = 0
+    duration: float = 0.0
+    checksum: str = None
+    error: str = None
+
+
+@dataclass
+class DownloadReport:
+    """
+    Aggregated result of a download run
+    """
+    results: list = field(default_factory=list)
+    total_files: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: float = None
+
+    def count(self, status):
+        return sum(1 for result in self.results if result.status == status)
+
+    @property
+    def ok(self):
+        return self.count(OK)
+
+    @property
+    def failed(self):
+        return self.count(FAILED)
+
+    @property
+    def skipped(self):
+        return self.count(SKIPPED)
+
+    @property
+    def bytes(self):
+        return sum(result.bytes for result in self.results)
+
+    @property
+    def duration(self):
+        end = self.finished if self.finished is not None else time.monotonic()
+        return end - self.started
+
+    @property
+    def throughput(self):
+        """
+        :return: download rate in bytes per second
+        """
+        return self.bytes / self.duration if self.duration > 0 else 0.0
+
+    def summary(self):
+        return (f"{len(self.results)}/{self.total_files} files: {self.ok} ok, {self.failed} failed, "
+                f"{self.skipped} skipped, {self.bytes / 1e6:.2f} MB in {self.duration:.2f} s "
+                f"({self.throughput / 1e6:.2f} MB/s)")
+
+
+def download_file(client, filename, source, path, overwrite=False, timeout=None, checksum=None):
+    """
+    Download a single file and stream it to disk
+    :param client: CameraClient of the camera
+    :param filename: name of the file on the camera
+    :param source: source folder (see README)
+    :param path: local folder the file is stored to
+    :param overwrite: download again if the file already exists locally
+    :param timeout: sets the timeout in seconds
+    :param checksum: optional hash algorithm calculated while downloading, e.g. "sha256"
+    :return: DownloadResult
+    """
+    full_path = os.path.join(path, filename)
+
+    if not overwrite and os.path.exists(full_path):
+        return DownloadResult(filename, source, SKIPPED, path=full_path)
+
+    start = time.monotonic()
+
+    try:
+        with client.download_slots:  # limits the number of parallel downloads per camera
+            file_info = client.save_file(filename=filename, source=source, full_path=full_path,
+                                         timeout=timeout, checksum=checksum)
+    except resilience.CameraError as err:  # client with raise_errors
+        return DownloadResult(filename, source, FAILED, duration=time.monotonic() - start,
+                              error=f"{type(err).__name__}: {err}")
+
+    if file_info is None:
+        return DownloadResult(filename, source, FAILED, duration=time.monotonic() - start,
+                              error="file not received")
+
+    return DownloadResult(filename, source, OK, path=full_path, bytes=file_info["bytes"],
+                          duration=time.monotonic() - start, checksum=file_info["checksum"])
+
+
+def download_files(client, file_list, source, path=None, max_workers=None, overwrite=True,
+                   progress=None, timeout=None, checksum=None, processor=None):
+    """
+    Download multiple files in parallel
+    :param client: CameraClient of the camera
+    :param file_list: list with the file names that should be downloaded
+    :param source: source folder (see README)
+    :param path: local path the files should be downloaded to, defaults to the source name
+    :param max_workers: number of worker threads, defaults to the download limit of the camera
+    :param overwrite: download again if a file already exists locally
+    :param progress: optional function called with (DownloadResult, DownloadReport) after every file
+    :param timeout: sets the timeout in seconds
+    :param checksum: optional hash algorithm calculated while downloading, e.g. "sha256"
+    :param processor: optional processing.Processor every downloaded file is submitted to, downloads wait
+                      while the processor is busy
+    :return: DownloadReport
+    """
+    if path is None:
+        path = source
+
+    os.makedirs(path, exist_ok=True)  # creates a folder named after the source to store the images
+
+    if max_workers is None:
+        max_workers = client.max_downloads
+
+    report = DownloadReport(total_files=len(file_list))
+    lock = threading.Lock()
+
+    def worker(filename):
+        try:
+            result = download_file(client, filename, source, path, overwrite=overwrite, timeout=timeout,
+                                   checksum=checksum)
+        except Exception as err:  # a single broken file must not stop the other downloads
+            result = DownloadResult(filename, source, FAILED, error=str(err))
+
+        if processor is not None and result.status == OK:
+            try:
+                processor.submit(result.path)  # blocks while processing is behind
+            except Exception as err:  # the file is on disk but not processed, the other downloads continue
+                result.status = FAILED
+                result.error = f"processing failed: {type(err).__name__}: {err}"
+
+        with lock:
+            report.results.append(result)
+            if progress:
+                progress(result, report)
+
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        list(executor.map(resilience.in_context(worker), file_list))
+
+    report.finished = time.monotonic()
+
+    return report
+
+
+def print_progress(result, report):
+    """
+    Progress function printing one line per file
+    """
+    print(f"[{len(report.results)}/{report.total_files}] {result.status} {result.filename} "
+          f"({result.bytes} bytes, {result.duration:.2f} s, {report.throughput / 1e6:.2f} MB/s total)")
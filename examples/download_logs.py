@@ -15,20 +15,21 @@
 # Example script - download the logs and delete them from the camera
 
 import api_v1
+import downloader
 
 delete_logs = True
 source = "service"
 
 if __name__ == "__main__":
-    log_files = api_v1.get_file_list(source=source)  # call function with default settings (see config.py)
-    num_log_files = log_files["total"]
+    log_files = list(api_v1.iter_files(source=source))  # all pages, default settings (see config.py)
+    num_log_files = len(log_files)
 
     print(f"Found {num_log_files} log files. Downloading them to folder {source}")
 
-    api_v1.download_files(file_list=log_files["files"], source=log_files["source"])
+    report = api_v1.download_files(file_list=log_files, source=source)
 
     if delete_logs:
-        print("Deleting downloaded logs")
-        for file in log_files["files"]:
-            api_v1.delete_file(filename=file, source=log_files["source"])
-
+        # only logs that were downloaded, a failed download stays on the camera
+        downloaded = [result.filename for result in report.results if result.status == downloader.OK]
+        print(f"Deleting {len(downloaded)} downloaded logs")
+        api_v1.delete_files(file_list=downloaded, source=source)
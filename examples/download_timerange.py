@@ -15,6 +15,7 @@
 # Example script - downloads all image files taken in the last two days
 
 import api_v1
+import downloader
 import datetime
 
 delete_images = True
@@ -31,9 +32,10 @@ if __name__ == "__main__":
     file_list = api_v1.get_files_in_range(start_datetime=start_iso, end_datetime=end_iso, source=set_source)
     print("Found files: " + ", ".join(file_list["files"]))
 
-    api_v1.download_files(file_list=file_list["files"], source=set_source)
+    report = api_v1.download_files(file_list=file_list["files"], source=set_source)
 
     if delete_images:
-        print("Deleting downloaded files")
-        for file in file_list["files"]:
-            api_v1.delete_file(filename=file, source=set_source)
+        # only files that were downloaded, a failed download stays on the camera
+        downloaded = [result.filename for result in report.results if result.status == downloader.OK]
+        print(f"Deleting {len(downloaded)} downloaded files")
+        api_v1.delete_files(file_list=downloaded, source=set_source)
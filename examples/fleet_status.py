@@ -0,0 +1,31 @@
+# Copyright 2024 RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Example script - query the status of all cameras listed in cameras.json at the same time
+# cameras.json: [{"ip_address": "10.1.2.1", "key": "KEY", "name": "chamber-1", "labels": {"room": "A"}}, ...]
+
+import fleet
+
+inventory = "cameras.json"
+
+if __name__ == "__main__":
+    cameras = fleet.Fleet.from_file(inventory)
+
+    report = cameras.run("get_status", deadline=60)
+    print(report.summary())
+
+    for name, status in report.values().items():
+        print(f"{name}: {status}")
+    for name, error in report.failed.items():
+        print(f"{name} failed: {error}")
@@ -0,0 +1,30 @@
+# Copyright 2024 RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Example script - download only the scheduler images that were not downloaded before (e.g. as hourly cron job)
+
+import api_v1
+import sync
+
+delete_images = False  # delete images from the camera once their download is verified
+set_source = "scheduler"
+
+if __name__ == "__main__":
+    client = api_v1.get_client()  # client with default settings (see config.py)
+
+    with sync.Manifest("manifest.sqlite") as manifest:
+        report = sync.sync_source(client, manifest, source=set_source, delete=delete_images)
+
+    if report:
+        print(report.summary())
@@ -17,6 +17,7 @@
 # the global setting of the camera are used
 
 import api_v1
+import downloader
 
 delete_images = True
 
@@ -25,9 +26,10 @@ if __name__ == "__main__":
     image_files = api_v1.take_ms_image()  # call function with default settings (see config.py)
     print("Done taking multispectral image")
 
-    api_v1.download_files(file_list=image_files["files"], source=image_files["source"])
+    report = api_v1.download_files(file_list=image_files["files"], source=image_files["source"])
 
     if delete_images:
-        print("Deleting downloaded files")
-        for file in image_files["files"]:
-            api_v1.delete_file(filename=file, source=image_files["source"])
+        # only files that were downloaded, a failed download stays on the camera
+        downloaded = [result.filename for result in report.results if result.status == downloader.OK]
+        print(f"Deleting {len(downloaded)} downloaded files")
+        api_v1.delete_files(file_list=downloaded, source=image_files["source"])
@@ -0,0 +1,191 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Run API calls on many cameras in parallel
+
+import json
+import time
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import api_v1
+import resilience
+
+
+@dataclass
+class Camera:
+    """
+    Camera of the inventory
+    """
+    ip_address: str
+    key: str
+    name: str = None
+    labels: dict = field(default_factory=dict)
+    settings: dict = field(default_factory=dict)  # CameraClient settings, e.g. {"timeout": 10}
+
+    def __post_init__(self):
+        if self.name is None:
+            self.name = self.ip_address
+
+
+@dataclass
+class FleetResult:
+    """
+    Result of an operation on a single camera
+    """
+    camera: str
+    value: object = None
+    error: str = None
+    duration: float = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+@dataclass
+class FleetReport:
+    """
+    Results of an operation on all cameras
+    """
+    operation: str
+    results: dict = field(default_factory=dict)  # camera name -> FleetResult
+    duration: float = 0.0
+
+    @property
+    def succeeded(self):
+        return [name for name, result in self.results.items() if result.ok]
+
+    @property
+    def failed(self):
+        return {name: result.error for name, result in self.results.items() if not result.ok}
+
+    def values(self):
+        return {name: result.value for name, result in self.results.items() if result.ok}
+
+    def summary(self):
+        return (f"{self.operation}: {len(self.succeeded)}/{len(self.results)} cameras ok "
+                f"in {self.duration:.2f} s")
+
+
+class Fleet:
+    """
+    Inventory of cameras with parallel execution of operations
+    """
+
+    def __init__(self, cameras=(), max_workers=32, per_camera=1):
+        """
+        :param cameras: list of Camera
+        :param max_workers: maximum number of cameras addressed at the same time
+        :param per_camera: maximum number of operations running at the same time on one camera
+        """
+        self.cameras = list(cameras)
+        self.max_workers = max_workers
+        self.per_camera = per_camera
+        self._slots = {}
+        self._slots_lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """
+        Load the inventory from a JSON file:
+        [{"ip_address": "10.1.2.1", "key": "KEY", "name": "chamber-1", "labels": {"room": "A"}}, ...]
+        :param path: path to the JSON file
+        :param kwargs: Fleet settings (max_workers, per_camera)
+        :return: Fleet
+        """
+        with open(path) as f:
+            entries = json.load(f)
+
+        return cls([Camera(**entry) for entry in entries], **kwargs)
+
+    def select(self, **labels):
+        """
+        Get the cameras with matching labels, e.g. fleet.select(room="A")
+        :return: list of Camera
+        """
+        return [camera for camera in self.cameras
+                if all(camera.labels.get(label) == value for label, value in labels.items())]
+
+    def client(self, camera):
+        """
+        Get the shared client of a camera
+        :param camera: Camera
+        :return: CameraClient
+        """
+        return api_v1.get_client(camera.ip_address, camera.key, **camera.settings)
+
+    def _slot(self, camera):
+        with self._slots_lock:
+            slot = self._slots.get(camera.name)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_camera)
+                self._slots[camera.name] = slot
+        return slot
+
+    def run(self, operation, *args, cameras=None, deadline=None, **kwargs):
+        """
+        Run an operation on all (or the given) cameras in parallel
+        :param operation: name of a CameraClient method (e.g. "get_status") or a function called with
+                          (client, *args, **kwargs)
+        :param args: arguments of the operation
+        :param cameras: list of Camera, defaults to all cameras of the fleet
+        :param deadline: maximum duration in seconds, cameras that did not answer in time are reported as failed
+        :param kwargs: keyword arguments of the operation
+        :return: FleetReport
+        """
+        if cameras is None:
+            cameras = self.cameras
+
+        name = operation if isinstance(operation, str) else getattr(operation, "__name__", str(operation))
+        report = FleetReport(operation=name)
+        start = time.monotonic()
+
+        def execute(camera):
+            started = time.monotonic()
+            try:
+                # the API calls of the operation share the deadline, no call waits longer than the fleet
+                with self._slot(camera), resilience.deadline(at=start + deadline) if deadline else nullcontext():
+                    client = self.client(camera)
+                    if isinstance(operation, str):
+                        value = getattr(client, operation)(*args, **kwargs)
+                    else:
+                        value = operation(client, *args, **kwargs)
+            except Exception as err:  # one broken camera must not stop the others
+                return FleetResult(camera.name, error=f"{type(err).__name__}: {err}",
+                                   duration=time.monotonic() - started)
+
+            # the api_v1 functions return None or False if the camera did not answer
+            error = "no response" if value is None or value is False else None
+            return FleetResult(camera.name, value=value, error=error, duration=time.monotonic() - started)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(cameras))))
+        futures = {executor.submit(execute, camera): camera for camera in cameras}
+        done, not_done = wait(futures, timeout=deadline)
+        # threads of cameras that missed the deadline finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        for future in done:
+            result = future.result()
+            report.results[result.camera] = result
+        for future in not_done:
+            camera = futures[future]
+            report.results[camera.name] = FleetResult(camera.name, error="deadline exceeded",
+                                                      duration=time.monotonic() - start)
+
+        report.duration = time.monotonic() - start
+
+        return report
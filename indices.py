@@ -0,0 +1,206 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Vegetation indices computed on band images (requires numpy)
+# Bands are addressed by spectrum index (see README), e.g. b5 = red 630 nm, b8 = NIR-850
+
+import ast
+import operator
+
+import numpy as np
+
+from cube import Cube
+
+INDICES = {
+    "ndvi": "(b8 - b5) / (b8 + b5)",  # NIR-850, red 630 nm
+    "gndvi": "(b8 - b3) / (b8 + b3)",  # NIR-850, green 526 nm
+    "far_red_red": "b7 / b5",  # far red 740 nm, red 630 nm
+}
+
+TILE_ROWS = 256  # image rows processed at once
+
+_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Pow: operator.pow,
+}
+
+
+def _divide(numerator, denominator):
+    # division by zero results in NaN instead of inf and a warning
+    numerator, denominator = np.broadcast_arrays(np.asarray(numerator, dtype=np.float32),
+                                                 np.asarray(denominator, dtype=np.float32))
+    result = np.full(numerator.shape, np.nan, dtype=np.float32)
+    return np.divide(numerator, denominator, out=result, where=denominator != 0)
+
+
+class Expression:
+    """
+    Band expression, e.g. "(b8 - b5) / (b8 + b5)". Supported are band names b0 - b10, numbers,
+    + - * / ** and parentheses.
+    """
+
+    def __init__(self, expression):
+        """
+        :param expression: expression string or name of a predefined index (see INDICES)
+        """
+        self.expression = INDICES.get(expression, expression)
+        self._tree = ast.parse(self.expression, mode="eval").body
+        self.spectra = sorted({int(node.id[1:]) for node in ast.walk(self._tree) if isinstance(node, ast.Name)})
+        self._check(self._tree)
+        if not self.spectra:  # the image size is taken from the bands
+            raise ValueError(f"Band expression {self.expression!r} uses no bands")
+
+    def __repr__(self):
+        return f"Expression({self.expression!r})"
+
+    def _check(self, node):
+        if isinstance(node, ast.BinOp) and (type(node.op) in _OPERATORS or isinstance(node.op, ast.Div)):
+            self._check(node.left)
+            self._check(node.right)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            self._check(node.operand)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            pass
+        elif isinstance(node, ast.Name) and node.id.startswith("b") and node.id[1:].isdigit():
+            pass
+        else:
+            raise ValueError(f"Unsupported element in band expression {self.expression!r}: {ast.dump(node)}")
+
+    def evaluate(self, bands):
+        """
+        Evaluate the expression
+        :param bands: python dict spectrum index -> numpy array
+        :return: numpy array (float32)
+        """
+        missing = [spectrum for spectrum in self.spectra if spectrum not in bands]
+        if missing:
+            raise KeyError(f"Bands {missing} required by {self.expression!r} not available")
+
+        def evaluate(node):
+            if isinstance(node, ast.BinOp):
+                left, right = evaluate(node.left), evaluate(node.right)
+                if isinstance(node.op, ast.Div):
+                    return _divide(left, right)
+                return _OPERATORS[type(node.op)](left, right)
+            if isinstance(node, ast.UnaryOp):
+                value = evaluate(node.operand)
+                return -value if isinstance(node.op, ast.USub) else value
+            if isinstance(node, ast.Constant):
+                return np.float32(node.value)
+            return np.asarray(bands[int(node.id[1:])], dtype=np.float32)
+
+        return np.asarray(evaluate(self._tree), dtype=np.float32)
+
+
+def _bands(images):
+    # Cube or python dict spectrum index -> band image
+    if isinstance(images, Cube):
+        return {spectrum: images.data[i] for i, spectrum in enumerate(images.spectra)}
+    return images
+
+
+def iter_tiles(index, images, tile_rows=TILE_ROWS):
+    """
+    Compute an index tile by tile (blocks of image rows), only one tile is held in memory as float
+    :param index: Expression, expression string or name of a predefined index (see INDICES)
+    :param images: Cube or python dict spectrum index -> band image (numpy array or memory-mapped array)
+    :param tile_rows: number of image rows per tile
+    :return: generator of (row slice, numpy array of the tile)
+    """
+    expression = index if isinstance(index, Expression) else Expression(index)
+    bands = _bands(images)
+    height = bands[expression.spectra[0]].shape[0]
+
+    for row in range(0, height, tile_rows):
+        rows = slice(row, min(row + tile_rows, height))
+        yield rows, expression.evaluate({spectrum: bands[spectrum][rows] for spectrum in expression.spectra})
+
+
+def compute(index, images, tile_rows=TILE_ROWS, out=None):
+    """
+    Compute an index for a whole image
+    :param index: Expression, expression string or name of a predefined index (see INDICES)
+    :param images: Cube or python dict spectrum index -> band image
+    :param tile_rows: number of image rows per tile
+    :param out: optional output array (e.g. numpy.memmap opened with mode "w+" for very large images)
+    :return: numpy array (height x width, float32)
+    """
+    expression = index if isinstance(index, Expression) else Expression(index)
+    bands = _bands(images)
+
+    if out is None:
+        out = np.empty(bands[expression.spectra[0]].shape[:2], dtype=np.float32)
+
+    for rows, tile in iter_tiles(expression, bands, tile_rows=tile_rows):
+        out[rows] = tile
+
+    return out
+
+
+def compute_all(images, indices=tuple(INDICES), tile_rows=TILE_ROWS):
+    """
+    Compute several indices of one capture
+    :param images: Cube or python dict spectrum index -> band image
+    :param indices: names of predefined indices or expression strings
+    :param tile_rows: number of image rows per tile
+    :return: python dict index -> numpy array
+    """
+    return {index: compute(index, images, tile_rows=tile_rows) for index in indices}
+
+
+def statistics(index, images, tile_rows=TILE_ROWS):
+    """
+    Mean, minimum and maximum of an index, computed tile by tile without holding the whole index image
+    :param index: Expression, expression string or name of a predefined index (see INDICES)
+    :param images: Cube or python dict spectrum index -> band image
+    :param tile_rows: number of image rows per tile
+    :return: python dict with mean, min, max and the number of valid pixels
+    """
+    total = 0.0
+    count = 0
+    minimum = np.inf
+    maximum = -np.inf
+
+    for rows, tile in iter_tiles(index, images, tile_rows=tile_rows):
+        valid = tile[np.isfinite(tile)]
+        if valid.size:
+            total += float(valid.sum(dtype=np.float64))
+            count += valid.size
+            minimum = min(minimum, float(valid.min()))
+            maximum = max(maximum, float(valid.max()))
+
+    return {
+        "mean": total / count if count else float("nan"),
+        "min": minimum if count else float("nan"),
+        "max": maximum if count else float("nan"),
+        "pixels": count
+    }
+
+
+def series(index, cubes, tile_rows=TILE_ROWS):
+    """
+    Statistics of an index over a time series of captures. Cubes are loaded one after another
+    (memory-mapped), so the series can be longer than the available memory.
+    :param index: Expression, expression string or name of a predefined index (see INDICES)
+    :param cubes: iterable of Cube or paths of saved cubes (see Cube.save())
+    :param tile_rows: number of image rows per tile
+    :return: generator of (cube or path, statistics)
+    """
+    expression = index if isinstance(index, Expression) else Expression(index)
+
+    for item in cubes:
+        images = Cube.load(item) if isinstance(item, str) else item
+        yield item, statistics(expression, images, tile_rows=tile_rows)
@@ -0,0 +1,250 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Statistics of the API calls (latency, bytes, errors, retries, connection reuse) per camera and command.
+# Export as Prometheus text format or JSON lines.
+#
+# import metrics
+# stats = metrics.enable()  # records every API call of all clients
+# ...
+# print(stats.prometheus())
+
+import json
+import threading
+from dataclasses import asdict
+
+import api_v1
+
+# upper bounds of the latency histogram buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class CommandStats:
+    """
+    Statistics of one command of one camera
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.duration = 0.0
+        self.buckets = [0] * len(BUCKETS)  # number of calls <= bucket bound (not cumulative)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.statuses = {}  # HTTP status code -> number of calls
+        self.errors = {}  # exception class -> number of calls
+
+    def add(self, record):
+        self.calls += 1
+        self.duration += record.duration
+        for i, bound in enumerate(BUCKETS):
+            if record.duration <= bound:
+                self.buckets[i] += 1
+                break
+        self.bytes_sent += record.bytes_sent
+        self.bytes_received += record.bytes_received
+        self.retries += record.retries
+        if record.status is not None:
+            self.statuses[record.status] = self.statuses.get(record.status, 0) + 1
+        if record.error is not None:
+            self.errors[record.error] = self.errors.get(record.error, 0) + 1
+
+    def percentile(self, percent):
+        """
+        Estimate a latency percentile from the histogram (upper bound of the bucket)
+        :param percent: 0-100
+        :return: seconds, None if the value is above the largest bucket
+        """
+        rank = percent / 100 * self.calls
+        count = 0
+        for bound, calls in zip(BUCKETS, self.buckets):
+            count += calls
+            if count >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "duration": self.duration,
+            "buckets": list(self.buckets),
+            "mean": self.duration / self.calls if self.calls else None,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "retries": self.retries,
+            "statuses": dict(self.statuses),
+            "errors": dict(self.errors)
+        }
+
+
+class Metrics:
+    """
+    Hook collecting the statistics of all API calls, see enable()
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}  # (camera, command) -> CommandStats
+
+    def __call__(self, record):
+        with self._lock:
+            stats = self._stats.get((record.camera, record.command))
+            if stats is None:
+                stats = CommandStats()
+                self._stats[(record.camera, record.command)] = stats
+            stats.add(record)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def stats(self):
+        """
+        Get the statistics
+        :return: python dict camera -> command -> statistics, "connections" per camera holds the
+                 number of opened connections and requests sent over them (reuse = 1 - connections / requests)
+        """
+        with self._lock:
+            items = [(key, stats.as_dict()) for key, stats in self._stats.items()]
+
+        result = {}
+        for (camera, command), stats in items:
+            result.setdefault(camera, {})[command] = stats
+
+        for client in api_v1.clients():  # several shared clients of a camera (other settings) are added up
+            if client.ip_address in result:
+                connections = result[client.ip_address].setdefault("connections", {})
+                for name, value in client.connection_stats().items():
+                    connections[name] = connections.get(name, 0) + value
+
+        return result
+
+    def slowest(self, count=10):
+        """
+        Get the camera commands with the highest mean latency
+        :param count: number of entries
+        :return: list of (camera, command, mean latency in seconds)
+        """
+        with self._lock:
+            means = [(camera, command, stats.duration / stats.calls)
+                     for (camera, command), stats in self._stats.items() if stats.calls]
+        return sorted(means, key=lambda entry: entry[2], reverse=True)[:count]
+
+    def prometheus(self, prefix="rvs_api"):
+        """
+        Export the statistics in the Prometheus text format
+        :param prefix: metric name prefix
+        :return: text
+        """
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{label}="{_escape(text)}"' for label, text in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}")
+
+        stats = self.stats()
+        commands = [({"camera": camera, "command": command}, values)
+                    for camera, camera_stats in sorted(stats.items())
+                    for command, values in sorted(camera_stats.items()) if command != "connections"]
+
+        histogram = []
+        for labels, values in commands:
+            cumulative = 0
+            for bound, count in zip(BUCKETS, values["buckets"]):
+                cumulative += count
+                histogram.append(("_bucket", {**labels, "le": str(bound)}, cumulative))
+            histogram.append(("_bucket", {**labels, "le": "+Inf"}, values["calls"]))
+            histogram.append(("_sum", labels, values["duration"]))
+            histogram.append(("_count", labels, values["calls"]))
+
+        lines.append(f"# HELP {prefix}_request_duration_seconds Latency of the API calls")
+        lines.append(f"# TYPE {prefix}_request_duration_seconds histogram")
+        for suffix, labels, value in histogram:
+            label_text = ",".join(f'{label}="{_escape(text)}"' for label, text in labels.items())
+            lines.append(f"{prefix}_request_duration_seconds{suffix}{{{label_text}}} {value}")
+
+        metric("requests_total", "counter", "API calls by HTTP status",
+               [({**labels, "status": str(status)}, count)
+                for labels, values in commands for status, count in sorted(values["statuses"].items())])
+        metric("errors_total", "counter", "Failed API calls by error class",
+               [({**labels, "error": error}, count)
+                for labels, values in commands for error, count in sorted(values["errors"].items())])
+        metric("bytes_sent_total", "counter", "Bytes sent to the camera",
+               [(labels, values["bytes_sent"]) for labels, values in commands])
+        metric("bytes_received_total", "counter", "Bytes received from the camera",
+               [(labels, values["bytes_received"]) for labels, values in commands])
+        metric("retries_total", "counter",
+               "Retries of the API calls (failed connection attempts and requests sent again by the retry policy)",
+               [(labels, values["retries"]) for labels, values in commands])
+
+        connections = [(camera, camera_stats["connections"]) for camera, camera_stats in sorted(stats.items())
+                       if "connections" in camera_stats]
+        metric("connections_opened_total", "counter", "Connections opened to the camera",
+               [({"camera": camera}, values["connections"]) for camera, values in connections])
+        metric("pool_requests_total", "counter", "Requests sent over pooled connections",
+               [({"camera": camera}, values["requests"]) for camera, values in connections])
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(text):
+    return str(text).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class JsonLinesWriter:
+    """
+    Hook writing every API call as one JSON line to a file
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the file, lines are appended
+        """
+        self._lock = threading.Lock()
+        self._file = open(path, "a")
+
+    def __call__(self, record):
+        line = json.dumps(asdict(record))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def enable(metrics=None):
+    """
+    Record the API calls of all clients
+    :param metrics: Metrics or other hook, a new Metrics is created if not set
+    :return: the installed hook
+    """
+    if metrics is None:
+        metrics = Metrics()
+    api_v1.HOOKS.append(metrics)
+    return metrics
+
+
+def disable(metrics):
+    """
+    Stop recording with a hook installed by enable()
+    """
+    if metrics in api_v1.HOOKS:
+        api_v1.HOOKS.remove(metrics)
@@ -0,0 +1,396 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Local stand-in for the camera REST API (see openapi.yaml) to develop and benchmark without a camera.
+# Like the camera, parameters are expected as JSON body on GET, query parameters alone redirect to /status.
+#
+# python3 mock_camera.py --port 8080 --files 2000 --file-size 500000 --latency 0.02 --bandwidth 5000000
+
+import json
+import time
+import zlib
+import random
+import struct
+import hashlib
+import argparse
+import datetime
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+SOURCES = ["service", "config", "scheduler", "api_takeimages", "io_takeimages", "web_image"]
+
+
+def synthetic_png(width, height, seed=0):
+    """
+    Create a valid grayscale PNG (gradient pattern) without any image library
+    :param width: image width in pixels
+    :param height: image height in pixels
+    :param seed: shifts the pattern, so images differ
+    :return: PNG image (bytes)
+    """
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    row = bytes((x + seed) % 256 for x in range(width))
+    raw = b"".join(b"\x00" + row[y % width:] + row[:y % width] for y in range(height))
+
+    return (b"\x89PNG\r\n\x1a\n" +
+            chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)) +
+            chunk(b"IDAT", zlib.compress(raw, 1)) +
+            chunk(b"IEND", b""))
+
+
+def synthetic_payload(name, size):
+    """
+    Deterministic file content of a given size (same name, same content)
+    """
+    block = hashlib.sha256(name.encode()).digest() * 256  # 8 kB
+    return (block * (size // len(block) + 1))[:size]
+
+
+class MockFile:
+    def __init__(self, created, size=0, content=None):
+        self.created = created
+        self.size = len(content) if content is not None else size
+        self.content = content
+
+    def data(self, name):
+        return self.content if self.content is not None else synthetic_payload(name, self.size)
+
+
+class MockCamera:
+    """
+    State and behaviour of the simulated camera
+    """
+
+    def __init__(self, key="mock", latency=0.0, jitter=0.0, bandwidth=None, error_rate=0.0, drop_rate=0.0,
+                 capture_time=1.0, image_size=(640, 480), name="RVS mock", firmware="mock-1.0"):
+        """
+        :param key: API key expected by the camera
+        :param latency: delay in seconds before every response
+        :param jitter: random additional delay in seconds (0 - jitter)
+        :param bandwidth: maximum bytes per second per response body, unlimited if not set
+        :param error_rate: probability of a response with status 500
+        :param drop_rate: probability of closing the connection without response
+        :param capture_time: duration of images/takeimage in seconds
+        :param image_size: (width, height) of synthetic images
+        """
+        self.key = key
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.capture_time = capture_time
+        self.image_size = image_size
+        self.name = name
+        self.firmware = firmware
+        self.sd_total = 32 * 1024 ** 3
+
+        self.files = {source: {} for source in SOURCES}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def add_files(self, source, count, size, start=None, interval=60.0, extension=".png"):
+        """
+        Add synthetic files to a source, one every interval seconds starting at start
+        """
+        if start is None:
+            start = datetime.datetime.now() - datetime.timedelta(seconds=count * interval)
+
+        with self.lock:
+            for i in range(count):
+                created = start + datetime.timedelta(seconds=i * interval)
+                filename = f"{created.strftime('%Y%m%d-%H%M%S')}_{i:06d}{extension}"
+                self.files[source][filename] = MockFile(created, size=size)
+
+    def used_bytes(self):
+        with self.lock:
+            return sum(file.size for files in self.files.values() for file in files.values())
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive like the camera
+    wbufsize = 64 * 1024  # headers and small bodies go out in one packet
+    camera = None  # MockCamera, set by serve()
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.camera.lock:
+            self.camera.connections += 1
+
+    def send(self, status, payload=None, content_type="application/json", headers=None):
+        if payload is None:
+            payload = {}
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+
+        if self.command == "HEAD":
+            return
+
+        bandwidth = self.camera.bandwidth
+        if not bandwidth:
+            self.wfile.write(payload)
+            return
+
+        step = 16 * 1024
+        start = time.monotonic()
+        for offset in range(0, len(payload), step):
+            self.wfile.write(payload[offset:offset + step])
+            delay = start + (offset + step) / bandwidth - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            return None  # not supported by the camera
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def prepare(self):
+        """
+        Common handling of all requests: simulated delay, errors and authentication
+        :return: (command, query) or None if a response was sent already
+        """
+        camera = self.camera
+        with camera.lock:
+            camera.requests += 1
+
+        delay = camera.latency + random.uniform(0, camera.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if camera.drop_rate and random.random() < camera.drop_rate:
+            self.close_connection = True
+            self.connection.close()
+            return None
+
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+
+        if not parts.path.startswith("/api/v1/"):
+            self.send(404, {"error": "unknown path"})
+            return None
+        if query.get("key", [None])[0] != camera.key:
+            self.send(403, {"error": "invalid key"})
+            return None
+        if camera.error_rate and random.random() < camera.error_rate:
+            self.send(500, {"error": "injected error"})
+            return None
+
+        return parts.path[len("/api/v1/"):].strip("/"), query
+
+    def settings(self, body, query, required):
+        """
+        Parse the JSON body, query parameters alone redirect to /status like on the camera
+        :return: python dict or None if a response was sent already
+        """
+        if not body:
+            if required and any(name in query for name in required):
+                self.send(302, headers={"Location": f"/api/v1/status?key={self.camera.key}"})
+                return None
+            if required:
+                self.send(400, {"error": f"missing parameters {', '.join(required)}"})
+                return None
+            return {}
+
+        try:
+            settings = json.loads(body)
+        except ValueError:
+            self.send(400, {"error": "invalid JSON"})
+            return None
+
+        missing = [name for name in required if name not in settings]
+        if missing:
+            self.send(400, {"error": f"missing parameters {', '.join(missing)}"})
+            return None
+
+        return settings
+
+    def do_GET(self):
+        body = self.read_body()
+        prepared = self.prepare()
+        if prepared is None:
+            return
+        command, query = prepared
+        camera = self.camera
+
+        if command == "status":
+            return self.send(200, {"name": camera.name, "firmware": camera.firmware,
+                                   "timestamp": datetime.datetime.now().isoformat()})
+
+        if command == "info":
+            used = camera.used_bytes()
+            return self.send(200, {"sdcard": {"total": camera.sd_total, "used": used,
+                                              "free": camera.sd_total - used},
+                                   "health": {"temperature": 42.0, "uptime": time.monotonic()}})
+
+        if command == "reset":
+            return self.send(200, {"reset": True})
+
+        if command == "flashlight":
+            settings = self.settings(body, query, ["spectrum", "brightness", "time"])
+            if settings is not None:
+                self.send(200, settings)
+            return
+
+        if command in ("files/get", "files/delete"):
+            settings = self.settings(body, query, ["filename", "source"])
+            if settings is None:
+                return
+            with camera.lock:
+                files = camera.files.get(settings["source"], {})
+                file = files.get(settings["filename"])
+                if file is not None and command == "files/delete":
+                    del files[settings["filename"]]
+            if file is None:
+                return self.send(404, {"error": "file not found"})
+            if command == "files/delete":
+                return self.send(200, {"deleted": settings["filename"]})
+            return self.send(200, file.data(settings["filename"]), content_type="application/octet-stream")
+
+        if command == "files/list":
+            settings = self.settings(body, query, ["source"])
+            if settings is None:
+                return
+            index = int(settings.get("index", 0))
+            limit = int(settings.get("limit", 500))
+            with camera.lock:
+                names = sorted(camera.files.get(settings["source"], {}))
+            return self.send(200, {"files": names[index:index + limit], "source": settings["source"],
+                                   "total": len(names)})
+
+        if command == "images/firstinrange":
+            settings = self.settings(body, query, ["startDateTime", "endDateTime", "source"])
+            if settings is None:
+                return
+            try:
+                start = datetime.datetime.fromisoformat(settings["startDateTime"])
+                end = datetime.datetime.fromisoformat(settings["endDateTime"])
+            except ValueError:
+                return self.send(400, {"error": "invalid date"})
+            with camera.lock:
+                names = sorted(name for name, file in camera.files.get(settings["source"], {}).items()
+                               if start <= file.created <= end)
+            return self.send(200, {"files": names, "source": settings["source"], "total": len(names)})
+
+        if command == "images/takeimage":
+            time.sleep(camera.capture_time)
+            now = datetime.datetime.now()
+            width, height = camera.image_size
+            names = []
+            with camera.lock:
+                for spectrum in range(1, 11):
+                    name = f"{now.strftime('%Y%m%d-%H%M%S')}_{spectrum}.png"
+                    content = synthetic_png(width, height, spectrum)
+                    camera.files["api_takeimages"][name] = MockFile(now, content=content)
+                    names.append(name)
+            return self.send(200, {"files": names, "source": "api_takeimages"})
+
+        if command.startswith("camera/image."):
+            settings = self.settings(body, query, ["spectrum", "brightness", "exposure"])
+            if settings is None:
+                return
+            extension = command.rsplit(".", 1)[1]
+            if extension not in ("jpg", "png"):
+                return self.send(400, {"error": "unsupported format"})
+            time.sleep(float(settings["exposure"]))
+            width, height = camera.image_size
+            # synthetic images are always PNG encoded
+            return self.send(200, synthetic_png(width, height, int(settings["spectrum"])),
+                             content_type="image/png" if extension == "png" else "image/jpeg")
+
+        self.send(404, {"error": "unknown command"})
+
+    def do_POST(self):
+        body = self.read_body()
+        prepared = self.prepare()
+        if prepared is None:
+            return
+        command, query = prepared
+
+        if body is None:
+            self.close_connection = True
+            return self.send(411, {"error": "Content-Length required"})
+
+        if command.startswith("files/put/"):
+            filename = command[len("files/put/"):]
+            with self.camera.lock:
+                self.camera.files["config"][filename] = MockFile(datetime.datetime.now(), content=body)
+            return self.send(200, {"uploaded": filename, "bytes": len(body)})
+
+        self.send(404, {"error": "unknown command"})
+
+
+def serve(camera=None, host="127.0.0.1", port=0):
+    """
+    Start the mock camera in a background thread
+    :param camera: MockCamera, a camera with default settings is created if not set
+    :param host: address to listen on
+    :param port: port to listen on, 0 selects a free port
+    :return: server (server.server_address, server.camera, server.shutdown())
+    """
+    handler = type("Handler", (MockHandler,), {"camera": camera or MockCamera()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.camera = handler.camera
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock RAYN Vision camera")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="0 selects a free port")
+    parser.add_argument("--key", default="mock", help="API key")
+    parser.add_argument("--files", type=int, default=1000, help="number of files in the scheduler source")
+    parser.add_argument("--file-size", type=int, default=100000, help="size of the scheduler files in bytes")
+    parser.add_argument("--logs", type=int, default=20, help="number of files in the service source")
+    parser.add_argument("--latency", type=float, default=0.0, help="delay per request in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random additional delay in seconds")
+    parser.add_argument("--bandwidth", type=float, default=None, help="bytes per second per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of status 500")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="probability of a dropped connection")
+    parser.add_argument("--capture-time", type=float, default=1.0, help="duration of takeimage in seconds")
+    parser.add_argument("--image-size", type=int, nargs=2, default=(640, 480), metavar=("WIDTH", "HEIGHT"))
+    args = parser.parse_args()
+
+    mock = MockCamera(key=args.key, latency=args.latency, jitter=args.jitter, bandwidth=args.bandwidth,
+                      error_rate=args.error_rate, drop_rate=args.drop_rate, capture_time=args.capture_time,
+                      image_size=tuple(args.image_size))
+    mock.add_files("scheduler", args.files, args.file_size)
+    mock.add_files("service", args.logs, 20000, extension=".log")
+
+    mock_server = serve(mock, host=args.host, port=args.port)
+    host, port = mock_server.server_address[:2]
+    print(f"Mock camera listening on {host}:{port} key {args.key}", flush=True)
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        mock_server.shutdown()
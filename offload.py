@@ -0,0 +1,329 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Storage monitor - polls the SD card usage (info) of all cameras and downloads and deletes the oldest files
+# before the card is full. Cameras filling up quickly are polled more often than idle ones.
+#
+# python3 offload.py --cameras cameras.json --path offload
+
+import os
+import time
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import api_v1
+import configuration
+import downloader
+import cleanup
+import fleet
+import sync
+
+SOURCES = ("scheduler", "api_takeimages", "service")  # offloaded in this order
+
+
+def parse_storage(info):
+    """
+    Find the storage usage in a camera info response. The layout of the info depends on the firmware,
+    the first object with a total and a used or free value is taken (e.g. {"sdcard": {"total": ..., "used": ...}}).
+    :param info: python dict returned by get_info()
+    :return: (used bytes, total bytes) or None if the info contains no storage usage
+    """
+    if not isinstance(info, dict):
+        return None
+
+    values = {key.lower(): value for key, value in info.items()}
+    total = values.get("total", values.get("size"))
+    used = values.get("used")
+    if used is None and isinstance(values.get("free", values.get("available")), (int, float)) \
+            and isinstance(total, (int, float)):
+        used = total - values.get("free", values.get("available"))
+    if isinstance(total, (int, float)) and isinstance(used, (int, float)) and total > 0:
+        return used, total
+
+    for value in info.values():
+        storage = parse_storage(value)
+        if storage is not None:
+            return storage
+
+    return None
+
+
+@dataclass
+class CameraState:
+    """
+    Storage usage and offload statistics of one camera
+    """
+    camera: fleet.Camera
+    client: object
+    samples: deque = field(default_factory=lambda: deque(maxlen=20))  # (monotonic time, used bytes)
+    total: int = None
+    interval: float = 0.0
+    next_poll: float = 0.0
+    polling: bool = False
+    offloading: bool = False
+    throughput: float = None  # measured download rate in bytes per second
+    file_size: float = None  # mean size of the downloaded files
+    freed: int = 0  # bytes deleted from the camera in total
+    error: str = None
+
+    @property
+    def used(self):
+        return self.samples[-1][1] if self.samples else None
+
+    @property
+    def fraction(self):
+        return self.used / self.total if self.samples and self.total else None
+
+    def fill_rate(self):
+        """
+        :return: growth of the used storage in bytes per second over the recorded samples
+        """
+        if len(self.samples) < 2 or self.samples[-1][0] <= self.samples[0][0]:
+            return 0.0
+        (start, used_start), (end, used_end) = self.samples[0], self.samples[-1]
+        return max(0.0, (used_end - used_start) / (end - start))
+
+
+class OffloadMonitor:
+    """
+    Watches the storage of many cameras from one thread, offloads run in a thread pool
+    """
+
+    def __init__(self, cameras, path="offload", sources=SOURCES, start=0.8, high_water=0.9, target=0.6,
+                 min_interval=30.0, max_interval=900.0, batch_seconds=60.0, max_offloads=4, manifest=None):
+        """
+        :param cameras: list of fleet.Camera
+        :param path: local folder, files are stored in <path>/<camera name>/<source>
+        :param sources: sources offloaded in this order, oldest files first
+        :param start: used fraction of the storage at which an offload starts
+        :param high_water: used fraction that must not be reached, an offload starts earlier if the
+                           storage fills up faster than it is polled
+        :param target: an offload continues until the used fraction is below this value
+        :param min_interval: shortest time between two polls of a camera in seconds
+        :param max_interval: longest time between two polls of a camera in seconds
+        :param batch_seconds: files downloaded per batch (before deleting them) are sized for this duration
+        :param max_offloads: number of cameras offloaded at the same time
+        :param manifest: optional sync.Manifest the downloaded files are recorded in
+        """
+        self.path = path
+        self.sources = sources
+        self.start_fraction = start
+        self.high_water = high_water
+        self.target = target
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.batch_seconds = batch_seconds
+        self.manifest = manifest
+
+        self.states = [CameraState(camera, api_v1.get_client(camera.ip_address, camera.key, **camera.settings))
+                       for camera in cameras]
+
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._polls = ThreadPoolExecutor(max_workers=min(16, max(1, len(self.states))),
+                                         thread_name_prefix="offload-poll")
+        self._offloads = ThreadPoolExecutor(max_workers=max_offloads, thread_name_prefix="offload")
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="offload-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop polling, running offloads finish their current batch
+        """
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+        self._polls.shutdown(wait=True)
+        self._offloads.shutdown(wait=True)
+
+    def run_forever(self):
+        self.start()
+        while self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+
+    def status(self):
+        """
+        Get the storage state of all cameras
+        :return: python dict camera name -> python dict with the used fraction, fill rate, poll interval, ...
+        """
+        return {state.camera.name: {
+            "used": state.used,
+            "total": state.total,
+            "fraction": state.fraction,
+            "fill_rate": state.fill_rate(),
+            "interval": state.interval,
+            "offloading": state.offloading,
+            "throughput": state.throughput,
+            "freed": state.freed,
+            "error": state.error
+        } for state in self.states}
+
+    def _run(self):
+        with self._condition:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                for state in self.states:
+                    if not state.polling and state.next_poll <= now:
+                        state.polling = True
+                        self._polls.submit(self._poll, state)
+
+                waiting = [state.next_poll for state in self.states if not state.polling]
+                self._condition.wait(max(0.0, min(waiting, default=self.max_interval) - now))
+
+    def _poll(self, state):
+        try:
+            self.poll(state)
+        except Exception as err:  # keep the camera in the schedule
+            state.error = f"{type(err).__name__}: {err}"
+            state.interval = self.max_interval
+
+        with self._condition:
+            state.polling = False
+            state.next_poll = time.monotonic() + state.interval
+            self._condition.notify_all()
+
+    def poll(self, state):
+        """
+        Read the storage usage of a camera, start an offload if required and set the next poll interval
+        """
+        info = state.client.get_info()
+        storage = parse_storage(info) if info is not None else None
+
+        if storage is None:
+            state.error = "no response" if info is None else "no storage usage in info"
+            state.interval = min(self.max_interval, max(self.min_interval, state.interval * 2))
+            return
+
+        state.error = None
+        used, state.total = storage
+        state.samples.append((time.monotonic(), used))
+
+        rate = state.fill_rate()
+        start_left = (self.start_fraction * state.total - used) / rate if rate > 0 else float("inf")
+        high_water_left = (self.high_water * state.total - used) / rate if rate > 0 else float("inf")
+        state.interval = min(self.max_interval, max(self.min_interval, start_left / 4))
+
+        # the high-water mark could be reached before the offload of the next poll is finished
+        if not state.offloading and (used >= self.start_fraction * state.total or high_water_left < 2 * state.interval):
+            state.offloading = True
+            self._offloads.submit(self._offload, state)
+
+    def batch_size(self, state):
+        """
+        Number of files downloaded before they are deleted, sized for batch_seconds at the measured throughput
+        """
+        if not state.throughput or not state.file_size:
+            return 10
+        return max(1, min(500, int(state.throughput * self.batch_seconds / state.file_size)))
+
+    def _offload(self, state):
+        try:
+            self.offload(state)
+        except Exception as err:
+            state.error = f"offload failed: {type(err).__name__}: {err}"
+        finally:
+            state.offloading = False
+
+    def offload(self, state):
+        """
+        Download and delete the oldest files of a camera until the used storage is below the target
+        :return: number of bytes deleted from the camera
+        """
+        camera, client = state.camera, state.client
+        to_free = state.used - self.target * state.total
+        if to_free <= 0:  # below the target again (files deleted meanwhile)
+            return 0
+        freed = 0
+
+        print(f"{camera.name}: storage {state.fraction:.0%} used, offloading {to_free / 1e6:.1f} MB")
+
+        for source in self.sources:
+            files = sync.list_remote_files(client, source)
+            if not files:
+                continue
+            files = sorted(files)  # file names start with date and time
+            path = os.path.join(self.path, camera.name, source)
+
+            while files and freed < to_free and not self._stop.is_set():
+                count = self.batch_size(state)
+                batch, files = files[:count], files[count:]
+
+                report = client.download_files(batch, source, path=path, checksum="sha256")
+                downloaded = [result for result in report.results if result.status == downloader.OK]
+                if not downloaded:
+                    print(f"{camera.name}: offload of {source} stopped, no file downloaded")
+                    break
+
+                state.throughput = report.throughput
+                state.file_size = sum(result.bytes for result in downloaded) / len(downloaded)
+                sizes = {result.filename: result.bytes for result in downloaded}
+
+                for result in downloaded:
+                    if self.manifest is not None:
+                        self.manifest.add(client.ip_address, source, result.filename, result.path, result.bytes,
+                                          result.checksum)
+
+                delete_report = client.delete_files(list(sizes), source)
+                for result in delete_report.results:
+                    if result.status in (cleanup.DELETED, cleanup.MISSING):
+                        freed += sizes[result.filename]
+                        if self.manifest is not None:
+                            self.manifest.mark_deleted(client.ip_address, source, result.filename)
+
+            if freed >= to_free:
+                break
+
+        state.freed += freed
+        state.samples.clear()  # the fill rate is measured again after the offload
+        print(f"{camera.name}: offloaded {freed / 1e6:.1f} MB")
+
+        return freed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download and delete the oldest files before the SD card is full")
+    parser.add_argument("--cameras",
+                        help="camera inventory (JSON, see fleet.py), camera of the configuration if not set")
+    parser.add_argument("--path", default="offload", help="local folder for the files")
+    parser.add_argument("--start", type=float, default=0.8, help="used fraction at which an offload starts")
+    parser.add_argument("--high-water", type=float, default=0.9, help="used fraction that must not be reached")
+    parser.add_argument("--target", type=float, default=0.6, help="used fraction after an offload")
+    parser.add_argument("--min-interval", type=float, default=30.0, help="shortest poll interval in seconds")
+    parser.add_argument("--max-interval", type=float, default=900.0, help="longest poll interval in seconds")
+    args = parser.parse_args()
+
+    if args.cameras:
+        cameras = fleet.Fleet.from_file(args.cameras).cameras
+    else:
+        default = configuration.settings()
+        cameras = [fleet.Camera(default["ip_address"], default["key"])]
+
+    monitor = OffloadMonitor(cameras, path=args.path, start=args.start, high_water=args.high_water,
+                             target=args.target, min_interval=args.min_interval, max_interval=args.max_interval)
+    try:
+        monitor.run_forever()
+    except KeyboardInterrupt:
+        monitor.stop()
+        monitor.join()
@@ -0,0 +1,219 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Processing of downloaded images in a process pool (band statistics, thumbnails, archive formats)
+# requires numpy and Pillow. Attached to a download, every file is processed as soon as it is written;
+# downloads wait when more files are pending than max_pending, so processing can't fall behind without limit.
+#
+# with processing.Processor(tasks=("statistics", "thumbnail"), output="processed") as processor:
+#     client.download_files(files, "scheduler", processor=processor)
+# print(processor.results)
+
+import os
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+THUMBNAIL_SIZE = 256  # longest side in pixels
+HISTOGRAM_BINS = 64
+
+
+def statistics(image, bins=HISTOGRAM_BINS):
+    """
+    Statistics and histogram of a band image
+    :param image: numpy array (height x width)
+    :param bins: number of histogram bins over the value range of the image type
+    :return: python dict
+    """
+    maximum = np.iinfo(image.dtype).max if np.issubdtype(image.dtype, np.integer) else float(image.max())
+    histogram, edges = np.histogram(image, bins=bins, range=(0, maximum or 1))
+    return {
+        "mean": float(image.mean(dtype=np.float64)),
+        "std": float(image.std(dtype=np.float64)),
+        "min": image.min().item(),
+        "max": image.max().item(),
+        "saturated": float(np.count_nonzero(image >= maximum) / image.size),  # fraction of clipped pixels
+        "histogram": histogram.tolist(),
+        "bin_width": float(edges[1] - edges[0])
+    }
+
+
+def _to_8bit(image):
+    if image.dtype == np.uint8:
+        return image
+    maximum = np.iinfo(image.dtype).max if np.issubdtype(image.dtype, np.integer) else max(float(image.max()), 1e-9)
+    return (image.astype(np.float32) * (255.0 / maximum)).clip(0, 255).astype(np.uint8)
+
+
+def thumbnail(image, path, size=THUMBNAIL_SIZE):
+    """
+    Write a JPEG thumbnail of a band image
+    :param image: numpy array (height x width)
+    :param path: path of the thumbnail
+    :param size: longest side in pixels
+    :return: path of the thumbnail
+    """
+    from PIL import Image  # optional dependency
+
+    img = Image.fromarray(_to_8bit(image))
+    img.thumbnail((size, size))
+    img.save(path, "JPEG", quality=85)
+    return path
+
+
+def archive(image, path, format="png"):
+    """
+    Write a band image in a lossless compressed format
+    :param image: numpy array (height x width)
+    :param path: path of the file without extension
+    :param format: "png" (8 and 16 bit), "webp" (lossless, 8 bit) or "tiff" (deflate)
+    :return: path of the file
+    """
+    from PIL import Image  # optional dependency
+
+    if format == "webp" and image.dtype != np.uint8:
+        format = "png"  # WebP has no 16 bit images
+    img = Image.fromarray(image)
+    path = f"{path}.{format}"
+
+    if format == "png":
+        img.save(path, "PNG", optimize=True)
+    elif format == "webp":
+        img.save(path, "WEBP", lossless=True, method=6)
+    elif format == "tiff":
+        img.save(path, "TIFF", compression="tiff_adobe_deflate")
+    else:
+        raise ValueError(f"Unknown archive format {format}")
+
+    return path
+
+
+def process_file(path, tasks, output=None, archive_format="png"):
+    """
+    Decode an image once and run the tasks on it, runs in a worker process
+    :param path: path of the downloaded image
+    :param tasks: names of built-in tasks ("statistics", "thumbnail", "archive") or functions called with
+                  (image, path) (must be importable by the worker processes, i.e. module-level)
+    :param output: folder for thumbnails and archive files, defaults to the folder of the image
+    :param archive_format: format of the archive task
+    :return: python dict task name -> result
+    """
+    from cube import decode_image
+
+    image = decode_image(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    output = output or os.path.dirname(path)
+    results = {}
+
+    for task in tasks:
+        if task == "statistics":
+            results[task] = statistics(image)
+        elif task == "thumbnail":
+            os.makedirs(os.path.join(output, "thumbnails"), exist_ok=True)
+            results[task] = thumbnail(image, os.path.join(output, "thumbnails", f"{name}.jpg"))
+        elif task == "archive":
+            os.makedirs(os.path.join(output, "archive"), exist_ok=True)
+            results[task] = archive(image, os.path.join(output, "archive", name), format=archive_format)
+        else:
+            results[getattr(task, "__name__", str(task))] = task(image, path)
+
+    return results
+
+
+@dataclass
+class ProcessResult:
+    """
+    Result of processing one file
+    """
+    path: str
+    results: dict = field(default_factory=dict)  # task name -> result
+    duration: float = 0.0  # from submit until done, including the wait for a worker
+    error: str = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class Processor:
+    """
+    Process pool for downloaded files. submit() blocks while max_pending files are waiting,
+    which slows down the downloads instead of queuing files without limit.
+    """
+
+    def __init__(self, tasks=("statistics",), output=None, max_workers=None, max_pending=None,
+                 archive_format="png", on_result=None):
+        """
+        :param tasks: names of built-in tasks ("statistics", "thumbnail", "archive") or module-level functions
+                      called with (image, path)
+        :param output: folder for thumbnails and archive files, defaults to the folder of each image
+        :param max_workers: number of worker processes, defaults to the number of CPUs
+        :param max_pending: maximum number of files submitted but not processed, defaults to 2 per worker
+        :param archive_format: "png", "webp" or "tiff"
+        :param on_result: optional function called with every ProcessResult
+        """
+        self.tasks = tuple(tasks)
+        self.output = output
+        self.archive_format = archive_format
+        self.on_result = on_result
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.results = []
+        self._pending = threading.BoundedSemaphore(max_pending or 2 * self.max_workers)
+        self._lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, path):
+        """
+        Process a file, blocks while the maximum number of files is pending
+        :param path: path of the image
+        """
+        self._pending.acquire()
+        start = time.monotonic()
+        try:
+            future = self._executor.submit(process_file, path, self.tasks, self.output, self.archive_format)
+        except Exception:
+            self._pending.release()
+            raise
+        future.add_done_callback(lambda done: self._done(path, start, done))
+
+    def _done(self, path, start, future):
+        self._pending.release()
+        result = ProcessResult(path, duration=time.monotonic() - start)
+        try:
+            result.results = future.result()
+        except Exception as err:  # e.g. not an image (logs)
+            result.error = f"{type(err).__name__}: {err}"
+
+        with self._lock:
+            self.results.append(result)
+            if self.on_result:
+                try:
+                    self.on_result(result)
+                except Exception as err:
+                    print(f"Result handler failed: {err}")
+
+    def close(self):
+        """
+        Wait until all submitted files are processed and stop the worker processes
+        """
+        self._executor.shutdown(wait=True)
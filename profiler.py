@@ -0,0 +1,436 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Capture latency profiling: timing of every stage of a capture (request sent, first byte, last byte, files listed,
+# download complete) with the capture settings and firmware, stored as time series (SQLite). Expected durations
+# and adaptive timeouts per camera are derived from the recent captures.
+#
+# with profiler.CaptureProfiler("profile.sqlite") as profile:
+#     file_info, capture = profile.take_ms_image(client, path="images")
+#     profile.apply(client)  # images/takeimage timeout from the measured durations
+#     print(profile.expected_duration(client.ip_address, profiler.TAKEIMAGE))
+
+import os
+import time
+import sqlite3
+import argparse
+import threading
+from dataclasses import dataclass, asdict
+
+import api_v1
+import resilience
+
+TAKEIMAGE = "images/takeimage"
+MONO_IMAGE = "camera/image"  # camera/image.jpg and camera/image.png
+
+# stages of a capture, seconds after the request was sent
+STAGES = ("first_byte", "last_byte", "listed", "downloaded")
+
+# errors after which the elapsed time is a lower bound of the capture duration
+TIMEOUT_ERRORS = ("CameraTimeout", "DeadlineExceeded")
+
+
+@dataclass
+class CaptureProfile:
+    """
+    Timing of one capture
+    """
+    camera: str
+    command: str  # TAKEIMAGE or MONO_IMAGE
+    started: float  # time the request was sent (time.time())
+    firmware: str = None
+    spectrum: int = None  # settings of monochrome images, takeimage uses the global settings of the camera
+    brightness: int = None
+    exposure: float = None
+    first_byte: float = None  # response headers received, the capture is done
+    last_byte: float = None  # response body received (image of a monochrome capture)
+    listed: float = None  # all files of the capture in the file list
+    downloaded: float = None  # all files of the capture downloaded
+    elapsed: float = None  # until the capture request completed or failed
+    files: int = 0
+    bytes: int = 0
+    error: str = None
+
+
+def _quantile(values, quantile):
+    # linear interpolation between the closest ranks
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * quantile
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class CaptureProfiler:
+    """
+    Records the timing of captures and estimates their duration per camera, command and firmware
+    """
+
+    def __init__(self, path="profile.sqlite", check_listing=True, listing_timeout=30.0, poll_interval=0.5):
+        """
+        :param path: path of the SQLite database file
+        :param check_listing: measure when the files of a takeimage capture appear in the file list (lists the
+                              whole source, one request per page)
+        :param listing_timeout: seconds to wait for the files in the file list
+        :param poll_interval: seconds between the file list requests
+        """
+        self.path = path
+        self.check_listing = check_listing
+        self.listing_timeout = listing_timeout
+        self.poll_interval = poll_interval
+        self._firmware = {}  # camera -> firmware version
+        self._configured = {}  # camera -> takeimage timeout of the client before the first apply()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS captures (
+                camera TEXT NOT NULL,
+                command TEXT NOT NULL,
+                started REAL NOT NULL,
+                firmware TEXT,
+                spectrum INTEGER,
+                brightness INTEGER,
+                exposure REAL,
+                first_byte REAL,
+                last_byte REAL,
+                listed REAL,
+                downloaded REAL,
+                elapsed REAL,
+                files INTEGER,
+                bytes INTEGER,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS captures_time ON captures (camera, command, started);""")
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def firmware(self, client):
+        """
+        Firmware version of a camera (get_status), requested once per camera
+        :param client: CameraClient of the camera
+        :return: firmware version or None if the status could not be received
+        """
+        camera = client.ip_address
+        with self._lock:
+            if camera in self._firmware:
+                return self._firmware[camera]
+
+        try:
+            status = client.get_status()
+        except IOError:
+            status = None
+        if status is None:
+            return None
+
+        with self._lock:
+            return self._firmware.setdefault(camera, status.get("firmware") or status.get("version"))
+
+    def record(self, profile):
+        """
+        Store the timing of a capture
+        :param profile: CaptureProfile
+        """
+        row = tuple(asdict(profile).values())
+        with self._lock:
+            self._db.execute(f"INSERT INTO captures VALUES ({', '.join('?' * len(row))})", row)
+            self._db.commit()
+
+    @staticmethod
+    def _capture(client, profile, command, settings, read, timeout, start):
+        # send the capture request, the response is streamed to separate first and last byte
+        response = None
+        try:
+            response = client.request(command, settings=settings, timeout=timeout, stream=True)
+            if response is not None:
+                profile.first_byte = time.perf_counter() - start
+                if response.status_code == 200:
+                    result = read(response)
+                    profile.last_byte = time.perf_counter() - start
+                    return result
+                profile.error = f"response code {response.status_code}"
+            elif time.perf_counter() - start >= 0.95 * client.get_timeout(command, timeout):
+                profile.error = "CameraTimeout"  # client without raise_errors, the error was printed
+            else:
+                profile.error = "no response"
+        except resilience.CameraResponseError as err:  # client with raise_errors
+            profile.first_byte = time.perf_counter() - start
+            profile.error = f"response code {err.status_code}"
+            raise
+        except (resilience.CameraError, IOError) as err:
+            profile.error = type(err).__name__
+            raise
+        finally:
+            profile.elapsed = time.perf_counter() - start
+            if response is not None:
+                response.close()
+
+        return None
+
+    def _listed(self, client, source, files):
+        # wait until all files are in the file list of the source
+        missing = set(files)
+        end = time.monotonic() + self.listing_timeout
+        while True:
+            try:
+                missing.difference_update(client.iter_files(source=source))
+            except IOError:
+                pass
+            if not missing or time.monotonic() >= end:
+                return not missing
+            time.sleep(self.poll_interval)
+
+    def take_ms_image(self, client, path=None, timeout=None):
+        """
+        Take a multispectral image (global settings) and record the timing
+        :param client: CameraClient of the camera
+        :param path: local folder the files are downloaded to, not downloaded if not set
+        :param timeout: sets the timeout in seconds, defaults to the timeout of the client
+        :return: (file information (python dict) or None, CaptureProfile)
+        """
+        profile = CaptureProfile(camera=client.ip_address, command=TAKEIMAGE, started=time.time(),
+                                 firmware=self.firmware(client))
+        start = time.perf_counter()  # stages are relative to the capture request
+
+        try:
+            file_info = self._capture(client, profile, TAKEIMAGE, None, lambda response: response.json(), timeout,
+                                      start)
+        except Exception:
+            self.record(profile)
+            raise
+
+        if file_info is not None:
+            files = list(file_info["files"])
+            profile.files = len(files)
+
+            if self.check_listing:
+                if self._listed(client, file_info["source"], files):
+                    profile.listed = time.perf_counter() - start
+                else:
+                    profile.error = "files not listed"
+
+            if path is not None:
+                report = client.download_files(files, file_info["source"], path=path)
+                profile.bytes = report.bytes
+                if report.failed:
+                    profile.error = f"{report.failed} downloads failed"
+                else:
+                    profile.downloaded = time.perf_counter() - start
+
+        self.record(profile)
+
+        return file_info, profile
+
+    def save_mono_image(self, client, spectrum, brightness, exposure, full_path, checksum=None, timeout=None):
+        """
+        Take a monochrome image, stream it to disk and record the timing
+        :param client: CameraClient of the camera
+        :param spectrum: 0-10, see README
+        :param brightness: 0-1000
+        :param exposure: time in seconds (see README)
+        :param full_path: local path the image is stored to, the image format is taken from the file extension
+        :param checksum: optional hash algorithm calculated while downloading, e.g. "sha256"
+        :param timeout: sets the timeout in seconds, defaults to the timeout of the client
+        :return: (file information (python dict with path, bytes and checksum) or None, CaptureProfile)
+        """
+        profile = CaptureProfile(camera=client.ip_address, command=MONO_IMAGE, started=time.time(),
+                                 firmware=self.firmware(client), spectrum=spectrum, brightness=brightness,
+                                 exposure=exposure)
+        settings = {"spectrum": spectrum, "brightness": brightness, "exposure": exposure}
+        extension = os.path.splitext(full_path)[1]
+
+        try:
+            file_info = self._capture(client, profile, f"camera/image{extension}", settings,
+                                      lambda response: api_v1.stream_to_file(response, full_path, checksum=checksum),
+                                      timeout, time.perf_counter())
+        except Exception:
+            self.record(profile)
+            raise
+
+        if file_info is not None:
+            profile.files = 1
+            profile.bytes = file_info["bytes"]
+            profile.downloaded = profile.last_byte  # the image is the response body
+
+        self.record(profile)
+
+        return file_info, profile
+
+    def samples(self, camera=None, command=None, firmware=None, since=None, limit=None):
+        """
+        Get recorded captures, newest first
+        :param camera: camera identifier (IP address), all cameras if not set
+        :param command: TAKEIMAGE or MONO_IMAGE, all if not set
+        :param firmware: only captures with this firmware version
+        :param since: only captures started after this time (time.time())
+        :param limit: maximum number of captures
+        :return: list of CaptureProfile
+        """
+        conditions, params = [], []
+        for column, value in (("camera", camera), ("command", command), ("firmware", firmware)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("started >= ?")
+            params.append(since)
+
+        query = "SELECT * FROM captures"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY started DESC"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+
+        return [CaptureProfile(*row) for row in rows]
+
+    def _durations(self, camera, command, firmware, window):
+        # (exposure, duration, timed out) of the recent captures, timeouts count as lower bound
+        samples = self.samples(camera, command, firmware=firmware, limit=window)
+        return [(sample.exposure, sample.last_byte, False) if sample.last_byte is not None
+                else (sample.exposure, sample.elapsed, True) for sample in samples
+                if sample.last_byte is not None or sample.error in TIMEOUT_ERRORS]
+
+    def _current_firmware(self, camera, firmware):
+        with self._lock:
+            return firmware or self._firmware.get(camera)
+
+    def expected_duration(self, camera, command=TAKEIMAGE, exposure=None, firmware=None, quantile=0.5, window=200,
+                          min_samples=3):
+        """
+        Estimate the duration of a capture request from the recent captures. For monochrome images with an
+        exposure the duration is fitted linearly over the exposure times.
+        :param camera: camera identifier (IP address)
+        :param command: TAKEIMAGE or MONO_IMAGE
+        :param exposure: exposure time of the monochrome image in seconds
+        :param firmware: only captures with this firmware version, defaults to the current firmware of the camera
+        :param quantile: 0.5 for the median, 0.95 for a duration that is rarely exceeded
+        :param window: number of recent captures used
+        :param min_samples: minimum number of captures
+        :return: seconds or None if there are not enough captures
+        """
+        durations = self._durations(camera, command, self._current_firmware(camera, firmware), window)
+        if len(durations) < min_samples:
+            return None
+
+        values = [duration for _, duration, _ in durations]
+        points = [(x, y) for x, y, _ in durations if x is not None]
+        if exposure is None or len({x for x, _ in points}) < 2:
+            return _quantile(values, quantile)
+
+        # least squares fit duration = offset + slope * exposure, the quantile is taken from the residuals
+        count = len(points)
+        mean_x = sum(x for x, _ in points) / count
+        mean_y = sum(y for _, y in points) / count
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x) ** 2 for x, _ in points)
+        offset = mean_y - slope * mean_x
+        residual = _quantile([y - (offset + slope * x) for x, y in points], quantile)
+        return max(0.0, offset + slope * exposure + residual)
+
+    def timeout(self, camera, command=TAKEIMAGE, firmware=None, quantile=0.99, margin=1.5, minimum=5.0,
+                window=200, min_samples=10, floor=None):
+        """
+        Adaptive timeout: a high quantile of the recent durations with a safety margin. A capture that timed out
+        in the window sets the timeout to at least its elapsed time with the margin, so a single timeout restores
+        the headroom immediately.
+        :param camera: camera identifier (IP address)
+        :param command: TAKEIMAGE or MONO_IMAGE
+        :param firmware: only captures with this firmware version, defaults to the current firmware of the camera
+        :param quantile: quantile of the durations
+        :param margin: factor applied to the quantile
+        :param minimum: lower limit in seconds
+        :param window: number of recent captures used
+        :param min_samples: minimum number of captures
+        :param floor: optional lower limit in seconds above minimum, e.g. the configured timeout of the command
+        :return: seconds or None if there are not enough captures
+        """
+        duration = self.expected_duration(camera, command, firmware=firmware, quantile=quantile, window=window,
+                                          min_samples=min_samples)
+        if duration is None:
+            return None
+
+        durations = self._durations(camera, command, self._current_firmware(camera, firmware), window)
+        timed_out = [elapsed for _, elapsed, timeout in durations if timeout]
+        if timed_out:
+            duration = max(duration, max(timed_out))
+        return max(minimum, floor or 0.0, duration * margin)
+
+    def apply(self, client, floor=None, keep_configured=False, **kwargs):
+        """
+        Set the takeimage timeout of a client from its recent captures (the timeout of monochrome images depends
+        on the exposure, see expected_duration()). The timeout follows the measured durations, so a stuck capture
+        is detected sooner than with the configured timeout.
+        :param client: CameraClient of the camera
+        :param floor: lower limit in seconds, defaults to minimum of timeout()
+        :param keep_configured: never set the timeout below the takeimage timeout of the client before the first
+                                apply() (ENDPOINT_TIMEOUTS or the configuration)
+        :param kwargs: settings of timeout()
+        :return: timeout in seconds or None if there are not enough captures (timeout not changed)
+        """
+        with self._lock:
+            configured = self._configured.setdefault(client.ip_address, client.get_timeout(TAKEIMAGE))
+        if keep_configured:
+            floor = max(floor or 0.0, configured)
+        timeout = self.timeout(client.ip_address, TAKEIMAGE, floor=floor, **kwargs)
+        if timeout is not None:
+            client.endpoint_timeouts[TAKEIMAGE] = timeout
+        return timeout
+
+    def summary(self, since=None):
+        """
+        Quantiles of every stage per camera, command and firmware
+        :param since: only captures started after this time (time.time())
+        :return: python dict "camera command firmware" -> statistics
+        """
+        groups = {}
+        for sample in self.samples(since=since):
+            groups.setdefault((sample.camera, sample.command, sample.firmware), []).append(sample)
+
+        result = {}
+        for (camera, command, firmware), samples in groups.items():
+            stats = {"captures": len(samples), "errors": sum(1 for sample in samples if sample.error)}
+            for stage in STAGES:
+                values = [getattr(sample, stage) for sample in samples if getattr(sample, stage) is not None]
+                if values:
+                    stats[stage] = {"p50": _quantile(values, 0.5), "p95": _quantile(values, 0.95),
+                                    "max": max(values)}
+            result[f"{camera} {command} {firmware}"] = stats
+
+        return result
+
+
+if __name__ == "__main__":
+    import json
+
+    parser = argparse.ArgumentParser(description="Summary of recorded capture timings")
+    parser.add_argument("database", nargs="?", default="profile.sqlite", help="profile database")
+    parser.add_argument("--hours", type=float, help="only captures of the last hours")
+    args = parser.parse_args()
+
+    with CaptureProfiler(args.database) as captures:
+        print(json.dumps(captures.summary(since=time.time() - args.hours * 3600 if args.hours else None), indent=2))
@@ -0,0 +1,252 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Error handling of the API calls: typed exceptions, retries of read-only commands with jittered
+# exponential backoff, a circuit breaker per camera and deadlines covering several calls.
+#
+# with resilience.deadline(60):  # all API calls of this block (and thread) together take at most 60 s
+#     files = camera.get_file_list("scheduler")
+
+import time
+import random
+import threading
+import contextlib
+import contextvars
+
+# commands that can be sent again without side effects
+IDEMPOTENT = {"status", "info", "files/list", "files/get", "images/firstinrange"}
+
+# HTTP status codes of temporary camera errors
+RETRY_STATUS = {502, 503, 504}
+
+
+class CameraError(IOError):
+    """
+    Base class of the API call errors
+    """
+
+    def __init__(self, message, camera=None, command=None):
+        super().__init__(message)
+        self.camera = camera
+        self.command = command
+
+
+class CameraUnavailable(CameraError):
+    """
+    The camera could not be reached (connection refused, no route, ...), the request was not sent
+    """
+
+
+class CameraDisconnected(CameraError):
+    """
+    The connection was lost after the request was sent
+    """
+
+
+class CameraTimeout(CameraError):
+    """
+    The camera did not answer in time
+    """
+
+
+class DeadlineExceeded(CameraTimeout):
+    """
+    The deadline of the calling operation has passed
+    """
+
+
+class CircuitOpen(CameraUnavailable):
+    """
+    The camera failed repeatedly, calls fail immediately until the circuit breaker allows a new attempt
+    """
+
+
+class CameraResponseError(CameraError):
+    """
+    The camera answered with an error status code
+    """
+
+    def __init__(self, message, response, camera=None, command=None):
+        super().__init__(message, camera=camera, command=command)
+        self.response = response
+        self.status_code = response.status_code
+
+
+class RetryPolicy:
+    """
+    Retries of failed API calls. Only idempotent commands are retried after the request reached the camera,
+    commands with side effects (takeimage, reset, delete, upload, ...) are sent once. Read timeouts are not retried
+    by default, a camera that does not answer would otherwise block a call for (retries + 1) timeouts.
+    """
+
+    def __init__(self, retries=2, backoff_factor=0.5, max_backoff=10.0, idempotent=IDEMPOTENT,
+                 retry_status=RETRY_STATUS, retry_timeouts=False):
+        """
+        :param retries: number of retries per call
+        :param backoff_factor: the delay before retry n is a random value up to backoff_factor * 2 ** (n - 1)
+        :param max_backoff: upper limit of the delay in seconds
+        :param idempotent: commands that are retried
+        :param retry_status: HTTP status codes that are retried
+        :param retry_timeouts: True to retry idempotent commands after read timeouts as well
+        """
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.idempotent = set(idempotent)
+        self.retry_status = set(retry_status)
+        self.retry_timeouts = retry_timeouts
+
+    def should_retry(self, command, error, attempt):
+        """
+        :param command: API command, e.g. "files/list"
+        :param error: CameraError of the failed attempt
+        :param attempt: number of the failed attempt, starting at 1
+        :return: True if the call should be sent again
+        """
+        if attempt > self.retries or command not in self.idempotent:
+            return False
+        if isinstance(error, (DeadlineExceeded, CircuitOpen)):
+            return False
+        if isinstance(error, CameraResponseError):
+            return error.status_code in self.retry_status
+        # failed connection attempts (CameraUnavailable) are already retried by the connection pool
+        if isinstance(error, CameraTimeout):
+            return self.retry_timeouts
+        return isinstance(error, CameraDisconnected)
+
+    def delay(self, attempt):
+        """
+        Delay before the next attempt ("full jitter", spreads the retries of many clients)
+        :param attempt: number of the failed attempt, starting at 1
+        :return: seconds
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** (attempt - 1)))
+
+
+NO_RETRY = RetryPolicy(retries=0)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a camera after repeated connection failures or timeouts. After reset_timeout one call is let
+    through, the circuit closes again if it succeeds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        :param failure_threshold: number of consecutive failures that open the circuit
+        :param reset_timeout: seconds until a new attempt is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """
+        :return: CLOSED or HALF_OPEN (trial call, must end with record_success(), record_failure() or release())
+                 if a call may be sent, False otherwise
+        """
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return self.CLOSED
+            if state == self.HALF_OPEN and not self._trial:
+                self._trial = True  # one trial call at a time
+                return self.HALF_OPEN
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened = None
+            self._trial = False
+
+    def release(self):
+        """
+        End a trial call that neither succeeded nor failed (e.g. deadline exceeded), another trial call can be sent
+        """
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.failure_threshold or self.opened is not None:
+                self.opened = time.monotonic()
+
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+@contextlib.contextmanager
+def deadline(seconds=None, at=None):
+    """
+    Limit the total time of all API calls in the block, the timeout of each call is shortened to the remaining
+    time. Nested deadlines can only shorten the outer one. The deadline applies to the current thread
+    (contextvars), functions run in worker threads have to be wrapped with in_context() or enter it themselves
+    (see fleet.py).
+    :param seconds: time from now
+    :param at: absolute deadline (time.monotonic())
+    """
+    if at is None:
+        at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(outer, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def in_context(function):
+    """
+    Wrap a function that is run in worker threads (ThreadPoolExecutor), every call runs in its own copy of the
+    context of the caller, so the deadline of the caller applies to the calls in the worker threads
+    :param function: function called in the worker threads
+    :return: wrapped function
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(function, *args, **kwargs)
+
+    return run
+
+
+def remaining():
+    """
+    :return: seconds until the current deadline, None if no deadline is set
+    """
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
@@ -0,0 +1,145 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Spectral sweep - a series of monochrome images with individual settings per spectrum.
+# Unlike images/takeimage (global settings only), every step can use its own brightness and exposure.
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import resilience
+from api_v1 import SPECTRA
+
+
+@dataclass
+class Step:
+    """
+    Settings of one monochrome image
+    """
+    spectrum: int  # 0-10, see README
+    brightness: int  # 0-1000
+    exposure: float  # seconds, see README
+
+
+@dataclass
+class Frame:
+    """
+    Result of one step
+    """
+    step: Step
+    image: bytes = None  # image data, if the sweep is kept in memory
+    path: str = None  # local file, if the sweep is stored to disk
+    bytes: int = 0
+    latency: float = 0.0  # seconds from request to complete image
+    decoded: object = None  # result of the decode function
+    error: str = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+@dataclass
+class SweepResult:
+    """
+    Frames of a sweep, in the order of the steps
+    """
+    frames: list = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def ok(self):
+        return all(frame.ok for frame in self.frames)
+
+    def summary(self):
+        latencies = ", ".join(f"{frame.step.spectrum}: {frame.latency:.2f} s" for frame in self.frames)
+        failed = sum(1 for frame in self.frames if not frame.ok)
+        return f"{len(self.frames)} frames, {failed} failed, {self.duration:.2f} s total ({latencies})"
+
+
+def all_spectra(brightness, exposure, skip_dark=True):
+    """
+    Steps for every available spectrum with the same settings
+    :param brightness: 0-1000
+    :param exposure: time in seconds (see README)
+    :param skip_dark: leave out spectrum 0 (LEDs off)
+    :return: list of Step
+    """
+    return [Step(spectrum, brightness, exposure) for spectrum in SPECTRA if spectrum or not skip_dark]
+
+
+def sweep(client, steps, path=None, file_extension=".png", name="sweep", decode=None, timeout=None):
+    """
+    Capture the steps back-to-back over the connection of the client
+    :param client: CameraClient of the camera
+    :param steps: list of Step (or tuples (spectrum, brightness, exposure))
+    :param path: local folder the images are streamed to, images are kept in memory if not set
+    :param file_extension: image format, ".jpg" or ".png"
+    :param name: file name prefix of the images, files are named <name>_<spectrum><file_extension>
+    :param decode: optional function called with the Frame, runs in the background while the next step is captured
+    :param timeout: sets the timeout in seconds per step
+    :return: SweepResult
+    """
+    steps = [step if isinstance(step, Step) else Step(*step) for step in steps]
+
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+
+    result = SweepResult()
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=1) as decoder:
+        decoding = []
+
+        for step in steps:
+            frame = Frame(step)
+            requested = time.monotonic()
+
+            try:
+                if path is None:
+                    frame.image = client.get_mono_image(step.spectrum, step.brightness, step.exposure,
+                                                        file_extension=file_extension, timeout=timeout)
+                    if frame.image is not None:
+                        frame.bytes = len(frame.image)
+                    else:
+                        frame.error = "image not received"
+                else:
+                    full_path = os.path.join(path, f"{name}_{step.spectrum}{file_extension}")
+                    file_info = client.save_mono_image(step.spectrum, step.brightness, step.exposure, full_path,
+                                                       timeout=timeout)
+                    if file_info is not None:
+                        frame.path = file_info["path"]
+                        frame.bytes = file_info["bytes"]
+                    else:
+                        frame.error = "image not received"
+            except resilience.CameraError as err:  # client with raise_errors, a failed step must not stop the sweep
+                frame.error = f"{type(err).__name__}: {err}"
+
+            frame.latency = time.monotonic() - requested
+            result.frames.append(frame)
+
+            if decode and frame.ok:
+                decoding.append((frame, decoder.submit(decode, frame)))
+
+        for frame, future in decoding:
+            try:
+                frame.decoded = future.result()
+            except Exception as err:
+                frame.error = f"decoding failed: {err}"
+
+    result.duration = time.monotonic() - start
+
+    return result
@@ -0,0 +1,238 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Incremental download of camera sources. A local manifest (SQLite) records every file that was
+# downloaded, so each run only transfers the files that are new on the camera.
+
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+
+import downloader
+
+DOWNLOADED = "downloaded"
+DELETED = "deleted"  # downloaded and removed from the camera afterwards
+
+
+class Manifest:
+    """
+    Local record of the files downloaded per camera and source
+    """
+
+    def __init__(self, path="manifest.sqlite"):
+        """
+        :param path: path of the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                camera TEXT NOT NULL,
+                source TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                local_path TEXT,
+                bytes INTEGER,
+                checksum TEXT,
+                state TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (camera, source, filename)
+            )""")
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def files(self, camera, source, state=None):
+        """
+        Get the recorded files of a camera source
+        :param camera: camera identifier (IP address)
+        :param source: source folder (see README)
+        :param state: only return files in this state (downloaded, deleted)
+        :return: python dict filename -> (local_path, bytes, checksum, state)
+        """
+        query = "SELECT filename, local_path, bytes, checksum, state FROM files WHERE camera = ? AND source = ?"
+        params = [camera, source]
+        if state:
+            query += " AND state = ?"
+            params.append(state)
+
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+
+        return {row[0]: row[1:] for row in rows}
+
+    def add(self, camera, source, filename, local_path, size, checksum):
+        """
+        Record a downloaded file
+        """
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (camera, source, filename, local_path, size, checksum, DOWNLOADED, time.time()))
+            self._db.commit()
+
+    def mark_deleted(self, camera, source, filename):
+        """
+        Record that a downloaded file was removed from the camera
+        """
+        with self._lock:
+            self._db.execute("UPDATE files SET state = ?, updated = ? WHERE camera = ? AND source = ? AND filename = ?",
+                             (DELETED, time.time(), camera, source, filename))
+            self._db.commit()
+
+
+@dataclass
+class SyncReport:
+    """
+    Result of syncing one camera source
+    """
+    camera: str
+    source: str
+    remote_files: int = 0
+    new_files: list = field(default_factory=list)
+    download: downloader.DownloadReport = None
+    deleted: list = field(default_factory=list)
+
+    def summary(self):
+        downloaded = self.download.summary() if self.download else "nothing to download"
+        return (f"{self.camera} {self.source}: {self.remote_files} files on camera, {len(self.new_files)} new, "
+                f"downloaded {downloaded}, {len(self.deleted)} deleted")
+
+
+def list_remote_files(client, source, start_datetime=None, end_datetime=None, page_size=500):
+    """
+    List all files of a source on the camera
+    :param client: CameraClient of the camera
+    :param source: source folder (see README)
+    :param start_datetime: optional start of the time range (according to ISO8601)
+    :param end_datetime: optional end of the time range (according to ISO8601)
+    :param page_size: number of files requested per files/list call
+    :return: list with file names or None if the camera could not be reached
+    """
+    try:
+        if start_datetime or end_datetime:
+            files_in_range = client.get_files_in_range(start_datetime=start_datetime, end_datetime=end_datetime,
+                                                       source=source)
+            return None if files_in_range is None else list(files_in_range["files"])
+
+        return list(client.iter_files(source=source, page_size=page_size))
+    except IOError as err:  # includes resilience.CameraError of clients with raise_errors
+        print(err)
+        return None
+
+
+def file_checksum(path, algorithm="sha256", chunk_size=1024 * 1024):
+    """
+    Calculate the checksum of a local file
+    :param path: local path of the file
+    :param algorithm: hashlib algorithm, e.g. "sha256"
+    :param chunk_size: number of bytes read at once
+    :return: hex digest
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_verified(local_path, size, checksum, algorithm="sha256"):
+    """
+    Check that a downloaded file is complete and unchanged on disk, the checksum is calculated again
+    :param local_path: local path of the file
+    :param size: size of the download in bytes
+    :param checksum: checksum of the download (hex digest)
+    :param algorithm: hash algorithm of the checksum
+    :return: True if the file can be deleted from the camera
+    """
+    if checksum is None or local_path is None or not os.path.isfile(local_path) or \
+            os.path.getsize(local_path) != size:
+        return False
+    try:
+        return file_checksum(local_path, algorithm) == checksum
+    except (IOError, ValueError):  # unreadable file or unknown algorithm
+        return False
+
+
+def sync_source(client, manifest, source, path=None, start_datetime=None, end_datetime=None,
+                delete=False, max_workers=None, checksum="sha256", progress=None):
+    """
+    Download all files of a source that are not in the manifest yet. Every completed file is recorded
+    immediately, so an interrupted run continues where it stopped.
+    :param client: CameraClient of the camera
+    :param manifest: Manifest
+    :param source: source folder (see README)
+    :param path: local path the files should be downloaded to, defaults to the source name
+    :param start_datetime: optional start of the time range (according to ISO8601)
+    :param end_datetime: optional end of the time range (according to ISO8601)
+    :param delete: delete files from the camera once their download is verified
+    :param max_workers: number of parallel downloads
+    :param checksum: hash algorithm stored in the manifest, e.g. "sha256"
+    :param progress: optional function called with (DownloadResult, DownloadReport) after every file
+    :return: SyncReport or None if the camera could not be reached
+    """
+    camera = client.ip_address
+
+    if path is None:
+        path = source
+
+    remote_files = list_remote_files(client, source, start_datetime=start_datetime, end_datetime=end_datetime)
+    if remote_files is None:
+        return None
+
+    report = SyncReport(camera=camera, source=source, remote_files=len(remote_files))
+
+    known = manifest.files(camera, source)
+    # files downloaded before but missing locally are fetched again
+    report.new_files = [file for file in remote_files
+                        if file not in known or not os.path.isfile(known[file][0] or "")]
+
+    def record(result, download_report):
+        if result.status == downloader.OK:
+            manifest.add(camera, source, result.filename, result.path, result.bytes, result.checksum)
+        if progress:
+            progress(result, download_report)
+
+    if report.new_files:
+        report.download = downloader.download_files(client, report.new_files, source, path=path,
+                                                    max_workers=max_workers, progress=record,
+                                                    checksum=checksum)
+
+    if delete:
+        # also covers files downloaded by an earlier run that was interrupted before deleting
+        downloaded = manifest.files(camera, source, state=DOWNLOADED)
+        # the local files are hashed again, a file changed or damaged since the download is kept on the camera
+        verified = [file for file in remote_files
+                    if file in downloaded and is_verified(*downloaded[file][:3], algorithm=checksum)]
+
+        if verified:
+            delete_report = client.delete_files(verified, source)
+            failed = delete_report.failed
+            for filename in verified:
+                if filename not in failed:  # deleted or already missing on the camera
+                    manifest.mark_deleted(camera, source, filename)
+                    report.deleted.append(filename)
+
+    return report
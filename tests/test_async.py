@@ -0,0 +1,63 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the asyncio client against the mock camera (requires aiohttp)
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mock_camera  # noqa: E402
+
+try:
+    import api_v1_async
+except ImportError:  # optional dependency
+    api_v1_async = None
+
+
+@unittest.skipIf(api_v1_async is None, "requires aiohttp")
+class AsyncClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = mock_camera.serve(mock_camera.MockCamera(key="k"), "127.0.0.1", 0)
+        self.ip_address = f"127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_slow_download(self):
+        # the download takes about 1 s, longer than the timeout, but every read gets data in time
+        self.server.camera.add_files("scheduler", 1, 200 * 1024)
+        self.server.camera.bandwidth = 200 * 1024
+        filename = next(iter(self.server.camera.files["scheduler"]))
+
+        async def download(path):
+            async with api_v1_async.AsyncCameraClient(self.ip_address, "k", timeout=0.5) as client:
+                return await client.save_file(filename, "scheduler", os.path.join(path, filename))
+
+        with tempfile.TemporaryDirectory() as path:
+            file_info = asyncio.run(download(path))
+            self.assertIsNotNone(file_info)
+            self.assertEqual(file_info["bytes"], 200 * 1024)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the response cache, of coalesced requests and of the cache of a client against the mock camera
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import time
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_v1  # noqa: E402
+import cache  # noqa: E402
+import mock_camera  # noqa: E402
+import resilience  # noqa: E402
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_coalesced_error(self):
+        response_cache = cache.ResponseCache()
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def call():
+            started.set()
+            release.wait(5)
+            raise resilience.CameraTimeout("slow", command="status")
+
+        def get():
+            try:
+                response_cache.get("status", None, call)
+            except resilience.CameraError as err:
+                errors.append(err)
+
+        owner = threading.Thread(target=get)
+        owner.start()
+        started.wait(5)
+        waiters = [threading.Thread(target=get) for _ in range(3)]
+        for waiter in waiters:
+            waiter.start()
+        while response_cache.coalesced < len(waiters):
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in [owner] + waiters:
+            thread.join(5)
+
+        self.assertEqual(len(errors), 4)  # the owner and every waiter get the exception
+        self.assertTrue(all(isinstance(err, resilience.CameraTimeout) for err in errors))
+        self.assertEqual(len(response_cache), 0)
+
+
+class ClientCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = mock_camera.serve(mock_camera.MockCamera(key="k"), "127.0.0.1", 0)
+        self.server.camera.add_files("scheduler", 3, 1000)
+        self.cache = cache.ResponseCache(ttls={"status": 0.2, "files/list": 10})
+        self.client = api_v1.CameraClient(f"127.0.0.1:{self.server.server_address[1]}", "k", cache=self.cache)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_ttl(self):
+        self.client.get_status()
+        self.client.get_status()
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        time.sleep(0.3)
+        self.client.get_status()
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+        self.client.get_info()  # not cached
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_invalidated_by_changes(self):
+        files = self.client.get_file_list("scheduler")["files"]
+        self.assertEqual(self.client.get_file_list("scheduler")["files"], files)
+        self.client.delete_file(files[0], "scheduler")
+        self.assertEqual(self.client.get_file_list("scheduler")["files"], files[1:])
+        self.assertEqual(self.cache.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the local file catalog against the mock camera
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import datetime
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_v1  # noqa: E402
+import catalog  # noqa: E402
+import mock_camera  # noqa: E402
+
+START = datetime.datetime(2024, 5, 1, 12, 0, 0)
+
+
+class CatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = mock_camera.serve(mock_camera.MockCamera(key="k"), "127.0.0.1", 0)
+        self.server.camera.add_files("scheduler", 30, 1000, start=START)
+        self.listings = []
+        self.client = api_v1.CameraClient(f"127.0.0.1:{self.server.server_address[1]}", "k",
+                                          hooks=[self.record])
+        self.catalog = catalog.Catalog(":memory:")
+
+    def tearDown(self):
+        self.catalog.close()
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def record(self, call):
+        if call.command == "files/list":
+            self.listings.append(call)
+
+    def test_tail(self):
+        self.assertEqual(self.catalog.refresh(self.client, "scheduler", page_size=10), 30)
+        self.assertEqual(len(self.listings), 3)
+
+        # only the page with the last known file and the new files are requested
+        self.server.camera.add_files("scheduler", 5, 1000, start=START + datetime.timedelta(days=1))
+        del self.listings[:]
+        self.assertEqual(self.catalog.refresh(self.client, "scheduler", page_size=10), 5)
+        self.assertEqual(len(self.listings), 1)
+        self.assertEqual(len(self.catalog.query(self.client.ip_address, "scheduler")), 35)
+
+        del self.listings[:]
+        self.assertEqual(self.catalog.refresh(self.client, "scheduler", page_size=10), 0)
+        self.assertEqual(len(self.listings), 1)
+
+    def test_deleted_files(self):
+        self.catalog.refresh(self.client, "scheduler")
+        files = sorted(self.server.camera.files["scheduler"])
+        with self.server.camera.lock:
+            for filename in files[:10]:
+                del self.server.camera.files["scheduler"][filename]
+
+        # the tail doesn't match the camera anymore, the whole list is requested again
+        self.assertEqual(self.catalog.refresh(self.client, "scheduler"), 0)
+        deleted = self.catalog.query(self.client.ip_address, "scheduler", on_camera=False)
+        self.assertEqual([entry.filename for entry in deleted], files[:10])
+        self.assertEqual(len(self.catalog.query(self.client.ip_address, "scheduler", on_camera=True)), 20)
+
+    def test_time_range(self):
+        self.catalog.refresh(self.client, "scheduler")
+        entries = self.catalog.query(start=START + datetime.timedelta(minutes=5),
+                                     end=START + datetime.timedelta(minutes=9))
+        self.assertEqual([entry.timestamp for entry in entries],
+                         [(START + datetime.timedelta(minutes=minute)).isoformat() for minute in range(5, 10)])
+
+        latest = self.catalog.latest(source="scheduler")[self.client.ip_address]
+        self.assertEqual(latest.timestamp, (START + datetime.timedelta(minutes=29)).isoformat())
+
+        result = self.catalog.files_in_range(self.client, START.isoformat(), START.isoformat(), "scheduler")
+        self.assertEqual(result["files"], [sorted(self.server.camera.files["scheduler"])[0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the batch mode of the command line interface
+#
+# python3 -m unittest discover tests
+
+import io
+import os
+import sys
+import json
+import tempfile
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_v1  # noqa: E402
+import camera  # noqa: E402
+import mock_camera  # noqa: E402
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = mock_camera.serve(mock_camera.MockCamera(key="k"), "127.0.0.1", 0)
+        self.server.camera.add_files("scheduler", 3, 1000)
+        self.camera = f"127.0.0.1:{self.server.server_address[1]}"
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        api_v1.close_clients()
+        self.directory.cleanup()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def batch(self, lines, *options):
+        path = os.path.join(self.directory.name, "jobs.txt")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+            code = camera.main(["batch", path, *options])
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        return code, {record["job"]: record for record in records}
+
+    def test_jobs(self):
+        camera_args = f"--ip {self.camera} --key k"
+        code, records = self.batch([
+            "# status and file list",
+            f"status {camera_args}",
+            "",
+            f"list {camera_args} --source scheduler",
+            json.dumps(["status", "--info", "--ip", self.camera, "--key", "k"]),
+        ], "--jobs", "2")
+        self.assertEqual(code, 0)
+        self.assertEqual(sorted(records), [2, 4, 5])  # line numbers, comments and empty lines are skipped
+        for record in records.values():
+            self.assertTrue(record["ok"], record)
+            self.assertEqual(record["camera"], self.camera)
+        self.assertEqual(records[2]["command"], "status")
+        self.assertEqual(records[4]["command"], "list")
+
+    def test_failed_jobs(self):
+        code, records = self.batch([
+            f"status --ip {self.camera} --key k",
+            "unknown --ip 127.0.0.1",
+            "batch --jobs 2",
+            f"status --ip {self.camera} --key wrong",
+        ], "--jobs", "4")
+        self.assertEqual(code, 1)
+        self.assertEqual(sorted(records), [1, 2, 3, 4])  # every line is reported, the other jobs continue
+        self.assertTrue(records[1]["ok"])
+        self.assertFalse(records[2]["ok"])
+        self.assertIn("error", records[2])
+        self.assertFalse(records[3]["ok"])
+        self.assertIn("nested", records[3]["error"])
+        self.assertFalse(records[4]["ok"])
+        self.assertEqual(records[4]["camera"], self.camera)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the layered runtime configuration: file < profile < RAYN_* environment < camera section < arguments
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_v1  # noqa: E402
+import configuration  # noqa: E402
+import mock_camera  # noqa: E402
+
+CONFIG = {
+    "key": "file-key",
+    "timeout": 30,
+    "retries": 1,
+    "max_downloads": 2,
+    "endpoint_timeouts": {"images/takeimage": 100},
+    "profiles": {
+        "greenhouse": {"timeout": 60, "retries": 4, "pool_size": 8},
+        "lab": {"max_downloads": 8},
+    },
+    "cameras": {
+        "10.1.2.5": {"key": "camera-key", "retries": 0, "endpoint_timeouts": {"files/get": 5}},
+    },
+}
+
+
+class ConfigurationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "rayn.json")
+        with open(self.path, "w") as f:
+            json.dump(CONFIG, f)
+
+    def tearDown(self):
+        configuration.set_config(None)  # the next use loads the configuration of the working directory again
+        api_v1.close_clients()
+        self.directory.cleanup()
+
+    def test_layers(self):
+        config = configuration.load(self.path, profile="greenhouse", environ={"RAYN_TIMEOUT": "90"})
+
+        settings = config.settings("10.1.2.9")
+        self.assertEqual(settings["key"], "file-key")  # file
+        self.assertEqual(settings["retries"], 4)  # profile over file
+        self.assertEqual(settings["pool_size"], 8)
+        self.assertEqual(settings["timeout"], 90.0)  # environment over profile
+        self.assertEqual(settings["max_downloads"], 2)
+        self.assertEqual(settings["backoff_factor"], configuration.DEFAULTS["backoff_factor"])  # built-in default
+
+        settings = config.settings("10.1.2.5")
+        self.assertEqual(settings["key"], "camera-key")  # camera section over everything else
+        self.assertEqual(settings["retries"], 0)
+        self.assertEqual(settings["timeout"], 90.0)
+        self.assertEqual(settings["endpoint_timeouts"], {"images/takeimage": 100, "files/get": 5})  # dicts merged
+
+    def test_profile_from_environment(self):
+        config = configuration.load(self.path, environ={"RAYN_PROFILE": "lab", "RAYN_CACHE": "yes",
+                                                        "RAYN_ENDPOINT_TIMEOUTS": '{"status": 2}'})
+        settings = config.settings()
+        self.assertEqual(settings["max_downloads"], 8)
+        self.assertIs(settings["cache"], True)
+        self.assertEqual(settings["endpoint_timeouts"], {"images/takeimage": 100, "status": 2})
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            configuration.load(self.path, profile="unknown", environ={})
+        with self.assertRaises(ValueError):
+            configuration.Config({"timeuot": 5})
+
+    def test_client_settings(self):
+        server = mock_camera.serve(mock_camera.MockCamera(key="camera-key"), "127.0.0.1", 0)
+        ip_address = f"127.0.0.1:{server.server_address[1]}"
+        try:
+            configuration.set_config(configuration.Config.from_dict(
+                {**CONFIG, "cameras": {ip_address: CONFIG["cameras"]["10.1.2.5"]}}, profile="greenhouse"))
+            client = api_v1.get_client(ip_address)  # key from the camera section
+            self.assertEqual(client.key, "camera-key")
+            self.assertEqual(client.timeout, 60)
+            self.assertEqual(client.get_timeout("images/takeimage"), 100)
+            self.assertIsNotNone(client.get_status())
+            with api_v1.CameraClient(ip_address, timeout=3) as explicit:
+                self.assertEqual(explicit.timeout, 3)  # arguments over configuration
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
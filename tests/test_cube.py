@@ -0,0 +1,62 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of saving and loading multispectral cubes (requires numpy)
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import numpy as np
+    import cube
+except ImportError:  # optional dependency
+    np = None
+
+
+@unittest.skipIf(np is None, "requires numpy")
+class SaveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cube = cube.Cube(np.arange(24, dtype=np.uint8).reshape(2, 3, 4), [1, 5])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def check(self, loaded):
+        np.testing.assert_array_equal(loaded.data, self.cube.data)
+        self.assertEqual(loaded.spectra, self.cube.spectra)
+
+    def test_path_without_extension(self):
+        path = os.path.join(self.directory.name, "capture")
+        saved = self.cube.save(path)
+        self.assertEqual(saved, f"{path}.npy")
+        self.assertTrue(os.path.isfile(f"{path}.npy.json"))
+        self.check(cube.Cube.load(path))
+        self.check(cube.Cube.load(saved))
+
+    def test_npz(self):
+        path = os.path.join(self.directory.name, "capture.npz")
+        self.assertEqual(self.cube.save(path, compressed=True), path)
+        self.check(cube.Cube.load(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
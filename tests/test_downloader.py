@@ -0,0 +1,74 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of parallel downloads from the mock camera
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_v1  # noqa: E402
+import downloader  # noqa: E402
+import mock_camera  # noqa: E402
+
+
+class BrokenProcessor:
+    # rejects every second file
+    def __init__(self):
+        self.submitted = []
+        self.lock = threading.Lock()
+
+    def submit(self, path):
+        with self.lock:
+            self.submitted.append(path)
+            count = len(self.submitted)
+        if count % 2 == 0:
+            raise RuntimeError("processor stopped")
+
+
+class DownloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = mock_camera.serve(mock_camera.MockCamera(key="k"), "127.0.0.1", 0)
+        self.server.camera.add_files("scheduler", 6, 1000)
+        self.client = api_v1.CameraClient(f"127.0.0.1:{self.server.server_address[1]}", "k")
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_processor_error(self):
+        files = list(self.server.camera.files["scheduler"])
+        processor = BrokenProcessor()
+        report = downloader.download_files(self.client, files, "scheduler", path=self.directory.name,
+                                           max_workers=2, processor=processor)
+
+        self.assertEqual(len(report.results), len(files))  # the batch continues after processing errors
+        self.assertEqual(len(processor.submitted), len(files))
+        failed = [result for result in report.results if result.status == downloader.FAILED]
+        self.assertEqual(len(failed), len(files) // 2)
+        self.assertTrue(all(result.error.startswith("processing failed") for result in failed))
+
+
+if __name__ == "__main__":
+    unittest.main()
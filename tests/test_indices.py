@@ -0,0 +1,72 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the vegetation indices (requires numpy)
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import numpy as np
+    import cube
+    import indices
+except ImportError:  # optional dependency
+    np = None
+
+
+@unittest.skipIf(np is None, "requires numpy")
+class IndicesTest(unittest.TestCase):
+
+    def setUp(self):
+        generator = np.random.default_rng(1)
+        self.red = generator.integers(0, 255, (50, 40)).astype(np.uint8)
+        self.nir = generator.integers(0, 255, (50, 40)).astype(np.uint8)
+        self.nir[0, 0] = self.red[0, 0] = 0  # division by zero
+        self.cube = cube.Cube(np.stack([self.red, self.nir]), [5, 8])
+
+    def expected_ndvi(self):
+        nir, red = self.nir.astype(np.float32), self.red.astype(np.float32)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (nir - red) / (nir + red)
+
+    def test_ndvi_tiles(self):
+        expected = self.expected_ndvi()
+        for tile_rows in (7, 256):
+            result = indices.compute("ndvi", self.cube, tile_rows=tile_rows)
+            np.testing.assert_allclose(result, expected, rtol=1e-6)
+        self.assertTrue(np.isnan(result[0, 0]))
+
+    def test_statistics(self):
+        expected = self.expected_ndvi()
+        stats = indices.statistics("ndvi", {5: self.red, 8: self.nir}, tile_rows=16)
+        self.assertEqual(stats["pixels"], np.isfinite(expected).sum())
+        self.assertAlmostEqual(stats["mean"], float(np.nanmean(expected)), places=5)
+        self.assertAlmostEqual(stats["max"], float(np.nanmax(expected)), places=5)
+
+    def test_invalid_expressions(self):
+        with self.assertRaises(ValueError):
+            indices.compute("1.0", self.cube)  # uses no bands
+        with self.assertRaises(ValueError):
+            indices.Expression("__import__('os')")
+        with self.assertRaises(KeyError):
+            indices.compute("b1 / b5", self.cube)  # band 1 not in the cube
+
+
+if __name__ == "__main__":
+    unittest.main()
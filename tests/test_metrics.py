@@ -0,0 +1,57 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the API call statistics against the mock camera
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_v1  # noqa: E402
+import metrics  # noqa: E402
+import mock_camera  # noqa: E402
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = mock_camera.serve(mock_camera.MockCamera(key="k"), "127.0.0.1", 0)
+        self.ip_address = f"127.0.0.1:{self.server.server_address[1]}"
+        self.metrics = metrics.enable()
+
+    def tearDown(self):
+        metrics.disable(self.metrics)
+        api_v1.close_clients()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_shared_clients(self):
+        for _ in range(3):
+            api_v1.get_status(self.ip_address, "k")
+        api_v1.get_client(self.ip_address, "k", timeout=5).get_status()  # second shared client of the camera
+
+        self.assertEqual(len(api_v1.clients()), 2)
+        stats = self.metrics.stats()[self.ip_address]
+        self.assertEqual(stats["status"]["calls"], 4)
+        self.assertEqual(stats["connections"]["requests"], 4)  # added up over both clients
+        self.assertEqual(stats["connections"]["connections"], 2)
+        self.assertIn("requests sent again by the retry policy", self.metrics.prometheus())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the storage offload against the mock camera
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import time
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_v1  # noqa: E402
+import fleet  # noqa: E402
+import mock_camera  # noqa: E402
+import offload  # noqa: E402
+
+
+class OffloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = mock_camera.serve(mock_camera.MockCamera(key="k"), "127.0.0.1", 0)
+        self.server.camera.add_files("scheduler", 10, 1000)
+        self.directory = tempfile.TemporaryDirectory()
+        camera = fleet.Camera(f"127.0.0.1:{self.server.server_address[1]}", "k", name="mock")
+        self.monitor = offload.OffloadMonitor([camera], path=self.directory.name, sources=("scheduler",),
+                                              target=0.5)
+        self.state = self.monitor.states[0]
+        self.state.total = 10000
+
+    def tearDown(self):
+        api_v1.close_clients()
+        self.directory.cleanup()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_below_target(self):
+        self.state.samples.append((time.monotonic(), 4000))  # below the target by the time offload() runs
+        self.assertEqual(self.monitor.offload(self.state), 0)
+        self.assertEqual(len(self.server.camera.files["scheduler"]), 10)
+
+    def test_offload_oldest(self):
+        self.state.samples.append((time.monotonic(), 8000))
+        self.assertGreaterEqual(self.monitor.offload(self.state), 3000)
+        remaining = sorted(self.server.camera.files["scheduler"])
+        self.assertLessEqual(len(remaining), 7)
+        self.assertTrue(os.listdir(os.path.join(self.directory.name, "mock", "scheduler")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the adaptive capture timeouts
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_v1  # noqa: E402
+import profiler  # noqa: E402
+
+CAMERA = "10.1.2.7"
+
+
+class TimeoutTest(unittest.TestCase):
+
+    def setUp(self):
+        self.profile = profiler.CaptureProfiler(":memory:")
+        self.client = api_v1.CameraClient(CAMERA, "k", endpoint_timeouts={profiler.TAKEIMAGE: 120})
+        start = time.time() - 100
+        for index in range(20):
+            self.record(start + index, last_byte=10.0)
+
+    def tearDown(self):
+        self.client.close()
+        self.profile.close()
+
+    def record(self, started, last_byte=None, elapsed=None, error=None):
+        self.profile.record(profiler.CaptureProfile(camera=CAMERA, command=profiler.TAKEIMAGE, started=started,
+                                                    last_byte=last_byte, elapsed=elapsed or last_byte, error=error))
+
+    def test_follows_durations(self):
+        self.assertEqual(self.profile.timeout(CAMERA), 15.0)  # duration x margin
+        self.assertEqual(self.profile.apply(self.client), 15.0)
+        self.assertEqual(self.client.get_timeout(profiler.TAKEIMAGE), 15.0)
+        self.assertEqual(self.profile.apply(self.client, floor=20), 20)
+
+    def test_keep_configured(self):
+        self.assertEqual(self.profile.apply(self.client, keep_configured=True), 120)
+        self.profile.apply(self.client)
+        self.assertEqual(self.profile.apply(self.client, keep_configured=True), 120)  # configured before apply()
+
+    def test_timeout_restores_headroom(self):
+        self.profile.apply(self.client)
+        self.record(time.time(), elapsed=15.0, error="CameraTimeout")
+        self.assertEqual(self.profile.apply(self.client), 22.5)
+        self.assertEqual(self.client.get_timeout(profiler.TAKEIMAGE), 22.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
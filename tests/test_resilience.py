@@ -0,0 +1,135 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of the client against the mock camera: retries, circuit breaker, deadlines and downloads
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import time
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_v1  # noqa: E402
+import mock_camera  # noqa: E402
+import resilience  # noqa: E402
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_states(self):
+        breaker = resilience.CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+        self.assertEqual(breaker.allow(), breaker.CLOSED)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.15)
+        self.assertEqual(breaker.allow(), breaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())  # one trial call at a time
+        breaker.record_success()
+        self.assertEqual(breaker.state, breaker.CLOSED)
+
+    def test_release_trial(self):
+        breaker = resilience.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.1)
+        self.assertEqual(breaker.allow(), breaker.HALF_OPEN)
+        breaker.release()
+        self.assertEqual(breaker.allow(), breaker.HALF_OPEN)
+
+
+class ClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = mock_camera.serve(mock_camera.MockCamera(key="k"), "127.0.0.1", 0)
+        self.ip_address = f"127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_half_open_deadline_recovery(self):
+        breaker = resilience.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        client = api_v1.CameraClient(self.ip_address, "k", raise_errors=True, circuit_breaker=breaker)
+        breaker.record_failure()
+        time.sleep(0.1)
+
+        # the trial call is cut short by the deadline, it says nothing about the camera
+        self.server.camera.latency = 0.5
+        with self.assertRaises(resilience.DeadlineExceeded):
+            with resilience.deadline(0.1):
+                client.get_status()
+
+        self.server.camera.latency = 0.0
+        self.assertIsNotNone(client.get_status())
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        client.close()
+
+    def test_read_timeout_not_retried(self):
+        self.server.camera.latency = 1.0
+        client = api_v1.CameraClient(self.ip_address, "k", raise_errors=True, timeout=0.3)
+        start = time.monotonic()
+        with self.assertRaises(resilience.CameraTimeout):
+            client.get_status()
+        self.assertLess(time.monotonic() - start, 0.9)
+        client.close()
+
+    def test_server_errors_retried(self):
+        policy = resilience.RetryPolicy(retries=2, backoff_factor=0.01)
+        self.assertTrue(policy.should_retry("status", resilience.CameraDisconnected("lost"), 1))
+        self.assertFalse(policy.should_retry("images/takeimage", resilience.CameraDisconnected("lost"), 1))
+        self.assertFalse(policy.should_retry("status", resilience.CameraTimeout("slow"), 1))
+        self.assertTrue(resilience.RetryPolicy(retry_timeouts=True).should_retry("status",
+                                                                                 resilience.CameraTimeout("slow"), 1))
+
+    def test_download_permissions(self):
+        self.server.camera.add_files("scheduler", 1, 1000)
+        filename = next(iter(self.server.camera.files["scheduler"]))
+        client = api_v1.CameraClient(self.ip_address, "k", raise_errors=True)
+        umask = os.umask(0)
+        os.umask(umask)
+        with tempfile.TemporaryDirectory() as path:
+            full_path = os.path.join(path, filename)
+            self.assertIsNotNone(client.save_file(filename, "scheduler", full_path))
+            self.assertEqual(os.stat(full_path).st_mode & 0o777, 0o666 & ~umask)
+        client.close()
+
+    def test_shared_clients(self):
+        client = api_v1.get_client(self.ip_address, "k")
+        self.assertIs(api_v1.get_client(self.ip_address, "k"), client)
+        strict = api_v1.get_client(self.ip_address, "k", raise_errors=True, timeout=5)
+        self.assertIsNot(strict, client)
+        self.assertTrue(strict.raise_errors)
+        self.assertEqual(strict.timeout, 5)
+        self.assertIs(api_v1.get_client(self.ip_address, "k", timeout=5, raise_errors=True), strict)
+        api_v1.close_clients()
+
+    def test_parallel_download_deadline(self):
+        self.server.camera.add_files("scheduler", 8, 1000)
+        self.server.camera.latency = 1.0
+        client = api_v1.CameraClient(self.ip_address, "k", raise_errors=True)
+        start = time.monotonic()
+        with tempfile.TemporaryDirectory() as path, resilience.deadline(0.3):
+            report = client.download_files(list(self.server.camera.files["scheduler"]), "scheduler", path=path,
+                                           max_workers=2)
+        self.assertLess(time.monotonic() - start, 1.0)  # the worker threads stop at the deadline
+        self.assertEqual(report.failed, 8)
+        client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
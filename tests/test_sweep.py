@@ -0,0 +1,56 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of spectral sweeps against the mock camera
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_v1  # noqa: E402
+import mock_camera  # noqa: E402
+import sweep  # noqa: E402
+
+
+class SweepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = mock_camera.serve(mock_camera.MockCamera(key="k"), "127.0.0.1", 0)
+        self.client = api_v1.CameraClient(f"127.0.0.1:{self.server.server_address[1]}", "k", raise_errors=True)
+        self.steps = [(spectrum, 500, 0.01) for spectrum in (1, 5, 8)]
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sweep(self):
+        result = sweep.sweep(self.client, self.steps)
+        self.assertTrue(result.ok)
+        self.assertEqual(len(result.frames), len(self.steps))
+
+    def test_failed_steps(self):
+        self.server.camera.error_rate = 1.0
+        result = sweep.sweep(self.client, self.steps)  # errors of a client with raise_errors don't stop the sweep
+        self.assertEqual(len(result.frames), len(self.steps))
+        self.assertFalse(any(frame.ok for frame in result.frames))
+        self.assertTrue(all(frame.error.startswith("CameraResponseError") for frame in result.frames))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of incremental downloads and of the verification of downloaded files before they are deleted
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import hashlib
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_v1  # noqa: E402
+import mock_camera  # noqa: E402
+import sync  # noqa: E402
+
+
+class VerifyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "image.png")
+        with open(self.path, "wb") as f:
+            f.write(b"a" * 1000)
+        self.checksum = hashlib.sha256(b"a" * 1000).hexdigest()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_verified(self):
+        self.assertTrue(sync.is_verified(self.path, 1000, self.checksum))
+        self.assertFalse(sync.is_verified(self.path, 1000, None))
+        self.assertFalse(sync.is_verified(self.path, 999, self.checksum))
+
+    def test_changed_file(self):
+        with open(self.path, "r+b") as f:
+            f.write(b"b")  # same size, different content
+        self.assertFalse(sync.is_verified(self.path, 1000, self.checksum))
+
+    def test_other_algorithm(self):
+        self.assertFalse(sync.is_verified(self.path, 1000, self.checksum, algorithm="md5"))
+        self.assertFalse(sync.is_verified(self.path, 1000, self.checksum, algorithm="unknown"))
+
+
+class SyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = mock_camera.serve(mock_camera.MockCamera(key="k"), "127.0.0.1", 0)
+        self.server.camera.add_files("scheduler", 5, 1000)
+        self.client = api_v1.CameraClient(f"127.0.0.1:{self.server.server_address[1]}", "k")
+        self.directory = tempfile.TemporaryDirectory()
+        self.manifest = sync.Manifest(":memory:")
+
+    def tearDown(self):
+        self.manifest.close()
+        self.directory.cleanup()
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sync_and_delete(self):
+        files = sorted(self.server.camera.files["scheduler"])
+        report = sync.sync_source(self.client, self.manifest, "scheduler", path=self.directory.name, delete=True)
+        self.assertEqual(sorted(report.new_files), files)
+        self.assertEqual(sorted(report.deleted), files)
+        self.assertEqual(self.server.camera.files["scheduler"], {})
+        self.assertEqual(sorted(self.manifest.files(self.client.ip_address, "scheduler", state=sync.DELETED)), files)
+
+        report = sync.sync_source(self.client, self.manifest, "scheduler", path=self.directory.name)
+        self.assertEqual(report.new_files, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
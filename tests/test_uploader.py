@@ -0,0 +1,82 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests of uploads to several mock cameras
+#
+# python3 -m unittest discover tests
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_v1  # noqa: E402
+import mock_camera  # noqa: E402
+import uploader  # noqa: E402
+
+
+class PushTest(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = [mock_camera.serve(mock_camera.MockCamera(key="k"), "127.0.0.1", 0) for _ in range(3)]
+        self.clients = [api_v1.CameraClient(f"127.0.0.1:{server.server_address[1]}", "k")
+                        for server in self.servers]
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def check(self, results, content):
+        self.assertEqual(len(results), len(self.clients))
+        self.assertTrue(all(result.status == uploader.OK for result in results.values()))
+        for server in self.servers:
+            self.assertEqual(server.camera.files["config"]["data.bin"].content, content)
+
+    def test_path(self):
+        content = os.urandom(200 * 1024)
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(content)
+        try:
+            self.check(uploader.push(self.clients, f.name, "data.bin"), content)
+        finally:
+            os.remove(f.name)
+
+    def test_opened_once(self):
+        content = os.urandom(300 * 1024)
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(content)
+        try:
+            for spool_size in (64 * 1024, uploader.SPOOL_SIZE):  # memory-mapped and read into memory
+                with mock.patch.object(uploader, "SPOOL_SIZE", spool_size), \
+                        mock.patch.object(uploader, "open", create=True, wraps=open) as opened:
+                    self.check(uploader.push(self.clients, f.name, "data.bin"), content)
+                self.assertEqual(opened.call_count, 1)
+        finally:
+            os.remove(f.name)
+
+    def test_large_generator(self):
+        content = os.urandom(300 * 1024)
+        chunks = (content[index:index + 1000] for index in range(0, len(content), 1000))
+        with mock.patch.object(uploader, "SPOOL_SIZE", 64 * 1024):  # copied to a temporary file
+            self.check(uploader.push(self.clients, chunks, "data.bin"), content)
+
+
+if __name__ == "__main__":
+    unittest.main()
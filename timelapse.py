@@ -0,0 +1,276 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Time-lapse daemon - captures on a fixed wall-clock schedule per camera (e.g. every 15 minutes on the
+# quarter hour). Capture times are taken from the schedule grid, so they don't drift with the duration of
+# captures and downloads. Download and delete of a capture run in the background while waiting for the next.
+#
+# python3 timelapse.py --interval 900 --path timelapse
+# python3 timelapse.py --cameras cameras.json --interval 600 --mode sweep --brightness 500 --exposure 0.1
+
+import os
+import time
+import signal
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import api_v1
+import configuration
+import downloader
+import fleet
+import sweep
+
+SKIP = "skip"  # slots missed by an overrunning capture are skipped
+QUEUE = "queue"  # the latest missed slot is captured immediately, older ones are skipped
+
+
+@dataclass
+class Schedule:
+    """
+    Capture schedule of one camera
+    """
+    camera: fleet.Camera
+    interval: float  # seconds between captures
+    offset: float = 0.0  # seconds after the interval boundary (interval 3600, offset 300: at hh:05)
+    steps: list = None  # list of sweep.Step for a spectral sweep, multispectral image (takeimage) if not set
+    path: str = "timelapse"  # local folder, images are stored in <path>/<camera name>
+    delete: bool = True  # delete images from the camera after the download
+    overrun: str = SKIP
+
+
+@dataclass
+class CaptureEvent:
+    """
+    Result of one scheduled capture
+    """
+    camera: str
+    slot: float  # scheduled time (unix time)
+    started: float = None
+    duration: float = 0.0  # capture only, without download
+    files: list = field(default_factory=list)
+    source: str = None
+    skipped_slots: int = 0  # slots skipped after this capture because it overran
+    error: str = None
+    download: object = None  # DownloadReport, set when the background download is complete
+
+
+class TimelapseDaemon:
+    """
+    Runs the schedules of all cameras, one thread per camera
+    """
+
+    def __init__(self, schedules, on_event=None, max_backlog=4, profiler=None):
+        """
+        :param schedules: list of Schedule
+        :param on_event: optional function called with a CaptureEvent after every capture and download
+        :param max_backlog: maximum number of captures waiting for their download per camera,
+                            the capture thread waits if the downloads fall behind
+        :param profiler: optional profiler.CaptureProfiler recording the multispectral captures, the takeimage
+                         timeout of each camera is adapted to the measured durations
+        """
+        self.schedules = list(schedules)
+        self.on_event = on_event
+        self.max_backlog = max_backlog
+        self.profiler = profiler
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """
+        Start the capture threads
+        """
+        self._stop.clear()
+        for schedule in self.schedules:
+            thread = threading.Thread(target=self._run, args=(schedule,), name=f"timelapse-{schedule.camera.name}",
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        Stop after the running captures, pending downloads are completed
+        """
+        self._stop.set()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run_forever(self):
+        """
+        Run until stop() is called (e.g. from a signal handler)
+        """
+        self.start()
+        while any(thread.is_alive() for thread in self._threads):
+            self.join(timeout=1.0)
+
+    @staticmethod
+    def first_slot(schedule, now):
+        """
+        Get the first slot of the schedule grid after now
+        :param schedule: Schedule
+        :param now: unix time
+        :return: unix time
+        """
+        slots = (now - schedule.offset) // schedule.interval + 1
+        return slots * schedule.interval + schedule.offset
+
+    def _wait_until(self, slot):
+        # wait in steps, so changes of the system clock are followed
+        while not self._stop.is_set():
+            remaining = slot - time.time()
+            if remaining <= 0:
+                return True
+            self._stop.wait(min(remaining, 10.0))
+        return False
+
+    def _emit(self, event):
+        if self.on_event:
+            try:
+                self.on_event(event)
+            except Exception as err:
+                print(f"Event handler failed: {err}")
+
+    def _run(self, schedule):
+        camera = schedule.camera
+        client = api_v1.get_client(camera.ip_address, camera.key, **camera.settings)  # warm connection
+        path = os.path.join(schedule.path, camera.name)
+        os.makedirs(path, exist_ok=True)
+
+        if self.profiler is not None and schedule.steps is None:
+            expected = self.profiler.expected_duration(camera.ip_address, quantile=0.95)
+            if expected is not None and expected > schedule.interval:
+                print(f"{camera.name}: captures take up to {expected:.1f} s, longer than the interval")
+
+        backlog = threading.BoundedSemaphore(self.max_backlog)
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"download-{camera.name}") as downloads:
+            slot = self.first_slot(schedule, time.time())
+
+            while self._wait_until(slot):
+                event = self._capture(schedule, client, slot, path)
+
+                slot += schedule.interval
+                now = time.time()
+                if slot <= now:  # capture overran its slot
+                    missed = int((now - slot) // schedule.interval) + 1
+                    if schedule.overrun == QUEUE:
+                        missed -= 1  # the latest missed slot runs right away
+                    slot += missed * schedule.interval
+                    event.skipped_slots = missed
+                    if missed:
+                        print(f"{camera.name}: capture took {event.duration:.1f} s, skipped {missed} slots")
+
+                if event.files and schedule.steps is None:
+                    backlog.acquire()  # blocks if downloads fall behind
+                    downloads.submit(self._download, schedule, client, event, path, backlog)
+                else:
+                    self._emit(event)
+
+    def _capture(self, schedule, client, slot, path):
+        event = CaptureEvent(camera=schedule.camera.name, slot=slot, started=time.time())
+
+        try:
+            if schedule.steps is None:
+                if self.profiler is not None:
+                    file_info, _ = self.profiler.take_ms_image(client)
+                    self.profiler.apply(client)
+                else:
+                    file_info = client.take_ms_image()
+                if file_info is None:
+                    event.error = "capture failed"
+                else:
+                    event.files = list(file_info["files"])
+                    event.source = file_info["source"]
+            else:
+                name = datetime.datetime.fromtimestamp(slot).strftime("%Y%m%d-%H%M%S")
+                result = sweep.sweep(client, schedule.steps, path=path, name=name)
+                event.files = [frame.path for frame in result.frames if frame.ok]
+                if not result.ok:
+                    event.error = f"{sum(1 for frame in result.frames if not frame.ok)} sweep steps failed"
+        except Exception as err:  # keep the schedule running
+            event.error = f"{type(err).__name__}: {err}"
+
+        event.duration = time.time() - event.started
+
+        return event
+
+    def _download(self, schedule, client, event, path, backlog):
+        try:
+            event.download = client.download_files(event.files, event.source, path=path)
+            downloaded = [result.filename for result in event.download.results if result.status == downloader.OK]
+            if schedule.delete and downloaded:
+                failed = client.delete_files(downloaded, event.source).failed
+                if failed:
+                    event.error = f"{len(failed)} deletes failed: {', '.join(sorted(failed))}"
+        except Exception as err:
+            event.error = f"download failed: {type(err).__name__}: {err}"
+        finally:
+            backlog.release()
+
+        self._emit(event)
+
+
+def print_event(event):
+    """
+    Event handler printing one line per capture
+    """
+    slot = datetime.datetime.fromtimestamp(event.slot).isoformat(timespec="seconds")
+    download = f", {event.download.summary()}" if event.download else ""
+    status = f"failed: {event.error}" if event.error else "ok"
+    print(f"{event.camera} {slot}: {status}, {len(event.files)} files, capture {event.duration:.1f} s{download}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time-lapse capture daemon")
+    parser.add_argument("--cameras",
+                        help="camera inventory (JSON, see fleet.py), camera of the configuration if not set")
+    parser.add_argument("--interval", type=float, required=True, help="seconds between captures")
+    parser.add_argument("--offset", type=float, default=0.0, help="seconds after the interval boundary")
+    parser.add_argument("--path", default="timelapse", help="local folder for the images")
+    parser.add_argument("--mode", choices=["ms", "sweep"], default="ms",
+                        help="multispectral image (global settings) or spectral sweep")
+    parser.add_argument("--brightness", type=int, default=500, help="sweep brightness 0-1000")
+    parser.add_argument("--exposure", type=float, default=0.1, help="sweep exposure in seconds")
+    parser.add_argument("--keep", action="store_true", help="don't delete the images from the camera")
+    parser.add_argument("--overrun", choices=[SKIP, QUEUE], default=SKIP)
+    parser.add_argument("--profile", help="record the capture timings in this database (see profiler.py)")
+    args = parser.parse_args()
+
+    if args.cameras:
+        cameras = fleet.Fleet.from_file(args.cameras).cameras
+    else:
+        default = configuration.settings()
+        cameras = [fleet.Camera(default["ip_address"], default["key"])]
+
+    steps = sweep.all_spectra(args.brightness, args.exposure) if args.mode == "sweep" else None
+
+    capture_profiler = None
+    if args.profile:
+        import profiler
+        capture_profiler = profiler.CaptureProfiler(args.profile)
+
+    daemon = TimelapseDaemon([Schedule(camera, args.interval, offset=args.offset, steps=steps, path=args.path,
+                                       delete=not args.keep, overrun=args.overrun) for camera in cameras],
+                             on_event=print_event, profiler=capture_profiler)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.run_forever()
+    except KeyboardInterrupt:
+        daemon.stop()
+        daemon.join()
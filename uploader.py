@@ -0,0 +1,270 @@
+# Copyright 2024 ETC Inc d/b/a RAYN Growing Systems
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Streaming uploads - the file is sent in chunks instead of being read into memory first.
+# The camera expects a Content-Length, so data of unknown size (generators) is buffered in a temporary file.
+
+import io
+import os
+import mmap
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import resilience
+
+OK = "ok"
+FAILED = "failed"
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_SIZE = 8 * 1024 * 1024  # generators up to this size are buffered in memory, larger ones on disk
+
+
+@dataclass
+class UploadResult:
+    """
+    Result of a single file upload
+    """
+    camera: str
+    filename: str
+    status: str = FAILED
+    size: int = 0
+    bytes: int = 0  # bytes sent so far
+    duration: float = 0.0
+    verified: bool = None  # file found in the file list after the upload, None if not checked
+    error: str = None
+
+    @property
+    def throughput(self):
+        """
+        :return: upload rate in bytes per second
+        """
+        return self.bytes / self.duration if self.duration > 0 else 0.0
+
+
+class UploadStream:
+    """
+    Request body reading a file object in chunks, reports the bytes sent. The length is known,
+    so the request is sent with a Content-Length instead of chunked transfer encoding.
+    """
+
+    def __init__(self, file, size, progress=None):
+        """
+        :param file: file object opened in binary mode, positioned at the start of the data
+        :param size: number of bytes to send
+        :param progress: optional function called with the number of bytes sent after every chunk
+        """
+        self._file = file
+        self._size = size
+        self._progress = progress
+        self.sent = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):  # marks the body as stream for requests
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size=-1):
+        remaining = self._size - self.sent
+        chunk = self._file.read(remaining if size is None or size < 0 else min(size, remaining))
+        self.sent += len(chunk)
+        if self._progress:
+            self._progress(self.sent)
+        return chunk
+
+
+class _ViewReader:
+    # file-like reader of a memoryview, the data is not copied (several readers can share one buffer)
+    def __init__(self, view):
+        self._view = view.cast("B")
+        self._position = 0
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(self._position + size, len(self._view))
+        chunk = self._view[self._position:end].tobytes()
+        self._position = end
+        return chunk
+
+    def close(self):
+        self._view.release()
+
+
+def open_data(data):
+    """
+    Open the data of an upload
+    :param data: file path, bytes, binary file object or iterable of bytes chunks (e.g. a generator)
+    :return: (file object, size, close) - close is True if the file object was opened here
+    """
+    if isinstance(data, (str, os.PathLike)):
+        return open(data, "rb"), os.path.getsize(data), True
+
+    if isinstance(data, memoryview):
+        return _ViewReader(data), data.nbytes, True
+
+    if isinstance(data, (bytes, bytearray)):
+        return io.BytesIO(data), len(data), True  # BytesIO shares the buffer of bytes until it is written
+
+    if hasattr(data, "read"):
+        try:
+            position = data.tell()
+            size = os.fstat(data.fileno()).st_size - position if hasattr(data, "fileno") else None
+        except (OSError, io.UnsupportedOperation):
+            size = None
+        if size is None:
+            try:
+                size = data.seek(0, io.SEEK_END) - position
+                data.seek(position)
+            except (OSError, io.UnsupportedOperation):
+                size = None
+        if size is not None:
+            return data, size, False
+        file = data
+        data = iter(lambda: file.read(CHUNK_SIZE), b"")  # not seekable, e.g. a pipe
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    for chunk in data:
+        spool.write(chunk)
+    size = spool.tell()
+    spool.seek(0)
+
+    return spool, size, True
+
+
+def verify_upload(client, filename, source="config"):
+    """
+    Check that a file is in the file list of the camera
+    :return: True if found, None if the list could not be received
+    """
+    try:
+        return filename in set(client.iter_files(source=source))
+    except IOError:
+        return None
+
+
+def upload(client, data, filename, timeout=None, progress=None, verify=False, source="config"):
+    """
+    Upload data to the camera in chunks
+    :param client: CameraClient of the camera
+    :param data: file path, bytes, binary file object or iterable of bytes chunks (e.g. a generator)
+    :param filename: name of the file on the camera
+    :param timeout: sets the timeout in seconds
+    :param progress: optional function called with the UploadResult after every chunk
+    :param verify: check the file list of the camera after the upload
+    :param source: source folder the uploaded file is listed in (see README)
+    :return: UploadResult
+    """
+    result = UploadResult(camera=client.ip_address, filename=filename)
+    start = time.monotonic()
+
+    file, result.size, close = open_data(data)
+
+    def sent(count):
+        result.bytes = count
+        result.duration = time.monotonic() - start
+        if progress:
+            progress(result)
+
+    try:
+        # filename is part of the URL, wildcard is used on server side
+        response = client.request(f"files/put/{filename}", data=UploadStream(file, result.size, sent),
+                                  timeout=timeout)
+    except resilience.CameraResponseError as err:  # client with raise_errors
+        response = err.response
+    except resilience.CameraError:
+        response = None
+    finally:
+        if close:
+            file.close()
+
+    result.duration = time.monotonic() - start
+
+    if response is None:
+        result.error = "no response"
+    elif response.status_code != 200:
+        result.error = f"response code {response.status_code}"
+    else:
+        result.status = OK
+        if verify:
+            result.verified = verify_upload(client, filename, source=source)
+            if not result.verified:
+                result.status = FAILED
+                result.error = "file not in file list" if result.verified is False else "file list not received"
+
+    return result
+
+
+def push(clients, data, filename, max_workers=8, timeout=None, progress=None, verify=True, source="config"):
+    """
+    Upload the same data to many cameras in parallel. The data is read only once: files larger than SPOOL_SIZE are
+    memory-mapped (generators are buffered in a temporary file first), smaller data is read into memory, and every
+    upload streams its own view of the shared buffer.
+    :param clients: list of CameraClient
+    :param data: file path, bytes, binary file object or iterable of bytes chunks
+    :param filename: name of the file on the cameras
+    :param max_workers: number of parallel uploads
+    :param timeout: sets the timeout in seconds
+    :param progress: optional function called with the UploadResult of a camera after every chunk
+    :param verify: check the file list of every camera after the upload
+    :param source: source folder the uploaded file is listed in (see README)
+    :return: python dict camera IP address -> UploadResult
+    """
+    # the data is read only once, every upload streams its own reader of the shared read-only buffer
+    mapped = None
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        payload = memoryview(data)
+    else:
+        file, size, close = open_data(data)
+        try:
+            if size > SPOOL_SIZE:
+                try:  # large files are memory-mapped, the pages are shared by all uploads
+                    position = file.tell()
+                    mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                    payload = memoryview(mapped)[position:position + size]
+                except (OSError, ValueError, AttributeError, io.UnsupportedOperation):
+                    mapped = None
+            if mapped is None:
+                payload = memoryview(file.read(size))
+        finally:
+            if close:
+                file.close()  # the memory map stays valid
+
+    lock = threading.Lock()
+
+    def report(result):
+        if progress:
+            with lock:
+                progress(result)
+
+    def send(client):
+        try:
+            return upload(client, payload, filename, timeout=timeout, progress=report, verify=verify, source=source)
+        except Exception as err:  # one camera must not stop the others
+            return UploadResult(camera=client.ip_address, filename=filename, error=f"{type(err).__name__}: {err}")
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(clients)))) as executor:
+            results = list(executor.map(resilience.in_context(send), clients))
+    finally:
+        payload.release()
+        if mapped is not None:
+            mapped.close()
+
+    return {result.camera: result for result in results}